@@ -1,138 +1,172 @@
-import matplotlib.pyplot as plt
 import pandas as pd
 import numpy as np
-from matplotlib.widgets import Cursor
+from barcode_gap_engine import barcode_gap_statistics
+from distance_matrix_io import load_distance_matrix
+from k2p_distance import distance_matrix_from_fasta, header_species
+from ordination import pcoa, cluster_ordination, nearest_to_centroids
 
 # Define input files
 distance_file = "Full_Distance_Matrix.csv"
 pca_file = "pca_scores_cox1_with_clusters.csv"
 output_csv_file = "Barcode_Gap_Plot_Data.csv"
+stats_csv_file = "Barcode_Gap_Statistics.csv"
+
+# Memory-mapped binary copy of the distance matrix, converted once and reused on later runs while the
+# text file is unchanged; None writes it next to distance_file (<name>.npy/.json)
+# ("square" or "condensed" upper triangle for half the footprint)
+binary_matrix_prefix = None
+matrix_layout = "square"
+
+# Aligned FASTA; when set, distances are computed in-process instead of reading distance_file
+# ("k2p" Kimura 2-parameter or "p" p-distance, tiles spread over distance_workers processes)
+alignment_file = None
+distance_model = "k2p"
+distance_workers = 1
+
+# Species of each FASTA header in alignment_file mode: None takes the first two '_'/space-separated
+# tokens ("Genus_species_voucher123" -> "Genus species"); a regex string uses its first group
+# (or whole match), e.g. r"^([^|]+)\|" for "Genus species|voucher"; a callable maps title -> species
+species_from_header = None
+
+# Clusters: "pcoa" runs principal coordinates analysis (randomized eigensolver) and k-means on
+# the loaded distance matrix, writing ordination_output_file; "file" reads them from pca_file
+cluster_method = "pcoa"
+n_clusters = 3
+n_components = 10
+ordination_output_file = "pcoa_scores_with_clusters.csv"
+
+# Headless runs write the statistics, clusters and plot data but skip the figure
+headless = False
 
 # Initialize dictionaries
-intrak2p_dict = {}  # Intraspecific distances
-interk2p_dict = {}  # Interspecific distances
 barcode_gap_dict = {}  # Barcode gap dictionary
+species_clusters = {}  # Species -> cluster
+cluster_names = {}  # Cluster -> cluster name
+cluster_colors = {}  # Cluster name -> color
+representatives = {}  # Cluster name -> representative species
+
+def set_clusters(cluster_table, cluster_representatives):
+    """Fill the cluster dictionaries from a Species/Cluster/Cluster_Name table, one color per cluster."""
+    global species_clusters, cluster_names, cluster_colors, representatives
+
+    species_clusters = dict(zip(cluster_table["Species"], cluster_table["Cluster"]))
+    cluster_names = dict(zip(cluster_table["Cluster"], cluster_table["Cluster_Name"]))
+    names = [cluster_names[cluster] for cluster in sorted(cluster_names)]
+    cluster_colors = {name: f"C{i % 10}" for i, name in enumerate(names)}
+    representatives = cluster_representatives
+
+def load_clusters(file):
+    """
+    Reads clusters from a PCA scores file (Species, Cluster, Cluster_Name plus score columns).
+    Representatives are the species closest to each cluster centroid in the score columns.
+    """
+    pca_data = pd.read_csv(file)
 
-# Read PCA file with clusters
-pca_data = pd.read_csv(pca_file)
-
-# Standardize species names (replace underscores with spaces)
-pca_data["Species"] = pca_data["Species"].str.replace("_", " ")
-
-# Extract cluster information
-species_clusters = dict(zip(pca_data["Species"], pca_data["Cluster"]))
-cluster_names = dict(zip(pca_data["Cluster"], pca_data["Cluster_Name"]))
-
-# Define cluster colors
-cluster_colors = {
-    "Cluster 1": "red",
-    "Cluster 2": "blue",
-    "Cluster 3": "green"
-}
+    # Standardize species names (replace underscores with spaces)
+    pca_data["Species"] = pca_data["Species"].str.replace("_", " ")
+    scores = pca_data.drop(columns=["Species", "Cluster", "Cluster_Name"]).select_dtypes("number")
+    set_clusters(pca_data, nearest_to_centroids(pca_data["Species"], scores.to_numpy(), pca_data["Cluster_Name"]))
 
-# Define cluster representatives
-representatives = {
-    "Cluster 1": "Hydrophis schistosus",
-    "Cluster 2": "Harpadon nehereus",
-    "Cluster 3": "Ablennes hians"
-}
+def compute_clusters(species_list, distance_matrix):
+    """
+    Clusters specimens by k-means on their principal coordinates and saves the specimen scores
+    with clusters to ordination_output_file. Representatives are the specimens closest to each centroid.
+    """
+    scores, _, explained = pcoa(distance_matrix, n_components, seed=42, symmetric=True)
+    specimens, species, cluster_representatives = cluster_ordination(species_list, scores, n_clusters, seed=42)
+    specimens.to_csv(ordination_output_file, index=False)
+    print(f"✅ PCoA scores ({explained[:2].sum():.1%} of variation on the first two axes) "
+          f"with clusters saved to: {ordination_output_file}")
+    set_clusters(species, cluster_representatives)
 
 # Read the genetic distance matrix
 def read_distance_matrix(file):
     """
-    Reads a tab-separated distance matrix and returns a cleaned dictionary.
+    Opens the tab-separated distance matrix through its memory-mapped binary copy
+    (created on first use) and returns the specimen labels and the float32 matrix.
+    Blank cells are filled from the other triangle once, during conversion, so the matrix is
+    symmetric and the engine reads only contiguous row blocks.
     """
-    global species_list
-
-    # Read the file
-    df = pd.read_csv(file, sep="\t", dtype=str)
-
-    # Strip spaces from headers
-    df.columns = df.columns.str.strip()
-    df.iloc[:, 0] = df.iloc[:, 0].str.strip()
-
-    # Extract species names
-    species_list = df.columns[1:].tolist()
-
-    # Convert matrix into a dictionary
-    distance_dict = {}
-    for i in range(len(df)):
-        species_name = df.iloc[i, 0].strip()
-        distances = df.iloc[i, 1:].fillna(0).astype(float).tolist()
-
-        distance_dict[species_name] = distances
-
-    return distance_dict
+    return load_distance_matrix(file, prefix=binary_matrix_prefix, layout=matrix_layout)
 
 # Compute intraspecific and interspecific distances
-def compute_barcode_gap(distance_dict):
-    global intrak2p_dict, interk2p_dict, barcode_gap_dict
+def compute_barcode_gap(species_list, distance_matrix):
+    """
+    Computes per-species barcode gap statistics with the block-wise matrix engine,
+    saves them to stats_csv_file and fills barcode_gap_dict with (mean intra, mean inter).
+    """
+    global barcode_gap_dict
 
-    for i, species1 in enumerate(species_list):
-        for j, species2 in enumerate(species_list):
-            dist = distance_dict[species1][j]
+    stats = barcode_gap_statistics(distance_matrix, species_list, symmetric=True)
+    stats.to_csv(stats_csv_file, index=False)
+    print(f"✅ Barcode gap statistics saved to: {stats_csv_file}")
 
-            if species1 == species2:  # Intraspecific distance
-                if species1 not in intrak2p_dict:
-                    intrak2p_dict[species1] = []
-                intrak2p_dict[species1].append(dist)
+    # Species without intra- or interspecific pairs plot as zero and are filtered out
+    means = stats[["Mean_Intraspecific", "Mean_Interspecific"]].fillna(0).to_numpy()
+    barcode_gap_dict = {species: (intra, inter) for species, (intra, inter) in zip(stats["Species"], means)}
+    return stats
 
-            else:  # Interspecific distance
-                if species1 not in interk2p_dict:
-                    interk2p_dict[species1] = []
-                interk2p_dict[species1].append(dist)
+# Barcode gap values per plotted species
+def barcode_gap_plot_data(barcode_gap_dict):
+    """
+    Species with both intra- and interspecific distances above zero, with their clusters;
+    saved to output_csv_file. Returns None when no species is left.
+    """
+    # Filter out zero values
+    species_labels = np.array(list(barcode_gap_dict), dtype=object)
+    values = np.array(list(barcode_gap_dict.values()), dtype=np.float64).reshape(-1, 2)
+    keep = (values[:, 0] > 0) & (values[:, 1] > 0)
+    species_labels, values = species_labels[keep], values[keep]
 
-    # Compute average intraspecific and interspecific distances
-    for species in species_list:
-        intra_avg = sum(intrak2p_dict.get(species, [0])) / max(len(intrak2p_dict.get(species, [])), 1)
-        inter_avg = sum(interk2p_dict.get(species, [0])) / max(len(interk2p_dict.get(species, [])), 1)
+    if not len(species_labels):
+        print("Error: No valid barcode gap data found after filtering out zero values!")
+        return None
 
-        barcode_gap_dict[species] = (intra_avg, inter_avg)
+    clusters = pd.Series(species_labels).map(species_clusters).fillna(-1).astype(np.int64).to_numpy()
+    plot_data = pd.DataFrame({
+        "Species": species_labels,
+        "Intraspecific_Distance": values[:, 0],
+        "Interspecific_Distance": values[:, 1],
+        "Cluster": clusters,
+        "Cluster_Name": pd.Series(clusters).map(cluster_names).fillna("Unknown").to_numpy(dtype=object)
+    })
+    plot_data.to_csv(output_csv_file, index=False)
+    print(f"✅ Plot data saved to: {output_csv_file}")
+    return plot_data
 
 # Generate barcode gap plot with clusters
-def barcode_gap_plot_fun(barcode_gap_dict):
+def barcode_gap_plot_fun(plot_data):
     """
     Generates a barcode gap plot with clusters, highlights representatives, and adds clear legends.
     """
-    global species_clusters, cluster_colors, representatives
-
-    # Filter out zero values
-    barcode_gap_dict = {k: v for k, v in barcode_gap_dict.items() if v[0] > 0 and v[1] > 0}
+    import matplotlib.pyplot as plt
+    from scipy.spatial import cKDTree
 
-    if not barcode_gap_dict:
-        print("Error: No valid barcode gap data found after filtering out zero values!")
-        return
+    global cluster_colors, representatives
 
     # Extract values
-    x_values = []
-    y_values = []
-    species_labels = []
-    colors = []
-    cluster_legend_added = set()
+    species_labels = plot_data["Species"].to_numpy(dtype=object)
+    values = plot_data[["Intraspecific_Distance", "Interspecific_Distance"]].to_numpy()
+    x_values, y_values = values[:, 0], values[:, 1]
+    cluster_labels = plot_data["Cluster_Name"].to_numpy(dtype=object)
 
     fig, ax = plt.subplots(figsize=(8, 6))
 
-    # Scatter plot with cluster colors
-    for species, (intra, inter) in barcode_gap_dict.items():
-        cluster_name = cluster_names.get(species_clusters.get(species, -1), "Unknown")
-        color = cluster_colors.get(cluster_name, "gray")
-
-        # Add to scatter plot
-        sc = ax.scatter(intra, inter, color=color, alpha=0.6, edgecolors="black", label=cluster_name if cluster_name not in cluster_legend_added else "")
-        cluster_legend_added.add(cluster_name)
-
-        x_values.append(intra)
-        y_values.append(inter)
-        species_labels.append(species)
+    # Scatter plot with cluster colors, one collection per cluster (legend in order of first appearance)
+    for cluster_name in pd.unique(cluster_labels):
+        members = cluster_labels == cluster_name
+        ax.scatter(x_values[members], y_values[members], color=cluster_colors.get(cluster_name, "gray"), alpha=0.6,
+                   edgecolors="black", label=cluster_name)
 
     # Restore the Equal Line (Diagonal)
-    max_val = max(max(x_values), max(y_values))
+    max_val = values.max()
     ax.plot([0, max_val], [0, max_val], linestyle="--", color="black", label="Equal Line")
 
     # Highlight cluster representatives separately
+    position = {species: i for i, species in enumerate(species_labels)}
     for cluster, species in representatives.items():
-        if species in barcode_gap_dict:
-            intra, inter = barcode_gap_dict[species]
+        if species in position:
+            intra, inter = values[position[species]]
             ax.scatter(intra, inter, color=cluster_colors[cluster], edgecolors="black", s=150, marker="*", label=f"{species} (Representative)")
 
     # Hover labels
@@ -141,19 +175,33 @@ def barcode_gap_plot_fun(barcode_gap_dict):
                         arrowprops=dict(arrowstyle="->"))
     annot.set_visible(False)
 
-    def update_annot(ind):
-        index = ind["ind"][0]
-        annot.xy = sc.get_offsets()[index]
-        annot.set_text(species_labels[index])
+    # Nearest-point lookup on a KD-tree of the points in display coordinates, rebuilt only
+    # after zooming, panning or resizing; a point is hit within one default marker radius
+    hover_radius = plt.rcParams["lines.markersize"] / 2 * fig.dpi / 72
+    index = {"view": None, "tree": None, "point": None}
+
+    def nearest_point(event):
+        view = (ax.get_xlim(), ax.get_ylim(), tuple(ax.bbox.bounds))
+        if index["view"] != view:
+            index["view"], index["tree"] = view, cKDTree(ax.transData.transform(values))
+        distance, point = index["tree"].query([event.x, event.y], distance_upper_bound=hover_radius)
+        return point if np.isfinite(distance) else None
+
+    def update_annot(point):
+        annot.xy = values[point]
+        annot.set_text(species_labels[point])
         annot.set_visible(True)
         fig.canvas.draw_idle()
 
     def hover(event):
         vis = annot.get_visible()
         if event.inaxes == ax:
-            cont, ind = sc.contains(event)
-            if cont:
-                update_annot(ind)
+            point = nearest_point(event)
+            if point is not None:
+                # Redraw only when the hovered point changes
+                if not vis or index["point"] != point:
+                    index["point"] = point
+                    update_annot(point)
             else:
                 if vis:
                     annot.set_visible(False)
@@ -171,27 +219,30 @@ def barcode_gap_plot_fun(barcode_gap_dict):
     plt.savefig("Barcode_Gap_Plot_with_Clusters.png")
     plt.show()
 
-    # Save CSV output
-    plot_data = pd.DataFrame({
-        "Species": species_labels,
-        "Intraspecific_Distance": x_values,
-        "Interspecific_Distance": y_values,
-        "Cluster": [species_clusters.get(species, -1) for species in species_labels],
-        "Cluster_Name": [cluster_names.get(species_clusters.get(species, -1), "Unknown") for species in species_labels]
-    })
-    plot_data.to_csv(output_csv_file, index=False)
-    print(f"✅ Plot data saved to: {output_csv_file}")
-
 # Main function
 def main():
-    print("Loading genetic distance matrix...")
-    distance_dict = read_distance_matrix(distance_file)
+    if alignment_file:
+        print(f"Computing {distance_model.upper()} distances from {alignment_file}...")
+        titles, distance_matrix = distance_matrix_from_fasta(alignment_file, model=distance_model,
+                                                             workers=distance_workers)
+        species_list = header_species(titles, species_from_header)
+    else:
+        print("Loading genetic distance matrix...")
+        species_list, distance_matrix = read_distance_matrix(distance_file)
+
+    if cluster_method == "pcoa":
+        print("Clustering specimens by principal coordinates...")
+        compute_clusters(species_list, distance_matrix)
+    else:
+        load_clusters(pca_file)
 
     print("Computing barcode gap values...")
-    compute_barcode_gap(distance_dict)
+    compute_barcode_gap(species_list, distance_matrix)
+    plot_data = barcode_gap_plot_data(barcode_gap_dict)
 
-    print("Generating barcode gap plot with clusters...")
-    barcode_gap_plot_fun(barcode_gap_dict)
+    if plot_data is not None and not headless:
+        print("Generating barcode gap plot with clusters...")
+        barcode_gap_plot_fun(plot_data)
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,92 @@
+import numpy as np
+import pandas as pd
+
+# Upper bound on distance-matrix cells processed per row block
+BLOCK_CELLS = 1 << 24
+
+def barcode_gap_statistics(distance_matrix, labels, block_rows=None, symmetric=False):
+    """
+    Per-species barcode gap statistics from a square specimen distance matrix.
+
+    distance_matrix may be any 2D array-like that supports row and column slicing
+    (NumPy array, np.memmap); it is processed in row blocks so only one block is held
+    as float64 at a time. Rows sharing a label belong to the same species. Self comparisons
+    are excluded except for labels with a single row, whose diagonal holds the within-species
+    distance in species-level matrices. NaN entries are taken from the transposed cell
+    (triangular exports) or skipped when both are missing; with symmetric=True (matrices from
+    distance_matrix_io.load_distance_matrix or k2p_distance) that column-strip read is skipped
+    and only contiguous row blocks are read.
+
+    Returns a DataFrame in order of first appearance with the mean and max intraspecific
+    distance, the mean interspecific distance, the nearest-neighbour (minimum
+    interspecific) distance and species, and the barcode gap (nearest neighbour - max intra).
+    """
+    labels = np.asarray(labels)
+    n = len(labels)
+    if distance_matrix.shape != (n, n):
+        raise ValueError(f"Distance matrix shape {distance_matrix.shape} does not match {n} labels")
+
+    codes, species = pd.factorize(labels)
+    k = len(species)
+    group_size = np.bincount(codes, minlength=k)
+
+    intra_sum = np.zeros(k)
+    intra_n = np.zeros(k, dtype=np.int64)
+    intra_max = np.full(k, -np.inf)
+    inter_sum = np.zeros(k)
+    inter_n = np.zeros(k, dtype=np.int64)
+    nn_dist = np.full(k, np.inf)
+    nn_code = np.full(k, -1, dtype=np.int64)
+
+    rows = block_rows or max(1, BLOCK_CELLS // max(n, 1))
+    for start in range(0, n, rows):
+        stop = min(start + rows, n)
+        block = np.asarray(distance_matrix[start:stop], dtype=np.float64)
+        missing = np.isnan(block)
+        if not symmetric and missing.any():
+            block = np.where(missing, np.asarray(distance_matrix[:, start:stop], dtype=np.float64).T, block)
+        valid = ~np.isnan(block)
+
+        row_codes = codes[start:stop]
+        local = np.arange(stop - start)
+        same = row_codes[:, None] == codes[None, :]
+        intra = same & valid
+        intra[local, local + start] &= group_size[row_codes] == 1
+        inter = ~same & valid
+
+        # Row reductions, then grouped into species by label code
+        np.add.at(intra_sum, row_codes, np.where(intra, block, 0.0).sum(axis=1))
+        np.add.at(intra_n, row_codes, intra.sum(axis=1))
+        np.maximum.at(intra_max, row_codes, np.where(intra, block, -np.inf).max(axis=1))
+        np.add.at(inter_sum, row_codes, np.where(inter, block, 0.0).sum(axis=1))
+        np.add.at(inter_n, row_codes, inter.sum(axis=1))
+
+        inter_block = np.where(inter, block, np.inf)
+        nearest = inter_block.argmin(axis=1)
+        row_min = inter_block[local, nearest]
+
+        # Closest specimen per species within the block, merged with the running best
+        order = np.lexsort((row_min, row_codes))
+        block_codes, first = np.unique(row_codes[order], return_index=True)
+        candidate = row_min[order][first]
+        candidate_code = codes[nearest[order][first]]
+        better = candidate < nn_dist[block_codes]
+        nn_dist[block_codes[better]] = candidate[better]
+        nn_code[block_codes[better]] = candidate_code[better]
+
+    with np.errstate(invalid="ignore", divide="ignore"):
+        mean_intra = np.where(intra_n > 0, intra_sum / intra_n, np.nan)
+        mean_inter = np.where(inter_n > 0, inter_sum / inter_n, np.nan)
+    max_intra = np.where(np.isfinite(intra_max), intra_max, np.nan)
+    nearest_dist = np.where(np.isfinite(nn_dist), nn_dist, np.nan)
+
+    return pd.DataFrame({
+        "Species": species,
+        "Specimens": group_size,
+        "Mean_Intraspecific": mean_intra,
+        "Max_Intraspecific": max_intra,
+        "Mean_Interspecific": mean_inter,
+        "Nearest_Neighbour_Distance": nearest_dist,
+        "Nearest_Neighbour": [species[c] if c >= 0 else None for c in nn_code],
+        "Barcode_Gap": nearest_dist - max_intra,
+    })
@@ -1,55 +1,141 @@
 import pandas as pd
-import matplotlib.pyplot as plt
 import numpy as np
-import seaborn as sns
+import os
+from entropy_state import saved_chain_counts
+from entropy_windows import windowed_entropy_table, conserved_regions_table
+from entropy_landscape_io import landscape_chains
 
-# Load the combined entropy landscape data
-entropy_data = pd.read_csv('combined_entropy_landscape.csv')
+# Chain alignments; recounted (through the entropy cache, with the alphabet and gap handling in
+# <prefix>.params.json) only for chains missing from both the saved landscape and the incremental state
+fasta_files = ["ChainA_aligned.fas", "ChainB_aligned.fas", "ChainC_aligned.fas", "ChainD_aligned.fas", "ChainE_aligned.fas"]
 
-# Extract positions and chain names
-positions = entropy_data['Position']
-chain_names = entropy_data.columns[1:]
+# Saved combined landscape: <prefix>.npy/.json (binary, preferred) or <prefix>.csv; it includes
+# incremental updates, so it takes precedence over the alignments
+landscape_prefix = 'combined_entropy_landscape'
 
-# Dynamic figure size based on number of chains
-num_chains = len(chain_names)
-fig, axes = plt.subplots(num_chains, 1, figsize=(18, 4 * num_chains), sharex=True)
+# Chains to plot (None plots fasta_files, or every saved chain when an alignment is missing);
+# with the binary landscape only these chains are read
+selected_chains = None
 
-# Ensure axes is iterable
-if num_chains == 1:
-    axes = [axes]
+# 'decimated' draws a per-pixel min/max envelope with rasterized fills (constant time for long
+# alignments); 'full' plots every position
+plot_mode = 'decimated'
 
-# Color palette
-palette = sns.color_palette('tab10', num_chains)
+# Sliding windows (columns) for smoothed entropy and conserved-region detection ([] disables);
+# pooled window entropy is added when the alignments (and so their count matrices) are available
+window_sizes = [25, 100]
+windowed_output_file = 'combined_windowed_entropy.csv'
+regions_output_file = 'combined_conserved_regions.csv'
 
-for idx, chain in enumerate(chain_names):
-    ax = axes[idx]
-    entropy_values = entropy_data[chain]
+# Headless runs write the windowed entropy and conserved regions but skip the plots
+headless = False
 
-    # Thresholds for highlights
-    low_entropy_threshold = np.percentile(entropy_values.dropna(), 25)
-    high_entropy_threshold = np.percentile(entropy_values.dropna(), 75)
+def load_chain_entropies():
+    """
+    ({chain: entropy}, {chain: count matrix}) with each chain at its own length (no padding), as the
+    entropy stage saved them (landscape, then incremental state), recounting only what is missing.
+    """
+    files = {os.path.splitext(fasta_file)[0]: fasta_file for fasta_file in fasta_files}
+    chains = selected_chains
+    if chains is None:
+        chains = list(files) if all(os.path.exists(fasta_file) for fasta_file in fasta_files) \
+            else landscape_chains(landscape_prefix)
+    results = saved_chain_counts([files.get(chain) for chain in chains], landscape_prefix, chains)
+    chain_entropies = {chain: entropy for chain, (_, entropy) in zip(chains, results)}
+    chain_counts = {chain: counts for chain, (counts, _) in zip(chains, results) if counts is not None}
+    return chain_entropies, chain_counts
 
-    # Plot entropy
-    ax.plot(positions, entropy_values, color=palette[idx], linewidth=1.5)
+def main():
+    chain_entropies, chain_counts = load_chain_entropies()
+    chain_names = list(chain_entropies)
+    max_length = max(len(scores) for scores in chain_entropies.values())
 
-    # Highlight regions
-    ax.fill_between(positions, entropy_values, low_entropy_threshold,
-                    where=(entropy_values <= low_entropy_threshold),
-                    color=palette[idx], alpha=0.15, label='Low Entropy')
+    # Window-smoothed entropy per chain; windows whose mean is in the chain's low-entropy range are conserved
+    windowed = pd.DataFrame({'Position': np.arange(1, max_length + 1)})
+    if window_sizes:
+        region_tables = []
+        for chain in chain_names:
+            entropy_values = chain_entropies[chain]
+            table = windowed_entropy_table(entropy_values, chain_counts.get(chain), window_sizes)
+            for column in table.columns[2:]:
+                windowed[f"{chain}_{column}"] = table[column]
 
-    ax.fill_between(positions, entropy_values, high_entropy_threshold,
-                    where=(entropy_values >= high_entropy_threshold),
-                    color=palette[idx], alpha=0.25, label='High Entropy')
+            regions = conserved_regions_table(entropy_values, window_sizes, np.nanpercentile(entropy_values, 25))
+            regions.insert(0, 'Chain', chain)
+            region_tables.append(regions)
+        windowed.to_csv(windowed_output_file, index=False)
+        pd.concat(region_tables, ignore_index=True).to_csv(regions_output_file, index=False)
+        print(f"Windowed entropy saved as {windowed_output_file}, conserved regions as {regions_output_file}")
 
-    ax.set_ylabel('Entropy', fontsize=12)
-    ax.set_title(f"{chain} Entropy Landscape", fontsize=14, fontweight='bold')
-    ax.grid(True, linestyle='--', alpha=0.3)
-    ax.legend()
+    if not headless:
+        plot_chain_landscapes(chain_entropies, windowed)
 
-# Shared X-axis label
-plt.xlabel('Position in Alignment', fontsize=14)
+def plot_chain_landscapes(chain_entropies, windowed):
+    """One entropy landscape panel per chain with window means and low/high entropy highlights."""
+    import matplotlib.pyplot as plt
+    import seaborn as sns
+    from landscape_plot import decimate_series
 
-# Adjust spacing to prevent overlap
-plt.subplots_adjust(hspace=0.4)
+    chain_names = list(chain_entropies)
 
-plt.show()
+    # Dynamic figure size based on number of chains
+    num_chains = len(chain_names)
+    fig, axes = plt.subplots(num_chains, 1, figsize=(18, 4 * num_chains), sharex=True)
+
+    # Ensure axes is iterable
+    if num_chains == 1:
+        axes = [axes]
+
+    # Color palette
+    palette = sns.color_palette('tab10', num_chains)
+
+    for idx, chain in enumerate(chain_names):
+        ax = axes[idx]
+        entropy_values = chain_entropies[chain]
+        positions = np.arange(1, len(entropy_values) + 1)
+
+        # Thresholds for highlights
+        low_entropy_threshold = np.nanpercentile(entropy_values, 25)
+        high_entropy_threshold = np.nanpercentile(entropy_values, 75)
+
+        decimated = plot_mode == 'decimated'
+        if decimated:
+            plot_positions, plot_values = decimate_series(positions, entropy_values, ax)
+        else:
+            plot_positions, plot_values = positions, entropy_values
+
+        # Plot entropy
+        ax.plot(plot_positions, plot_values, color=palette[idx], linewidth=1.5)
+
+        # Overlay the window means, darker for wider windows
+        for i, window in enumerate(window_sizes):
+            window_positions, window_values = positions, windowed[f"{chain}_Mean_w{window}"].to_numpy()[:len(positions)]
+            if decimated:
+                window_positions, window_values = decimate_series(window_positions, window_values, ax)
+            ax.plot(window_positions, window_values, color='black', alpha=0.4 + 0.5 * (i + 1) / len(window_sizes),
+                    linewidth=1, label=f"{window}-Column Mean")
+
+        # Highlight regions
+        ax.fill_between(plot_positions, plot_values, low_entropy_threshold,
+                        where=(plot_values <= low_entropy_threshold),
+                        color=palette[idx], alpha=0.15, label='Low Entropy', rasterized=decimated)
+
+        ax.fill_between(plot_positions, plot_values, high_entropy_threshold,
+                        where=(plot_values >= high_entropy_threshold),
+                        color=palette[idx], alpha=0.25, label='High Entropy', rasterized=decimated)
+
+        ax.set_ylabel('Entropy', fontsize=12)
+        ax.set_title(f"{chain} Entropy Landscape", fontsize=14, fontweight='bold')
+        ax.grid(True, linestyle='--', alpha=0.3)
+        ax.legend(loc='upper right' if decimated else 'best')  # 'best' scans every filled polygon
+
+    # Shared X-axis label
+    plt.xlabel('Position in Alignment', fontsize=14)
+
+    # Adjust spacing to prevent overlap
+    plt.subplots_adjust(hspace=0.4)
+
+    plt.show()
+
+if __name__ == "__main__":
+    main()
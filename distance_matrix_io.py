@@ -0,0 +1,164 @@
+import json
+import os
+import numpy as np
+import pandas as pd
+
+# Rows parsed per chunk when reading a text distance matrix
+PARSE_CHUNK_ROWS = 512
+
+# Side of the mirrored tiles compared when filling blank cells from the other triangle
+SYMMETRIZE_TILE = 4096
+
+# ===== Text parsing =====
+def iter_distance_tsv(file, chunk_rows=PARSE_CHUNK_ROWS):
+    """
+    Yield (labels, values) row chunks of a tab-separated square distance matrix.
+    values is a float64 array with blank cells as NaN; labels come from the first column.
+    """
+    with open(file, "r") as f:
+        n = len(f.readline().rstrip("\n").split("\t")) - 1
+
+    dtypes = {0: str}
+    dtypes.update({i: np.float64 for i in range(1, n + 1)})
+    for chunk in pd.read_csv(file, sep="\t", header=None, skiprows=1, names=range(n + 1), dtype=dtypes,
+                             chunksize=chunk_rows):
+        yield chunk.iloc[:, 0].str.strip().tolist(), chunk.iloc[:, 1:n + 1].to_numpy()
+
+def read_distance_tsv(file, dtype=np.float32, chunk_rows=PARSE_CHUNK_ROWS):
+    """Parse a tab-separated distance matrix straight into (labels, ndarray) without string copies."""
+    labels, matrix, row = [], None, 0
+    for chunk_labels, values in iter_distance_tsv(file, chunk_rows):
+        if matrix is None:
+            matrix = np.empty((values.shape[1], values.shape[1]), dtype=dtype)
+        matrix[row:row + len(values)] = values
+        labels.extend(chunk_labels)
+        row += len(values)
+    return labels, matrix[:row]
+
+def symmetrize(matrix, tile=SYMMETRIZE_TILE):
+    """
+    Fill NaN cells of a square matrix (ndarray or writable np.memmap) in place from the transposed
+    cell, one pair of mirrored tiles at a time, so triangular exports become symmetric in a single
+    pass. Cells blank on both sides stay NaN.
+    """
+    n = matrix.shape[0]
+    for i in range(0, n, tile):
+        for j in range(i, n, tile):
+            upper = np.array(matrix[i:i + tile, j:j + tile])
+            lower = np.array(matrix[j:j + tile, i:i + tile]).T
+            fill_upper = np.isnan(upper) & ~np.isnan(lower)
+            if fill_upper.any():
+                upper[fill_upper] = lower[fill_upper]
+                matrix[i:i + tile, j:j + tile] = upper
+            fill_lower = np.isnan(lower) & ~np.isnan(upper)
+            if i != j and fill_lower.any():
+                lower[fill_lower] = upper[fill_lower]
+                matrix[j:j + tile, i:i + tile] = lower.T
+    return matrix
+
+# ===== Binary memory-mapped format =====
+def _source_stamp(file):
+    """Absolute path, size and mtime of a text matrix, as recorded in the index of its binary copy."""
+    stat = os.stat(file)
+    return {"path": os.path.abspath(file), "size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+
+def _condensed_offsets(n):
+    """Start of each row in an upper-triangle (diagonal included) condensed array."""
+    i = np.arange(n, dtype=np.int64)
+    return i * n - i * (i - 1) // 2
+
+def convert_distance_matrix(file, prefix, dtype=np.float32, layout="square", chunk_rows=PARSE_CHUNK_ROWS):
+    """
+    Convert a tab-separated distance matrix once into <prefix>.npy plus a <prefix>.json label index.
+    layout="square" stores the full matrix, layout="condensed" only the upper triangle with the
+    diagonal (about half the size). Either way blank cells are filled from the other triangle
+    here, once, so readers can take contiguous row blocks as they are (symmetric=True in
+    barcode_gap_statistics and pcoa). Rows are streamed into the memory-mapped output, so the
+    matrix is never fully held in RAM. The index records the source file's path, size and mtime.
+    """
+    if layout not in ("square", "condensed"):
+        raise ValueError(f"Unknown matrix layout: {layout}")
+    with open(file, "r") as f:
+        n = len(f.readline().rstrip("\n").split("\t")) - 1
+
+    size = (n, n) if layout == "square" else (n * (n + 1) // 2,)
+    out = np.lib.format.open_memmap(f"{prefix}.npy", mode="w+", dtype=dtype, shape=size)
+    offsets = _condensed_offsets(n)
+
+    labels, row, blank = [], 0, False
+    for chunk_labels, values in iter_distance_tsv(file, chunk_rows):
+        blank = blank or bool(np.isnan(values).any())
+        if layout == "square":
+            out[row:row + len(values)] = values
+        else:
+            for r, values_row in enumerate(values, start=row):
+                out[offsets[r]:offsets[r] + n - r] = values_row[r:]
+                # Lower-triangle cells fill (j, r) entries still missing above the diagonal
+                targets = offsets[:r] + (r - np.arange(r))
+                missing = np.isnan(out[targets])
+                out[targets[missing]] = values_row[:r][missing]
+        labels.extend(chunk_labels)
+        row += len(values)
+
+    if row != n:
+        raise ValueError(f"{file} has {row} rows but {n} columns")
+    if layout == "square" and blank:
+        symmetrize(out)
+    out.flush()
+    del out
+
+    with open(f"{prefix}.json", "w") as f:
+        json.dump({"labels": labels, "layout": layout, "n": n, "symmetric": True, "source": _source_stamp(file)}, f)
+
+class CondensedDistanceMatrix:
+    """Square view of a condensed upper-triangle matrix, supporting row and column block slices."""
+
+    def __init__(self, condensed, n):
+        self.condensed = condensed
+        self.n = n
+        self.shape = (n, n)
+        self.offsets = _condensed_offsets(n)
+
+    def rows(self, start, stop):
+        r = np.arange(start, min(stop, self.n), dtype=np.int64)[:, None]
+        c = np.arange(self.n, dtype=np.int64)[None, :]
+        low, high = np.minimum(r, c), np.maximum(r, c)
+        return np.asarray(self.condensed[self.offsets[low] + (high - low)])
+
+    def __getitem__(self, key):
+        if isinstance(key, slice):
+            start, stop, _ = key.indices(self.n)
+            return self.rows(start, stop)
+        if isinstance(key, tuple) and len(key) == 2 and key[0] == slice(None) and isinstance(key[1], slice):
+            start, stop, _ = key[1].indices(self.n)
+            return self.rows(start, stop).T  # Symmetric
+        raise TypeError("CondensedDistanceMatrix supports only row or column block slices")
+
+def open_distance_matrix(prefix):
+    """Open a converted matrix memory-mapped (no copy into RAM); returns (labels, matrix)."""
+    with open(f"{prefix}.json", "r") as f:
+        index = json.load(f)
+    data = np.load(f"{prefix}.npy", mmap_mode="r")
+    if index["layout"] == "condensed":
+        return index["labels"], CondensedDistanceMatrix(data, index["n"])
+    return index["labels"], data
+
+def load_distance_matrix(file, prefix=None, dtype=np.float32, layout="square"):
+    """
+    Open the binary copy of a text distance matrix, converting it first if it is missing, was
+    converted from another file (or another version of this one: path, size and mtime must match
+    the index) or is not yet symmetrized. Without the text file an existing copy is used as is.
+    Returns (labels, matrix).
+    """
+    prefix = prefix or os.path.splitext(file)[0]
+    binary_file, index_file = f"{prefix}.npy", f"{prefix}.json"
+    stale = not (os.path.exists(binary_file) and os.path.exists(index_file))
+    if not stale:
+        with open(index_file, "r") as f:
+            index = json.load(f)
+        stale = index["layout"] != layout or not index.get("symmetric", False)
+        if not stale and os.path.exists(file):
+            stale = index.get("source") != _source_stamp(file)
+    if stale:
+        convert_distance_matrix(file, prefix, dtype=dtype, layout=layout)
+    return open_distance_matrix(prefix)
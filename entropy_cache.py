@@ -0,0 +1,134 @@
+import hashlib
+import json
+import os
+import time
+import numpy as np
+from entropy_engine import path_column_counts, select_symbols, entropy_from_counts
+
+# Cache location and eviction limits
+CACHE_DIR = os.environ.get("ENTROPY_CACHE_DIR", ".entropy_cache")
+CACHE_MAX_BYTES = 1 << 30  # 1 GiB
+CACHE_MAX_AGE_DAYS = 30
+
+# Bump when the engine output changes so stale entries are never reused
+CACHE_VERSION = 1
+
+DIGEST_INDEX = "digest_index.json"
+
+# ===== Content hashing =====
+def file_digest(path, cache_dir=CACHE_DIR):
+    """
+    SHA-256 of a file's content. Digests are remembered per (path, size, mtime) in the cache
+    directory so unchanged alignments are not re-read on every run.
+    """
+    stat = os.stat(path)
+    stamp = f"{os.path.abspath(path)}|{stat.st_size}|{stat.st_mtime_ns}"
+    index_file = os.path.join(cache_dir, DIGEST_INDEX)
+
+    index = {}
+    if os.path.exists(index_file):
+        try:
+            with open(index_file, "r") as f:
+                index = json.load(f)
+        except (OSError, ValueError):
+            index = {}
+    if stamp in index:
+        return index[stamp]
+
+    sha = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            sha.update(block)
+    digest = sha.hexdigest()
+
+    # Keep one digest per path
+    prefix = stamp.rsplit("|", 2)[0] + "|"
+    index = {k: v for k, v in index.items() if not k.startswith(prefix)}
+    index[stamp] = digest
+    os.makedirs(cache_dir, exist_ok=True)
+    with open(index_file, "w") as f:
+        json.dump(index, f)
+    return digest
+
+def entropy_cache_key(path, alphabet=None, gap_handling="symbol", cache_dir=CACHE_DIR):
+    """Cache key from the alignment content hash plus the entropy parameters."""
+    params = json.dumps({"version": CACHE_VERSION, "alphabet": alphabet, "gap_handling": gap_handling},
+                        sort_keys=True)
+    return hashlib.sha256(f"{file_digest(path, cache_dir)}|{params}".encode()).hexdigest()
+
+# ===== Entries =====
+def load_entry(key, cache_dir=CACHE_DIR):
+    """Return (counts, symbols, entropy) for a cache key, or None on a miss."""
+    entry_file = os.path.join(cache_dir, f"{key}.npz")
+    if not os.path.exists(entry_file):
+        return None
+    try:
+        with np.load(entry_file) as entry:
+            result = entry["counts"].astype(np.int64), entry["symbols"], entry["entropy"]
+    except (OSError, ValueError, KeyError):
+        return None
+    os.utime(entry_file)  # Mark as recently used for eviction
+    return result
+
+def store_entry(key, counts, symbols, entropy, cache_dir=CACHE_DIR):
+    """Write counts (narrowest unsigned dtype), symbols and entropy as a compressed .npz entry."""
+    os.makedirs(cache_dir, exist_ok=True)
+    count_dtype = np.min_scalar_type(int(counts.max()) if counts.size else 0)
+    tmp_file = os.path.join(cache_dir, f"{key}.tmp.npz")
+    np.savez_compressed(tmp_file, counts=counts.astype(count_dtype), symbols=symbols, entropy=entropy)
+    os.replace(tmp_file, os.path.join(cache_dir, f"{key}.npz"))
+    evict(cache_dir)
+
+def evict(cache_dir=CACHE_DIR, max_bytes=CACHE_MAX_BYTES, max_age_days=CACHE_MAX_AGE_DAYS):
+    """Drop entries older than max_age_days, then least recently used ones until under max_bytes."""
+    if not os.path.isdir(cache_dir):
+        return
+    entries = []
+    for name in os.listdir(cache_dir):
+        if name.endswith(".npz"):
+            path = os.path.join(cache_dir, name)
+            stat = os.stat(path)
+            entries.append((stat.st_mtime, stat.st_size, path))
+
+    cutoff = time.time() - max_age_days * 86400
+    total = sum(size for _, size, _ in entries)
+    for mtime, size, path in sorted(entries):
+        if mtime < cutoff or total > max_bytes:
+            os.remove(path)
+            total -= size
+
+def clear(cache_dir=CACHE_DIR):
+    """Remove every cache entry."""
+    evict(cache_dir, max_bytes=-1)
+
+# ===== Cached entropy =====
+def cached_counts(paths, compute_counts=None, alphabet=None, gap_handling="symbol", cache_dir=CACHE_DIR):
+    """
+    (counts, symbols, entropy) for each alignment, reusing cached results.
+    compute_counts(missing_paths) must return raw (counts, symbols) for each missing path;
+    by default alignments are streamed one at a time.
+    """
+    if compute_counts is None:
+        compute_counts = lambda missing: [path_column_counts(path) for path in missing]
+
+    keys = [entropy_cache_key(path, alphabet, gap_handling, cache_dir) for path in paths]
+    results = [load_entry(key, cache_dir) for key in keys]
+
+    missing = [i for i, result in enumerate(results) if result is None]
+    if missing:
+        computed = compute_counts([paths[i] for i in missing])
+        for i, (counts, symbols) in zip(missing, computed):
+            counts, symbols = select_symbols(counts, symbols, alphabet, gap_handling)
+            entropy = entropy_from_counts(counts)
+            store_entry(keys[i], counts, symbols, entropy, cache_dir)
+            results[i] = counts, symbols, entropy
+
+    return results
+
+def cached_entropies(paths, compute_counts=None, alphabet=None, gap_handling="symbol", cache_dir=CACHE_DIR):
+    """Per-column entropy for each alignment, reusing cached results (see cached_counts)."""
+    return [entropy for _, _, entropy in cached_counts(paths, compute_counts, alphabet, gap_handling, cache_dir)]
+
+def cached_positional_entropy(path, alphabet=None, gap_handling="symbol", cache_dir=CACHE_DIR):
+    """Per-column entropy for one alignment, reusing a cached result when available."""
+    return cached_entropies([path], alphabet=alphabet, gap_handling=gap_handling, cache_dir=cache_dir)[0]
@@ -0,0 +1,271 @@
+import math
+import os
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+
+# Upper bound on matrix cells compared at once, keeps boolean temporaries small
+ROW_CHUNK_CELLS = 1 << 24
+
+# Sequences read per chunk in streaming mode
+STREAM_CHUNK_SIZE = 1024
+
+# Symbols treated as alignment gaps
+GAP_SYMBOLS = b"-."
+
+# Columns per task when long alignments are split across a process pool
+PARALLEL_BLOCK_COLUMNS = 4096
+
+# ===== Reference implementation (original column-by-column loop) =====
+def calculate_positional_entropy_reference(alignment):
+    """Shannon entropy per alignment column, computed one column at a time."""
+    alignment_length = alignment.get_alignment_length()
+    entropy_scores = np.zeros(alignment_length)
+
+    for column in range(alignment_length):
+        column_bases = alignment[:, column]
+        base_frequencies = {base: column_bases.count(base) / len(column_bases) for base in set(column_bases)}
+        entropy = -sum([freq * math.log(freq, 2) for freq in base_frequencies.values()])
+        entropy_scores[column] = entropy
+
+    return entropy_scores
+
+# ===== Vectorized engine =====
+def encode_alignment(alignment):
+    """Encode an alignment once as an (n_sequences, length) uint8 matrix of ASCII codes."""
+    length = alignment.get_alignment_length()
+    raw = b"".join(str(record.seq).encode("ascii") for record in alignment)
+    return np.frombuffer(raw, dtype=np.uint8).reshape(len(alignment), length)
+
+def _row_chunks(matrix):
+    """Yield row blocks of the matrix small enough to compare in one pass."""
+    rows = max(1, ROW_CHUNK_CELLS // max(matrix.shape[1], 1))
+    for start in range(0, matrix.shape[0], rows):
+        yield matrix[start:start + rows]
+
+def alignment_symbols(matrix):
+    """Return the sorted uint8 codes of every symbol present in the matrix."""
+    seen = np.zeros(256, dtype=np.int64)
+    for block in _row_chunks(matrix):
+        seen += np.bincount(block.ravel(), minlength=256)
+    return np.flatnonzero(seen).astype(np.uint8)
+
+def column_counts(matrix, symbols=None):
+    """
+    Count every symbol in every column of an encoded alignment.
+    Returns (counts, symbols) where counts has shape (len(symbols), length).
+    """
+    if symbols is None:
+        symbols = alignment_symbols(matrix)
+    counts = np.zeros((len(symbols), matrix.shape[1]), dtype=np.int64)
+    for block in _row_chunks(matrix):
+        for i, symbol in enumerate(symbols):
+            counts[i] += np.count_nonzero(block == symbol, axis=0)
+    return counts, symbols
+
+def entropy_from_counts(counts):
+    """Shannon entropy (bits) of each column of a (symbols, length) count matrix."""
+    totals = counts.sum(axis=0)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        freqs = counts / totals
+        terms = np.where(counts > 0, freqs * (np.log(freqs) / math.log(2)), 0.0)
+    return -terms.sum(axis=0)
+
+def select_symbols(counts, symbols, alphabet=None, gap_handling="symbol"):
+    """
+    Restrict a count matrix to an alphabet (e.g. "ACGT", None keeps every symbol) and apply
+    gap handling: "symbol" counts gaps as a state, "ignore" drops them from the column totals.
+    Returns (counts, symbols).
+    """
+    if gap_handling not in ("symbol", "ignore"):
+        raise ValueError(f"Unknown gap handling: {gap_handling}")
+    keep = np.ones(len(symbols), dtype=bool)
+    if alphabet is not None:
+        keep &= np.isin(symbols, np.frombuffer(alphabet.encode("ascii"), dtype=np.uint8))
+    if gap_handling == "ignore":
+        keep &= ~np.isin(symbols, np.frombuffer(GAP_SYMBOLS, dtype=np.uint8))
+    if keep.all():
+        return counts, symbols
+    return counts[keep], symbols[keep]
+
+def calculate_positional_entropy(alignment, method="vectorized"):
+    """
+    Shannon entropy per alignment column.
+    method="vectorized" encodes the alignment once and counts all columns in bulk,
+    method="reference" runs the original column-by-column loop.
+    """
+    if method == "reference":
+        return calculate_positional_entropy_reference(alignment)
+    if method != "vectorized":
+        raise ValueError(f"Unknown entropy method: {method}")
+
+    counts, _ = column_counts(encode_alignment(alignment))
+    return entropy_from_counts(counts)
+
+# ===== Out-of-core streaming =====
+def accumulate_counts(counts, symbols, block):
+    """
+    Add the per-column symbol counts of an encoded row block into (counts, symbols).
+    The alphabet grows (kept sorted) as new symbols appear. Returns (counts, symbols).
+    """
+    block_counts, block_symbols = column_counts(block)
+    new_symbols = np.setdiff1d(block_symbols, symbols)
+    if len(new_symbols):
+        merged = np.union1d(symbols, new_symbols).astype(np.uint8)
+        grown = np.zeros((len(merged), block.shape[1]), dtype=np.int64)
+        grown[np.searchsorted(merged, symbols)] = counts
+        counts, symbols = grown, merged
+    counts[np.searchsorted(symbols, block_symbols)] += block_counts
+    return counts, symbols
+
+def merge_counts(counts, symbols, other_counts, other_symbols, sign=1):
+    """
+    Add (sign=1) or subtract (sign=-1) one count matrix into another over the union of
+    their alphabets. Returns (counts, symbols); subtracting more than is present raises ValueError.
+    """
+    if counts.shape[1] != other_counts.shape[1]:
+        raise ValueError(f"Alignment lengths differ ({counts.shape[1]} vs {other_counts.shape[1]} columns)")
+    merged = np.union1d(symbols, other_symbols).astype(np.uint8)
+    result = np.zeros((len(merged), counts.shape[1]), dtype=np.int64)
+    result[np.searchsorted(merged, symbols)] = counts
+    result[np.searchsorted(merged, other_symbols)] += sign * np.asarray(other_counts, dtype=np.int64)
+    if (result < 0).any():
+        raise ValueError("Removed sequences are not part of the counted alignment")
+    return result, merged
+
+def iter_fasta_chunks(fasta_file, chunk_size=STREAM_CHUNK_SIZE):
+    """Yield an aligned FASTA file as uint8 row blocks of at most chunk_size sequences."""
+    from Bio.SeqIO.FastaIO import SimpleFastaParser
+
+    length = None
+    rows = []
+    with open(fasta_file, "r") as handle:
+        for title, sequence in SimpleFastaParser(handle):
+            row = sequence.encode("ascii")
+            if length is None:
+                length = len(row)
+            elif len(row) != length:
+                raise ValueError(f"Sequence '{title}' in {fasta_file} has length {len(row)}, expected {length}")
+            rows.append(row)
+            if len(rows) == chunk_size:
+                yield np.frombuffer(b"".join(rows), dtype=np.uint8).reshape(len(rows), length)
+                rows = []
+    if rows:
+        yield np.frombuffer(b"".join(rows), dtype=np.uint8).reshape(len(rows), length)
+
+def _accumulate_blocks(blocks):
+    counts, symbols = None, np.zeros(0, dtype=np.uint8)
+    for block in blocks:
+        if counts is None:
+            counts = np.zeros((0, block.shape[1]), dtype=np.int64)
+        counts, symbols = accumulate_counts(counts, symbols, block)
+    if counts is None:
+        raise ValueError("Alignment contains no sequences")
+    return counts, symbols
+
+def stream_column_counts(fasta_file, chunk_size=STREAM_CHUNK_SIZE):
+    """Per-column symbol counts of a FASTA alignment, reading chunk_size sequences at a time."""
+    return _accumulate_blocks(iter_fasta_chunks(fasta_file, chunk_size))
+
+def encode_fasta_to_memmap(fasta_file, memmap_file, chunk_size=STREAM_CHUNK_SIZE):
+    """
+    Write a fixed-width uint8 copy of a FASTA alignment to a .npy file that can be memory-mapped.
+    Returns the (n_sequences, length) shape of the encoded matrix.
+    """
+    n_sequences, length = 0, None
+    for block in iter_fasta_chunks(fasta_file, chunk_size):
+        n_sequences += block.shape[0]
+        length = block.shape[1]
+    if length is None:
+        raise ValueError(f"{fasta_file} contains no sequences")
+
+    matrix = np.lib.format.open_memmap(memmap_file, mode="w+", dtype=np.uint8, shape=(n_sequences, length))
+    row = 0
+    for block in iter_fasta_chunks(fasta_file, chunk_size):
+        matrix[row:row + block.shape[0]] = block
+        row += block.shape[0]
+    matrix.flush()
+    del matrix
+    return n_sequences, length
+
+def memmap_column_counts(memmap_file, chunk_size=STREAM_CHUNK_SIZE):
+    """Per-column symbol counts of a memory-mapped encoded alignment, chunk_size rows at a time."""
+    matrix = np.load(memmap_file, mmap_mode="r")
+    return _accumulate_blocks(matrix[start:start + chunk_size]
+                              for start in range(0, matrix.shape[0], chunk_size))
+
+def path_column_counts(path, chunk_size=STREAM_CHUNK_SIZE):
+    """Streaming counts for a .npy memory-mapped alignment or a FASTA file."""
+    if path.endswith(".npy"):
+        return memmap_column_counts(path, chunk_size)
+    return stream_column_counts(path, chunk_size)
+
+def streaming_positional_entropy(path, chunk_size=STREAM_CHUNK_SIZE):
+    """
+    Shannon entropy per column without holding the alignment in memory.
+    .npy paths are read as memory-mapped encoded alignments, anything else as FASTA.
+    """
+    counts, _ = path_column_counts(path, chunk_size)
+    return entropy_from_counts(counts)
+
+def chain_column_counts(path, read_mode="in-memory", chunk_size=STREAM_CHUNK_SIZE):
+    """Per-column counts for one chain, loading it with AlignIO or streaming it in chunks."""
+    if read_mode == "streaming":
+        return path_column_counts(path, chunk_size)
+    if read_mode != "in-memory":
+        raise ValueError(f"Unknown read mode: {read_mode}")
+    from Bio import AlignIO
+
+    return column_counts(encode_alignment(AlignIO.read(path, "fasta")))
+
+# ===== Parallel execution =====
+def _prepare_chain(path, memmap_file, chunk_size):
+    """Worker: make sure the chain exists as an encoded .npy and return (npy path, shape, symbols)."""
+    if not path.endswith(".npy"):
+        encode_fasta_to_memmap(path, memmap_file, chunk_size)
+        path = memmap_file
+    matrix = np.load(path, mmap_mode="r")
+    symbols = np.zeros(0, dtype=np.uint8)
+    for start in range(0, matrix.shape[0], chunk_size):
+        symbols = np.union1d(symbols, alignment_symbols(matrix[start:start + chunk_size])).astype(np.uint8)
+    return path, matrix.shape, symbols
+
+def _block_counts(path, start, stop, symbols):
+    """Worker: counts for columns [start, stop) of a memory-mapped chain over a fixed alphabet."""
+    matrix = np.load(path, mmap_mode="r")
+    counts, _ = column_counts(matrix[:, start:stop], symbols)
+    return counts
+
+def parallel_column_counts(paths, workers=None, block_columns=PARALLEL_BLOCK_COLUMNS,
+                           chunk_size=STREAM_CHUNK_SIZE):
+    """
+    Per-column symbol counts for several alignments (FASTA or encoded .npy) on a process pool.
+    Chains are encoded in parallel, then every chain is split into column blocks that are
+    counted independently over the chain's full alphabet. Returns a list of (counts, symbols)
+    in input order, identical to the serial engine for any worker count.
+    """
+    workers = workers or os.cpu_count()
+    with tempfile.TemporaryDirectory(prefix="entropy_") as tmp_dir, \
+            ProcessPoolExecutor(max_workers=workers) as pool:
+        prepared = [pool.submit(_prepare_chain, path, os.path.join(tmp_dir, f"chain_{i}.npy"), chunk_size)
+                    for i, path in enumerate(paths)]
+        prepared = [future.result() for future in prepared]
+
+        block_futures = []
+        for npy_path, (_, length), symbols in prepared:
+            block_futures.append([pool.submit(_block_counts, npy_path, start, min(start + block_columns, length), symbols)
+                                  for start in range(0, length, block_columns)])
+
+        results = []
+        for futures, (_, _, symbols) in zip(block_futures, prepared):
+            blocks = [future.result() for future in futures]
+            # A chain without columns has no blocks; return empty counts as the serial engine does
+            counts = np.concatenate(blocks, axis=1) if blocks else np.zeros((len(symbols), 0), dtype=np.int64)
+            results.append((counts, symbols))
+        return results
+
+def parallel_positional_entropy(paths, workers=None, block_columns=PARALLEL_BLOCK_COLUMNS,
+                                chunk_size=STREAM_CHUNK_SIZE):
+    """Shannon entropy per column for several alignments, computed on a process pool."""
+    return [entropy_from_counts(counts)
+            for counts, _ in parallel_column_counts(paths, workers, block_columns, chunk_size)]
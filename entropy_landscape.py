@@ -1,55 +1,133 @@
 import pandas as pd
-import matplotlib.pyplot as plt
 import numpy as np
+import os
+from entropy_state import saved_chain_counts
+from entropy_landscape_io import landscape_chains
+from entropy_windows import windowed_entropy_table, conserved_regions_table
 
-# Load the positional entropy data
-entropy_data = pd.read_csv('positional_entropy.csv')
+# Aligned COX1 sequences; its chain (landscape_chain, default the file name without extension) is
+# read from the saved combined landscape or incremental state when present, otherwise recounted
+# through the entropy cache with the alphabet and gap handling in <prefix>.params.json
+alignment_file = 'cox1_aligned.fas'
 
-# Extract position and entropy values
-positions = entropy_data['Position']
-entropy_values = entropy_data['Entropy']
+# Saved combined landscape (<prefix>.npy/.json, only that chain is read, or <prefix>.csv).
+# Without it or the alignment, falls back to entropy_csv_file (Position, Entropy)
+landscape_prefix = 'combined_entropy_landscape'
+landscape_chain = None  # e.g. 'ChainA_aligned'
+entropy_csv_file = 'positional_entropy.csv'
 
-# Define thresholds for low and high entropy
-low_entropy_threshold = np.percentile(entropy_values, 25)  # Lower 25% as low entropy
-high_entropy_threshold = np.percentile(entropy_values, 75)  # Upper 25% as high entropy
+# 'decimated' draws a per-pixel min/max envelope with rasterized fills (constant time for long
+# alignments); 'full' plots every position
+plot_mode = 'decimated'
 
-# Identify low and high entropy positions
-low_entropy_positions = positions[entropy_values <= low_entropy_threshold]
-high_entropy_positions = positions[entropy_values >= high_entropy_threshold]
+# Sliding windows (columns) for smoothed entropy and conserved-region detection ([] disables);
+# pooled window entropy is added when the alignment (and so its count matrix) is available
+window_sizes = [25, 100]
+windowed_output_file = 'windowed_entropy.csv'
+regions_output_file = 'conserved_regions.csv'
 
-# Create figure
-plt.figure(figsize=(12, 6))
+# Headless runs write the windowed entropy and conserved regions but skip the plot
+headless = False
 
-# Plot the entropy curve
-plt.plot(positions, entropy_values, linestyle='-', color='black', linewidth=1.5, label="Entropy", alpha=0.9)
+def load_entropy():
+    """
+    (positions, entropy values, count matrix or None) as the entropy stage saved them (landscape chain,
+    then incremental state), from a recount of the alignment, or from the CSV.
+    """
+    chain = landscape_chain or (os.path.splitext(alignment_file)[0] if alignment_file else None)
+    fasta_file = alignment_file if alignment_file and os.path.exists(alignment_file) else None
+    counts = None
+    if fasta_file or chain in landscape_chains(landscape_prefix):
+        counts, entropy = saved_chain_counts([fasta_file], landscape_prefix, [chain])[0]
+        entropy_values = pd.Series(entropy)
+        positions = pd.Series(np.arange(1, len(entropy_values) + 1))
+    else:
+        # Load the positional entropy data
+        entropy_data = pd.read_csv(entropy_csv_file)
 
-# Highlight low entropy regions in cyan
-plt.fill_between(positions, entropy_values, low_entropy_threshold,
-                 where=(entropy_values <= low_entropy_threshold),
-                 color='cyan', alpha=0.5, label="Low Entropy Regions (Conserved)")
+        # Extract position and entropy values
+        positions = entropy_data['Position']
+        entropy_values = entropy_data['Entropy']
+    return positions, entropy_values, counts
 
-# Highlight high entropy regions in red
-plt.fill_between(positions, entropy_values, high_entropy_threshold,
-                 where=(entropy_values >= high_entropy_threshold),
-                 color='red', alpha=0.5, label="High Entropy Regions (Variable)")
+def main():
+    positions, entropy_values, counts = load_entropy()
 
-# Add vertical grid lines at low entropy positions
-for pos in low_entropy_positions[::5]:  # Plot every 5th position to reduce clutter
-    plt.axvline(x=pos, color='blue', linestyle='--', alpha=0.2)
+    # Define thresholds for low and high entropy
+    low_entropy_threshold = np.percentile(entropy_values, 25)  # Lower 25% as low entropy
+    high_entropy_threshold = np.percentile(entropy_values, 75)  # Upper 25% as high entropy
 
-# Add labels at key low entropy positions, placed near the x-axis
-for i, pos in enumerate(low_entropy_positions[::10]):  # Adjust step size to reduce clutter
-    plt.text(pos, min(entropy_values) - 0.1, f"{int(pos)}",
-             fontsize=6, ha='right', color='blue')
+    # Window-smoothed entropy; windows whose mean is in the low-entropy range are conserved regions
+    windowed = None
+    if window_sizes:
+        windowed = windowed_entropy_table(entropy_values, counts, window_sizes, positions)
+        windowed.to_csv(windowed_output_file, index=False)
+        conserved_regions_table(entropy_values, window_sizes, low_entropy_threshold, positions).to_csv(
+            regions_output_file, index=False)
+        print(f"Windowed entropy saved as {windowed_output_file}, conserved regions as {regions_output_file}")
 
-# Titles and Labels
-plt.title('Entropy Analysis of Conserved & Variable Regions in COX1 Gene', fontsize=14, fontweight='bold')
-plt.xlabel('Position in COX1 Gene Sequence', fontsize=12)
-plt.ylabel('Entropy Score', fontsize=12)
+    if not headless:
+        plot_landscape(positions, entropy_values, windowed, low_entropy_threshold, high_entropy_threshold)
 
-# Enable grid and legend
-plt.grid(True, linestyle='--', alpha=0.3)
-plt.legend()
+def plot_landscape(positions, entropy_values, windowed, low_entropy_threshold, high_entropy_threshold):
+    """Entropy curve with window means, low/high entropy highlights and low-entropy position markers."""
+    import matplotlib.pyplot as plt
+    from landscape_plot import decimate_series, position_markers, position_labels, MAX_POSITION_LABELS
 
-# Show plot
-plt.show()
+    # Identify low and high entropy positions
+    low_entropy_positions = positions[entropy_values <= low_entropy_threshold]
+    high_entropy_positions = positions[entropy_values >= high_entropy_threshold]
+
+    # Create figure
+    plt.figure(figsize=(12, 6))
+    ax = plt.gca()
+    decimated = plot_mode == 'decimated'
+    if decimated:
+        plot_positions, plot_values = decimate_series(positions, entropy_values, ax)
+    else:
+        plot_positions, plot_values = positions, entropy_values
+
+    # Plot the entropy curve
+    plt.plot(plot_positions, plot_values, linestyle='-', color='black', linewidth=1.5, label="Entropy", alpha=0.9)
+
+    # Overlay the window means
+    for i, window in enumerate(window_sizes):
+        window_positions, window_values = positions, windowed[f"Mean_w{window}"]
+        if decimated:
+            window_positions, window_values = decimate_series(window_positions, window_values, ax)
+        plt.plot(window_positions, window_values, color=f"C{i + 1}", linewidth=1.2, label=f"{window}-Column Mean")
+
+    # Highlight low entropy regions in cyan
+    plt.fill_between(plot_positions, plot_values, low_entropy_threshold,
+                     where=(plot_values <= low_entropy_threshold),
+                     color='cyan', alpha=0.5, label="Low Entropy Regions (Conserved)", rasterized=decimated)
+
+    # Highlight high entropy regions in red
+    plt.fill_between(plot_positions, plot_values, high_entropy_threshold,
+                     where=(plot_values >= high_entropy_threshold),
+                     color='red', alpha=0.5, label="High Entropy Regions (Variable)", rasterized=decimated)
+
+    # Add vertical grid lines at low entropy positions (every 5th position to reduce clutter), as one collection
+    position_markers(ax, low_entropy_positions[::5], per_pixel=decimated,
+                     color='blue', linestyle='--', alpha=0.2, rasterized=decimated)
+
+    # Add labels at key low entropy positions, placed near the x-axis
+    label_positions = low_entropy_positions[::10]  # Adjust step size to reduce clutter
+    position_labels(ax, label_positions, min(entropy_values) - 0.1,
+                    max_labels=MAX_POSITION_LABELS if decimated else len(label_positions),
+                    fontsize=6, ha='right', color='blue')
+
+    # Titles and Labels
+    plt.title('Entropy Analysis of Conserved & Variable Regions in COX1 Gene', fontsize=14, fontweight='bold')
+    plt.xlabel('Position in COX1 Gene Sequence', fontsize=12)
+    plt.ylabel('Entropy Score', fontsize=12)
+
+    # Enable grid and legend
+    plt.grid(True, linestyle='--', alpha=0.3)
+    plt.legend(loc='upper right' if decimated else 'best')  # 'best' scans every filled polygon
+
+    # Show plot
+    plt.show()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,155 @@
+import json
+import os
+import numpy as np
+import pandas as pd
+
+# ===== Binary columnar format =====
+# <prefix>.npy holds every chain's per-column entropy back to back (no padding) and
+# <prefix>.json the chain names with their offsets into it, so one chain is a memory-mapped slice.
+
+def write_entropy_landscape(prefix, chains, dtype=np.float64):
+    """
+    Store {chain: per-column entropy} as <prefix>.npy plus a <prefix>.json index.
+    Chains keep their own lengths; values are streamed into the memory-mapped output.
+    """
+    names = list(chains)
+    lengths = [len(chains[name]) for name in names]
+    offsets = np.concatenate([[0], np.cumsum(lengths, dtype=np.int64)])
+
+    tmp_file = f"{prefix}.tmp.npy"
+    out = np.lib.format.open_memmap(tmp_file, mode="w+", dtype=dtype, shape=(int(offsets[-1]),))
+    for name, start, stop in zip(names, offsets[:-1], offsets[1:]):
+        out[start:stop] = chains[name]
+    out.flush()
+    del out
+    os.replace(tmp_file, f"{prefix}.npy")
+
+    with open(f"{prefix}.json.tmp", "w") as f:
+        json.dump({"chains": names, "offsets": offsets.tolist()}, f)
+    os.replace(f"{prefix}.json.tmp", f"{prefix}.json")
+
+def convert_entropy_landscape(csv_file, prefix=None, dtype=np.float64):
+    """Convert a combined entropy CSV (Position plus one NaN-padded column per chain), trimming the padding."""
+    write_entropy_landscape(prefix or os.path.splitext(csv_file)[0], read_landscape_csv(csv_file), dtype)
+
+class EntropyLandscape:
+    """Read-only {chain: entropy} view of a binary landscape; each chain is loaded only when accessed."""
+
+    def __init__(self, prefix):
+        with open(f"{prefix}.json", "r") as f:
+            index = json.load(f)
+        self.prefix = prefix
+        self.chains = index["chains"]
+        self.offsets = np.asarray(index["offsets"], dtype=np.int64)
+        self._position = {name: i for i, name in enumerate(self.chains)}
+        self._values = None
+
+    @property
+    def values(self):
+        if self._values is None:
+            self._values = np.load(f"{self.prefix}.npy", mmap_mode="r")
+        return self._values
+
+    def __len__(self):
+        return len(self.chains)
+
+    def __iter__(self):
+        return iter(self.chains)
+
+    def __contains__(self, chain):
+        return chain in self._position
+
+    def __getitem__(self, chain):
+        i = self._position[chain]
+        return self.values[self.offsets[i]:self.offsets[i + 1]]
+
+    def lengths(self):
+        return dict(zip(self.chains, np.diff(self.offsets).tolist()))
+
+    def select(self, chains=None):
+        """{chain: entropy} for the given chains (all by default), as in-memory arrays."""
+        return {chain: np.array(self[chain]) for chain in (self.chains if chains is None else chains)}
+
+def open_entropy_landscape(prefix):
+    """Open a binary landscape without reading any values."""
+    return EntropyLandscape(prefix)
+
+def landscape_exists(prefix):
+    """True when both the values and the index of a binary landscape are present."""
+    return os.path.exists(f"{prefix}.npy") and os.path.exists(f"{prefix}.json")
+
+# ===== Entropy parameters =====
+# <prefix>.params.json records the alphabet and gap handling the landscape was computed with, whatever
+# its formats, so scripts that recount an alignment reuse the same settings (and cache entries), plus
+# the content digest of each chain's alignment so a chain is only reused while its .fas is unchanged.
+
+def write_landscape_params(prefix, alphabet=None, gap_handling="symbol", digests=None):
+    """Store the entropy parameters of a landscape, and {chain: alignment digest}, next to it."""
+    with open(f"{prefix}.params.json.tmp", "w") as f:
+        json.dump({"alphabet": alphabet, "gap_handling": gap_handling, "digests": digests or {}}, f)
+    os.replace(f"{prefix}.params.json.tmp", f"{prefix}.params.json")
+
+def _landscape_params(prefix):
+    try:
+        with open(f"{prefix}.params.json", "r") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+def read_landscape_params(prefix):
+    """(alphabet, gap_handling) a landscape was computed with; the engine defaults when none were saved."""
+    params = _landscape_params(prefix)
+    return params.get("alphabet"), params.get("gap_handling", "symbol")
+
+def landscape_digests(prefix):
+    """{chain: digest of the alignment it was computed from}; {} when none were saved."""
+    return _landscape_params(prefix).get("digests", {})
+
+# ===== Padded tables =====
+def padded_landscape(chains):
+    """
+    {chain: entropy} as the combined table layout: one NaN-padded column per chain, indexed by
+    1-based Position. Built from a single preallocated matrix rather than column by column.
+    """
+    names = list(chains)
+    max_length = max((len(chains[name]) for name in names), default=0)
+    matrix = np.full((max_length, len(names)), np.nan)
+    for j, name in enumerate(names):
+        matrix[:len(chains[name]), j] = chains[name]
+    return pd.DataFrame(matrix, columns=names, index=pd.RangeIndex(1, max_length + 1, name="Position"))
+
+def read_landscape_csv(csv_file, chains=None):
+    """{chain: entropy} from a combined entropy CSV, parsing only the selected chain columns."""
+    usecols = None if chains is None else ["Position", *chains]
+    data = pd.read_csv(csv_file, index_col="Position", usecols=usecols)
+    result = {}
+    for chain in data.columns:
+        values = data[chain].to_numpy(dtype=np.float64)
+        present = np.flatnonzero(~np.isnan(values))
+        result[chain] = values[:present[-1] + 1] if len(present) else values[:0]
+    return result
+
+def landscape_chains(prefix):
+    """Chain names of a saved landscape (binary index, else the CSV header); [] when there is none."""
+    if landscape_exists(prefix):
+        return list(open_entropy_landscape(prefix).chains)
+    if os.path.exists(f"{prefix}.csv"):
+        return [column for column in pd.read_csv(f"{prefix}.csv", nrows=0).columns if column != "Position"]
+    return []
+
+def saved_landscape(prefix):
+    """{chain: entropy} of a saved landscape (binary chains read lazily, else the CSV); {} when there is none."""
+    if landscape_exists(prefix):
+        return open_entropy_landscape(prefix)
+    if os.path.exists(f"{prefix}.csv"):
+        return read_landscape_csv(f"{prefix}.csv")
+    return {}
+
+def load_entropy_landscape(prefix, chains=None):
+    """
+    {chain: entropy} for the selected chains, from <prefix>.npy/.json when present
+    (only those chains are read), otherwise from <prefix>.csv.
+    """
+    if landscape_exists(prefix):
+        return open_entropy_landscape(prefix).select(chains)
+    return read_landscape_csv(f"{prefix}.csv", chains)
@@ -0,0 +1,176 @@
+import hashlib
+import json
+import os
+import numpy as np
+from entropy_cache import CACHE_DIR, file_digest, cached_counts, entropy_cache_key, load_entry
+from entropy_landscape_io import read_landscape_params, landscape_digests, saved_landscape
+from entropy_engine import (STREAM_CHUNK_SIZE, path_column_counts, stream_column_counts, merge_counts,
+                            select_symbols, entropy_from_counts)
+
+# Persisted per-chain count state (one .npz per alignment)
+STATE_DIR = os.environ.get("ENTROPY_STATE_DIR", ".entropy_state")
+
+# ===== State files =====
+def state_file(fasta_file, state_dir=STATE_DIR):
+    """
+    Path of the saved state for an alignment, keyed on its absolute path so same-named
+    alignments in different directories keep separate states.
+    """
+    path_key = hashlib.sha256(os.path.abspath(fasta_file).encode()).hexdigest()[:16]
+    return os.path.join(state_dir, f"{os.path.basename(fasta_file)}.{path_key}.state.npz")
+
+def load_state(fasta_file, state_dir=STATE_DIR):
+    """
+    Saved state of an alignment as a dict: raw per-column counts and symbols, number of
+    sequences, digest of the base alignment, applied change files, and the entropy for
+    entropy_params. None when there is no usable state.
+    """
+    path = state_file(fasta_file, state_dir)
+    if not os.path.exists(path):
+        return None
+    try:
+        with np.load(path) as saved:
+            state = {"counts": saved["counts"].astype(np.int64), "symbols": saved["symbols"],
+                     "entropy": saved["entropy"]}
+            state.update(json.loads(str(saved["meta"])))
+    except (OSError, ValueError, KeyError):
+        return None
+    return state
+
+def save_state(fasta_file, state, state_dir=STATE_DIR):
+    os.makedirs(state_dir, exist_ok=True)
+    meta = {key: state[key] for key in ("n_sequences", "base_digest", "applied", "entropy_params")}
+    path = state_file(fasta_file, state_dir)
+    tmp_file = f"{path}.tmp.npz"
+    np.savez_compressed(tmp_file, counts=state["counts"], symbols=state["symbols"], entropy=state["entropy"],
+                        meta=json.dumps(meta))
+    os.replace(tmp_file, path)
+
+def build_state(fasta_file, chunk_size=STREAM_CHUNK_SIZE, state_dir=STATE_DIR):
+    """Count an alignment from scratch into a new state."""
+    counts, symbols = path_column_counts(fasta_file, chunk_size)
+    return {"counts": counts, "symbols": symbols, "n_sequences": int(counts[:, 0].sum()) if counts.size else 0,
+            "base_digest": file_digest(fasta_file, state_dir), "applied": [],
+            "entropy": np.zeros(0), "entropy_params": None}
+
+# ===== Incremental updates =====
+def apply_change(state, change_file, sign=1, chunk_size=STREAM_CHUNK_SIZE):
+    """
+    Fold the sequences of change_file into the state (sign=1 adds them, -1 removes them).
+    Cost is proportional to the number of changed sequences. Returns the change's (counts, symbols).
+    """
+    delta, delta_symbols = stream_column_counts(change_file, chunk_size)
+    state["counts"], state["symbols"] = merge_counts(state["counts"], state["symbols"], delta, delta_symbols, sign)
+    state["n_sequences"] += sign * int(delta[:, 0].sum())
+    return delta, delta_symbols
+
+def refresh_entropy(state, columns=None, alphabet=None, gap_handling="symbol"):
+    """
+    Update the state's entropy for the given parameters, recomputing only the columns in the
+    columns mask (all of them when columns is None or the parameters differ from the saved entropy).
+    """
+    params = json.dumps({"alphabet": alphabet, "gap_handling": gap_handling}, sort_keys=True)
+    counts, _ = select_symbols(state["counts"], state["symbols"], alphabet, gap_handling)
+    if columns is None or state["entropy_params"] != params or len(state["entropy"]) != counts.shape[1]:
+        state["entropy"] = entropy_from_counts(counts)
+    elif columns.any():
+        state["entropy"] = state["entropy"].copy()
+        state["entropy"][columns] = entropy_from_counts(counts[:, columns])
+    state["entropy_params"] = params
+    return state["entropy"]
+
+def update_chain(fasta_file, added=(), removed=(), alphabet=None, gap_handling="symbol",
+                 chunk_size=STREAM_CHUNK_SIZE, state_dir=STATE_DIR):
+    """
+    Per-column entropy of an alignment from its persisted state, folding in FASTA files of added
+    sequences and subtracting FASTA files of removed ones. Each change file is applied once
+    (tracked by content digest), and only columns where a counted symbol changed get their
+    entropy recomputed. The state is rebuilt when the base alignment itself changed.
+    """
+    state = load_state(fasta_file, state_dir)
+    columns = None
+    if state is None or state["base_digest"] != file_digest(fasta_file, state_dir):
+        state = build_state(fasta_file, chunk_size, state_dir)
+    else:
+        columns = np.zeros(state["counts"].shape[1], dtype=bool)
+
+    for change_files, sign, op in ((added, 1, "add"), (removed, -1, "remove")):
+        for change_file in change_files:
+            tag = f"{op}:{file_digest(change_file, state_dir)}"
+            if tag in state["applied"]:
+                continue
+            delta, delta_symbols = apply_change(state, change_file, sign, chunk_size)
+            if columns is not None:
+                columns |= select_symbols(delta, delta_symbols, alphabet, gap_handling)[0].any(axis=0)
+            state["applied"].append(tag)
+
+    entropy = refresh_entropy(state, columns, alphabet, gap_handling)
+    save_state(fasta_file, state, state_dir)
+    return entropy
+
+def incremental_entropies(fasta_files, added=None, removed=None, alphabet=None, gap_handling="symbol",
+                          chunk_size=STREAM_CHUNK_SIZE, state_dir=STATE_DIR):
+    """update_chain for each alignment; added/removed map an alignment to its list of change files."""
+    added, removed = added or {}, removed or {}
+    return [update_chain(fasta_file, added.get(fasta_file, ()), removed.get(fasta_file, ()),
+                         alphabet, gap_handling, chunk_size, state_dir)
+            for fasta_file in fasta_files]
+
+# ===== Saved entropy for the landscape scripts =====
+def _same_entropy(entropy, reference):
+    return len(entropy) == len(reference) and np.allclose(entropy, reference, equal_nan=True)
+
+def saved_counts(fasta_file, entropy, alphabet=None, gap_handling="symbol", state_dir=STATE_DIR,
+                 cache_dir=CACHE_DIR):
+    """
+    Count matrix behind an already computed entropy, from the alignment's state or its entropy
+    cache entry; None when neither reproduces that entropy. Nothing is recounted.
+    """
+    state = load_state(fasta_file, state_dir)
+    if state is not None:
+        counts = select_symbols(state["counts"], state["symbols"], alphabet, gap_handling)[0]
+        if _same_entropy(entropy_from_counts(counts), entropy):
+            return counts
+    if os.path.exists(fasta_file):
+        entry = load_entry(entropy_cache_key(fasta_file, alphabet, gap_handling, cache_dir), cache_dir)
+        if entry is not None and _same_entropy(entry[2], entropy):
+            return entry[0]
+    return None
+
+def saved_chain_counts(fasta_files, landscape_prefix, chains=None, state_dir=STATE_DIR, cache_dir=CACHE_DIR):
+    """
+    [(count matrix or None, entropy)] per alignment as the entropy stage last computed it: the chain
+    from the saved landscape (which includes incremental updates) when its alignment is missing or
+    still has the digest the landscape recorded, else the state of an unchanged alignment, and only
+    then a cached recount, all with the landscape's saved alphabet and gap handling. chains names each alignment's chain (default: file name without extension);
+    a fasta_files entry may be None for chains that only exist in the landscape.
+    """
+    alphabet, gap_handling = read_landscape_params(landscape_prefix)
+    chains = chains or [os.path.splitext(fasta_file)[0] for fasta_file in fasta_files]
+    landscape = saved_landscape(landscape_prefix)
+    digests = landscape_digests(landscape_prefix)
+
+    results, recount = [None] * len(chains), []
+    for i, (fasta_file, chain) in enumerate(zip(fasta_files, chains)):
+        present = fasta_file is not None and os.path.exists(fasta_file)
+        current = chain in landscape and (not present or digests.get(chain) == file_digest(fasta_file, cache_dir))
+        if current:
+            entropy = np.array(landscape[chain])
+            counts = saved_counts(fasta_file, entropy, alphabet, gap_handling, state_dir, cache_dir) if present else None
+            results[i] = counts, entropy
+            continue
+        if not present:
+            raise FileNotFoundError(f"No saved entropy for {chain} in {landscape_prefix} and no alignment {fasta_file}")
+        state = load_state(fasta_file, state_dir)
+        if state is not None and state["base_digest"] == file_digest(fasta_file, state_dir):
+            counts = select_symbols(state["counts"], state["symbols"], alphabet, gap_handling)[0]
+            results[i] = counts, entropy_from_counts(counts)
+        else:
+            recount.append(i)
+
+    if recount:
+        computed = cached_counts([fasta_files[i] for i in recount], alphabet=alphabet, gap_handling=gap_handling,
+                                 cache_dir=cache_dir)
+        for i, (counts, _, entropy) in zip(recount, computed):
+            results[i] = counts, entropy
+    return results
@@ -0,0 +1,98 @@
+import numpy as np
+import pandas as pd
+from entropy_engine import entropy_from_counts
+
+# Default sliding-window sizes (columns)
+WINDOW_SIZES = (10, 50, 100)
+
+# ===== Sliding windows =====
+def _centered(values, length, window):
+    """Place per-window values (one per start) at their window centres in a NaN-padded array."""
+    profile = np.full(length, np.nan)
+    start = (window - 1) // 2
+    profile[start:start + len(values)] = values
+    return profile
+
+def window_mean_entropy(entropy, windows=WINDOW_SIZES):
+    """
+    Mean per-column entropy over sliding windows of each size, from one prefix sum (O(L) per
+    size). Returns {window: profile}, each value placed at its window centre; windows that run
+    past the ends or contain a NaN column (e.g. ragged padding) are NaN.
+    """
+    entropy = np.asarray(entropy, dtype=np.float64)
+    missing = np.isnan(entropy)
+    total = np.concatenate([[0.0], np.cumsum(np.where(missing, 0.0, entropy))])
+    gaps = np.concatenate([[0], np.cumsum(missing)])
+
+    profiles = {}
+    for window in windows:
+        if window > len(entropy):
+            profiles[window] = np.full(len(entropy), np.nan)
+            continue
+        means = (total[window:] - total[:-window]) / window
+        means[gaps[window:] - gaps[:-window] > 0] = np.nan
+        profiles[window] = _centered(means, len(entropy), window)
+    return profiles
+
+def window_pooled_entropy(counts, windows=WINDOW_SIZES):
+    """
+    Entropy of the pooled symbol counts of each sliding window, from a prefix sum of the
+    (symbols, length) count matrix. Returns {window: profile} laid out as window_mean_entropy.
+    """
+    counts = np.asarray(counts, dtype=np.int64)
+    length = counts.shape[1]
+    prefix = np.zeros((counts.shape[0], length + 1), dtype=np.int64)
+    np.cumsum(counts, axis=1, out=prefix[:, 1:])
+
+    profiles = {}
+    for window in windows:
+        if window > length:
+            profiles[window] = np.full(length, np.nan)
+            continue
+        profiles[window] = _centered(entropy_from_counts(prefix[:, window:] - prefix[:, :-window]), length, window)
+    return profiles
+
+def windowed_entropy_table(entropy, counts=None, windows=WINDOW_SIZES, positions=None):
+    """DataFrame with Position, Entropy and Mean_w<size> (plus Pooled_w<size> when counts are given) columns."""
+    entropy = np.asarray(entropy, dtype=np.float64)
+    table = pd.DataFrame({"Position": np.arange(1, len(entropy) + 1) if positions is None else np.asarray(positions),
+                          "Entropy": entropy})
+    for window, profile in window_mean_entropy(entropy, windows).items():
+        table[f"Mean_w{window}"] = profile
+    if counts is not None:
+        for window, profile in window_pooled_entropy(counts, windows).items():
+            table[f"Pooled_w{window}"] = profile
+    return table
+
+# ===== Conserved regions =====
+def conserved_regions(entropy, window, threshold, positions=None):
+    """
+    Regions whose sliding-window mean entropy is at or below threshold. Consecutive conserved
+    windows are merged and each region spans all columns of its windows.
+    Returns a DataFrame with Window, Start, End, Length and Mean_Entropy (per-column mean over the region).
+    """
+    entropy = np.asarray(entropy, dtype=np.float64)
+    positions = np.arange(1, len(entropy) + 1) if positions is None else np.asarray(positions)
+    profile = window_mean_entropy(entropy, [window])[window]
+    conserved = np.concatenate([[False], profile <= threshold, [False]])
+    edges = np.flatnonzero(np.diff(conserved.astype(np.int8)))
+    first_center, last_center = edges[0::2], edges[1::2] - 1
+
+    # Window centre c covers columns c - (w - 1) // 2 .. c + w // 2
+    starts = first_center - (window - 1) // 2
+    ends = last_center + window // 2
+    if len(starts):
+        # Runs whose column spans touch or overlap form one region
+        new_region = np.concatenate([[True], starts[1:] > ends[:-1] + 1])
+        starts, ends = starts[new_region], np.maximum.reduceat(ends, np.flatnonzero(new_region))
+    column_sum = np.concatenate([[0.0], np.cumsum(np.nan_to_num(entropy))])
+    return pd.DataFrame({"Window": window,
+                         "Start": positions[starts],
+                         "End": positions[ends],
+                         "Length": ends - starts + 1,
+                         "Mean_Entropy": (column_sum[ends + 1] - column_sum[starts]) / (ends - starts + 1)})
+
+def conserved_regions_table(entropy, windows, threshold, positions=None):
+    """conserved_regions for several window sizes, stacked into one DataFrame."""
+    return pd.concat([conserved_regions(entropy, window, threshold, positions) for window in windows],
+                     ignore_index=True)
@@ -1,26 +1,40 @@
-from ete3 import Tree, TreeStyle, NodeStyle
-import matplotlib.pyplot as plt
-
-def load_trees(tree_files):
-    """Load trees from files and return a list of Tree objects."""
-    trees = []
-    for file in tree_files:
-        with open(file, "r") as f:
-            trees.append(Tree(f.readline().strip()))
-    return trees
-
-def color_branches(tree, color):
-    """Apply a specific color to the branches of a tree."""
-    for node in tree.traverse():
-        style = NodeStyle()
-        style["fgcolor"] = color  # Set branch color
-        style["hz_line_color"] = color
-        style["vt_line_color"] = color
-        style["size"] = 0  # Hide node circles
-        node.set_style(style)
+from newick_arrays import load_trees
+from tree_render import render_trees, RENDER_CACHE_DIR
+from tree_splits import write_rf_matrices
+from tree_consensus import consensus_tree
+
+# Define file names, colors, and labels
+tree_files = ["ChainA_aligned.fas.treefile", "ChainB_aligned.fas.treefile",
+              "ChainC_aligned.fas.treefile", "ChainD_aligned.fas.treefile", "ChainE_aligned.fas.treefile"]
+colors = ["skyblue", "orange", "green", "darkred", "purple"]
+labels = ["Chain A", "Chain B", "Chain C", "Chain D", "Chain E"]
+
+# Draw the consensus of each chain's UFBoot/bootstrap tree set instead of the first tree in
+# tree_files (None draws tree_files); splits above consensus_threshold are kept (0.5 = majority rule)
+bootstrap_files = None  # e.g. [f"Chain{chain}_aligned.fas.ufboot" for chain in "ABCDE"]
+consensus_threshold = 0.5
+
+# Rendering: worker processes (None = all CPUs, one tree each) and image cache (None disables caching)
+render_workers = None
+render_cache_dir = RENDER_CACHE_DIR
+
+# Level of detail: collapse clades into tip-count triangles (None draws every tip), e.g.
+# {"max_depth": 12, "max_tips": 50, "min_support": 70}; see newick_arrays.collapse_clades
+lod_settings = None
+
+# Robinson-Foulds comparison, opt-in: a prefix (e.g. "chain_trees") writes <prefix>_rf.tsv and
+# <prefix>_nrf.tsv; rf_all_trees compares every tree in each file (e.g. UFBoot sets) instead of only the first
+rf_output_prefix = None
+rf_all_trees = False
+rf_workers = None
+
+# Headless runs write the consensus trees and RF matrices only, without rendering or the plotting imports
+headless = False
 
 def plot_legend(labels, colors, legend_file="legend.png"):
     """Generate a separate legend image using Matplotlib."""
+    import matplotlib.pyplot as plt
+
     fig, ax = plt.subplots(figsize=(4, 3))
     for label, color in zip(labels, colors):
         ax.plot([], [], color=color, label=label, linewidth=4)
@@ -31,27 +45,40 @@ def plot_legend(labels, colors, legend_file="legend.png"):
     plt.close()
     print(f"Legend saved as {legend_file}")
 
-def plot_separate_trees(trees, colors, labels, output_prefix="phylogenetic_tree"):
-    """Generate separate tree images and save them without merging."""
-    for i, tree in enumerate(trees):
-        color_branches(tree, colors[i])
-
-        ts = TreeStyle()
-        ts.mode = "c"  # Circular layout
-        ts.show_leaf_name = True
+def plot_separate_trees(trees, colors, labels, output_prefix="phylogenetic_tree", lod=None):
+    """
+    Generate separate tree images in parallel and save them without merging.
+    lod collapses clades into tip-count triangles (collapse_clades settings).
+    """
+    tree_style = {"mode": "c",  # Circular layout
+                  "show_leaf_name": True}
 
-        output_file = f"{output_prefix}_{labels[i].replace(' ', '_')}.png"
-        tree.render(output_file, tree_style=ts)
+    jobs = [([tree], [color], f"{output_prefix}_{label.replace(' ', '_')}.png", tree_style)
+            for tree, color, label in zip(trees, colors, labels)]
+    for output_file in render_trees(jobs, workers=render_workers, cache_dir=render_cache_dir, lod=lod):
         print(f"Tree saved as {output_file}")
 
-# Define file names, colors, and labels
-tree_files = ["ChainA_aligned.fas.treefile", "ChainB_aligned.fas.treefile",
-              "ChainC_aligned.fas.treefile", "ChainD_aligned.fas.treefile", "ChainE_aligned.fas.treefile"]
-colors = ["skyblue", "orange", "green", "darkred", "purple"]
-labels = ["Chain A", "Chain B", "Chain C", "Chain D", "Chain E"]
+def main():
+    if bootstrap_files:
+        trees = [consensus_tree(file, consensus_threshold) for file in bootstrap_files]
+        for file, tree in zip(bootstrap_files, trees):
+            with open(f"{file}.consensus.treefile", "w") as f:
+                f.write(tree.to_newick() + "\n")
+            print(f"Consensus tree saved as {file}.consensus.treefile")
+    else:
+        trees = load_trees(tree_files)
+    if rf_output_prefix:
+        try:
+            write_rf_matrices(tree_files, labels, rf_output_prefix, all_trees=rf_all_trees, workers=rf_workers)
+        except ValueError as error:
+            print(f"Warning: RF matrix skipped ({error})")
+
+    if headless:
+        return
 
-trees = load_trees(tree_files)
+    # Generate individual trees and separate legend
+    plot_separate_trees(trees, colors, labels, lod=lod_settings)
+    plot_legend(labels, colors)  # Creates a separate legend image
 
-# Generate individual trees and separate legend
-plot_separate_trees(trees, colors, labels)
-plot_legend(labels, colors)  # Creates a separate legend image
+if __name__ == "__main__":
+    main()
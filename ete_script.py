@@ -1,33 +1,40 @@
-from ete3 import Tree, TreeStyle, NodeStyle
-import matplotlib.pyplot as plt
+from newick_arrays import load_trees
+from tree_render import render_trees, RENDER_CACHE_DIR
+from tree_splits import write_rf_matrices
+from tree_consensus import consensus_tree
 
-def load_trees(tree_files):
-    """Load the first tree from each file and return a list of Tree objects."""
-    trees = []
-    for file in tree_files:
-        with open(file, "r") as f:
-            trees.append(Tree(f.readline().strip()))
-    return trees
+# Define file names, colors, and labels
+tree_files = ["ChainA_aligned.fas.treefile", "ChainB_aligned.fas.treefile",
+              "ChainC_aligned.fas.treefile", "ChainD_aligned.fas.treefile", "ChainE_aligned.fas.treefile"]
+colors = ["skyblue", "orange", "green", "darkred", "purple"]
+labels = ["Chain A", "Chain B", "Chain C", "Chain D", "Chain E"]
 
-def color_branches(tree, color):
-    """Color all branches of a given tree with the specified color."""
-    for node in tree.traverse():
-        style = NodeStyle()
-        style["fgcolor"] = color  # Set branch color
-        style["hz_line_color"] = color
-        style["vt_line_color"] = color
-        style["size"] = 0  # Hide node circles
-        node.set_style(style)
+# Draw the consensus of each chain's UFBoot/bootstrap tree set instead of the first tree in
+# tree_files (None draws tree_files); splits above consensus_threshold are kept (0.5 = majority rule)
+bootstrap_files = None  # e.g. [f"Chain{chain}_aligned.fas.ufboot" for chain in "ABCDE"]
+consensus_threshold = 0.5
 
-def merge_trees(trees):
-    """Merge multiple trees under a new artificial root."""
-    root = Tree()  # Create an artificial root
-    for tree in trees:
-        root.add_child(tree)  # Attach each tree as a child
-    return root
+# Rendering: worker processes (None = all CPUs) and image cache (None disables caching)
+render_workers = None
+render_cache_dir = RENDER_CACHE_DIR
+
+# Level of detail: collapse clades into tip-count triangles (None draws every tip), e.g.
+# {"max_depth": 12, "max_tips": 50, "min_support": 70}; see newick_arrays.collapse_clades
+lod_settings = None
+
+# Robinson-Foulds comparison, opt-in: a prefix (e.g. "chain_trees") writes <prefix>_rf.tsv and
+# <prefix>_nrf.tsv; rf_all_trees compares every tree in each file (e.g. UFBoot sets) instead of only the first
+rf_output_prefix = None
+rf_all_trees = False
+rf_workers = None
+
+# Headless runs write the consensus trees and RF matrices only, without rendering or the plotting imports
+headless = False
 
 def plot_legend(labels, colors, legend_file="legend.png"):
     """Generate a separate legend image using Matplotlib."""
+    import matplotlib.pyplot as plt
+
     fig, ax = plt.subplots(figsize=(3, 2))
     for label, color in zip(labels, colors):
         ax.plot([], [], color=color, label=label, linewidth=4)
@@ -38,29 +45,40 @@ def plot_legend(labels, colors, legend_file="legend.png"):
     plt.close()
     print(f"Legend saved as {legend_file}")
 
-def plot_tree(trees, colors, labels, output_file="phylogenetic_tree.png"):
-    """Generate a circular phylogenetic tree with colored branches."""
-    merged_tree = merge_trees(trees)  # Merge all trees
+def plot_tree(trees, colors, labels, output_file="phylogenetic_tree.png", lod=None):
+    """
+    Generate a circular phylogenetic tree with colored branches, merged under an artificial root.
+    lod collapses clades into tip-count triangles (collapse_clades settings).
+    """
+    tree_style = {"mode": "c",  # Circular mode
+                  "show_leaf_name": True,
+                  "legend_position": 4}  # Bottom-right corner (default, won't be used now)
 
-    for i, tree in enumerate(trees):
-        color_branches(tree, colors[i])  # Apply color to each section
-
-    ts = TreeStyle()
-    ts.mode = "c"  # Circular mode
-    ts.show_leaf_name = True
-    ts.legend_position = 4  # Bottom-right corner (default, won't be used now)
-
-    merged_tree.render(output_file, tree_style=ts)
+    render_trees([(trees, colors, output_file, tree_style)],
+                 workers=render_workers, cache_dir=render_cache_dir, lod=lod)
     print(f"Tree saved as {output_file}")
 
-# Define file names, colors, and labels
-tree_files = ["ChainA_aligned.fas.treefile", "ChainB_aligned.fas.treefile",
-              "ChainC_aligned.fas.treefile", "ChainD_aligned.fas.treefile", "ChainE_aligned.fas.treefile"]
-colors = ["skyblue", "orange", "green", "darkred", "purple"]
-labels = ["Chain A", "Chain B", "Chain C", "Chain D", "Chain E"]
+def main():
+    if bootstrap_files:
+        trees = [consensus_tree(file, consensus_threshold) for file in bootstrap_files]
+        for file, tree in zip(bootstrap_files, trees):
+            with open(f"{file}.consensus.treefile", "w") as f:
+                f.write(tree.to_newick() + "\n")
+            print(f"Consensus tree saved as {file}.consensus.treefile")
+    else:
+        trees = load_trees(tree_files)
+    if rf_output_prefix:
+        try:
+            write_rf_matrices(tree_files, labels, rf_output_prefix, all_trees=rf_all_trees, workers=rf_workers)
+        except ValueError as error:
+            print(f"Warning: RF matrix skipped ({error})")
+
+    if headless:
+        return
 
-trees = load_trees(tree_files)
+    # Generate tree and legend separately
+    plot_tree(trees, colors, labels, lod=lod_settings)
+    plot_legend(labels, colors)  # Creates a separate legend image
 
-# Generate tree and legend separately
-plot_tree(trees, colors, labels)
-plot_legend(labels, colors)  # Creates a separate legend image
+if __name__ == "__main__":
+    main()
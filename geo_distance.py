@@ -0,0 +1,169 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import pandas as pd
+from scipy.spatial import cKDTree
+
+# Mean Earth radius (km)
+EARTH_RADIUS_KM = 6371.0088
+
+# Permutations evaluated per pool task in the Mantel test, and permuted cells gathered per row
+# block (cache-sized, so each block is gathered and contracted without leaving cache)
+MANTEL_BATCH = 256
+MANTEL_CELLS = 1 << 16
+
+# ===== Coordinates =====
+def read_coordinates(coordinates_file):
+    """Specimen sampling sites from a CSV with Specimen, Latitude and Longitude columns; returns (labels, (n, 2) degrees)."""
+    table = pd.read_csv(coordinates_file, dtype={"Specimen": str})
+    table["Specimen"] = table["Specimen"].str.strip()
+    return table["Specimen"].to_numpy(dtype=object), table[["Latitude", "Longitude"]].to_numpy(dtype=np.float64)
+
+def unit_vectors(latlon):
+    """Points on the unit sphere for (latitude, longitude) pairs in degrees."""
+    lat, lon = np.radians(latlon).T
+    return np.column_stack([np.cos(lat) * np.cos(lon), np.cos(lat) * np.sin(lon), np.sin(lat)])
+
+def haversine_matrix(latlon, dtype=np.float64):
+    """Pairwise great-circle distances (km) between (latitude, longitude) points."""
+    lat, lon = np.radians(latlon).T
+    half_dlat = (lat[:, None] - lat[None, :]) / 2
+    half_dlon = (lon[:, None] - lon[None, :]) / 2
+    h = np.sin(half_dlat) ** 2 + np.cos(lat)[:, None] * np.cos(lat)[None, :] * np.sin(half_dlon) ** 2
+    return (2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.clip(h, 0, 1)))).astype(dtype)
+
+def mean_site(latlon):
+    """Spherical centroid (latitude, longitude) of sites in degrees (safe across the antimeridian)."""
+    x, y, z = unit_vectors(latlon).mean(axis=0)
+    return np.degrees([np.arctan2(z, np.hypot(x, y)), np.arctan2(y, x)])
+
+def node_sites(nodes, labels, latlon, members=None):
+    """
+    Sampling site of each network node: the spherical centroid of its member specimens
+    (members maps a haplotype label to its sequence titles), else the site of the label itself
+    or, for labels haplotype_labels suffixed with _2, _3, ..., of the label without the suffix.
+    Returns an (n, 2) array with NaN rows for nodes that could not be placed.
+    """
+    position = {label: i for i, label in enumerate(labels)}
+    members = members or {}
+    sites = np.full((len(nodes), 2), np.nan)
+    for k, node in enumerate(nodes):
+        rows = [position[title] for title in members.get(node, ()) if title in position]
+        if not rows:
+            base = node.rsplit("_", 1)[0] if node not in position and node.rsplit("_", 1)[-1].isdigit() else node
+            rows = [position[base]] if base in position else []
+        if rows:
+            sites[k] = mean_site(latlon[rows])
+    return sites
+
+# ===== Spatial index =====
+def neighbour_pairs(latlon, radius_km):
+    """
+    All pairs of points within radius_km along the great circle, from a KD-tree over unit-sphere
+    points: the chord length 2 sin(d / 2R) is monotonic in the great-circle distance d, so a chord
+    radius query is exact. Returns (i, j, distance_km) with i < j.
+    """
+    points = unit_vectors(latlon)
+    chord = 2 * np.sin(min(radius_km / EARTH_RADIUS_KM, np.pi) / 2)
+    pairs = cKDTree(points).query_pairs(chord, output_type="ndarray")
+    if not len(pairs):
+        return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64), np.zeros(0)
+    i, j = pairs.T
+    chords = np.linalg.norm(points[i] - points[j], axis=1)
+    return i, j, 2 * EARTH_RADIUS_KM * np.arcsin(np.clip(chords / 2, 0, 1))
+
+def neighbour_table(labels, latlon, radius_km):
+    """neighbour_pairs as a DataFrame of Specimen1, Specimen2 and Distance_km, nearest first."""
+    labels = np.asarray(labels, dtype=object)
+    i, j, distance = neighbour_pairs(latlon, radius_km)
+    table = pd.DataFrame({"Specimen1": labels[i], "Specimen2": labels[j], "Distance_km": distance})
+    return table.sort_values("Distance_km", kind="stable", ignore_index=True)
+
+# ===== Mantel test =====
+def _centered(matrix):
+    """Symmetric float32 matrix with the off-diagonal mean removed and a zero diagonal."""
+    matrix = np.asarray(matrix, dtype=np.float64)
+    off_diagonal = ~np.eye(len(matrix), dtype=bool)
+    centered = np.where(off_diagonal, matrix - matrix[off_diagonal].mean(), 0.0)
+    return centered.astype(np.float32), np.sqrt((centered ** 2).sum())
+
+def _permuted_cross(x_upper, y, order, rows):
+    """
+    Sum of x * y[order][:, order] over the strict upper triangle (x_upper is x with the rest
+    zeroed), in blocks of rows: each block gathers its permuted rows of y, then their columns at
+    and right of the diagonal, and takes a float32 dot product with the fixed block of x_upper.
+    Block sums add up in float64 in a fixed order, so results do not depend on the process.
+    """
+    total = 0.0
+    for start in range(0, len(order), rows):
+        block = np.take(np.take(y, order[start:start + rows], axis=0), order[start:], axis=1)
+        total += float(np.einsum("ij,ij->", x_upper[start:start + rows, start:], block))
+    return total
+
+_worker_x = None
+_worker_y = None
+
+def _init_worker(x, y):
+    global _worker_x, _worker_y
+    _worker_x, _worker_y = x, y
+
+def _permutation_batch(seed, size, cells=MANTEL_CELLS):
+    """
+    Worker: cross products of x with y[p][:, p] for size random permutations p (see _permuted_cross).
+    The means and norms are permutation invariant, so the cross product is all the Pearson r needs.
+    """
+    n = len(_worker_x)
+    orders = np.random.default_rng(seed).permuted(np.tile(np.arange(n), (size, 1)), axis=1)
+    rows = max(1, cells // max(n, 1))
+    return np.array([_permuted_cross(_worker_x, _worker_y, order, rows) for order in orders])
+
+def mantel_test(x, y, permutations=9999, seed=None, workers=1, batch_size=MANTEL_BATCH):
+    """
+    Mantel test between two square distance matrices (Pearson r over the off-diagonal pairs).
+    Rows and columns of y are permuted together; each batch of batch_size permutations gets its
+    own child seed and batches run on a process pool when workers > 1, so results do not depend
+    on workers. A permutation reads the upper triangle of both matrices once: about 0.015 s at
+    n = 5000 on one core, so 9999 permutations take about 2.5 min there (or that over workers).
+    Returns (r, one-sided p-value for r >= observed, permuted r values).
+    """
+    x, x_norm = _centered(x)
+    y, y_norm = _centered(y)
+    if x.shape != y.shape:
+        raise ValueError(f"Distance matrices differ in shape ({x.shape} vs {y.shape})")
+    if not (np.isfinite(x).all() and np.isfinite(y).all()):
+        raise ValueError("Distance matrices contain NaN or infinite values (e.g. saturated K2P distances; try model='p')")
+    x = np.triu(x, 1)
+    scale = x_norm * y_norm / 2  # Norms are over both triangles, cross products over one
+
+    # The observed r goes through the same summation as the permuted ones, so ties compare equal
+    r = _permuted_cross(x, y, np.arange(len(x)), max(1, MANTEL_CELLS // max(len(x), 1))) / scale
+
+    sizes = [min(batch_size, permutations - start) for start in range(0, permutations, batch_size)]
+    seeds = np.random.SeedSequence(seed).spawn(len(sizes))
+    if workers == 1:
+        _init_worker(x, y)
+        batches = [_permutation_batch(s, size) for s, size in zip(seeds, sizes)]
+    else:
+        with ProcessPoolExecutor(max_workers=workers or os.cpu_count(), initializer=_init_worker,
+                                 initargs=(x, y)) as pool:
+            batches = list(pool.map(_permutation_batch, seeds, sizes))
+    permuted = np.concatenate(batches) / scale if batches else np.zeros(0)
+    p_value = (np.count_nonzero(permuted >= r - 1e-12) + 1) / (len(permuted) + 1)
+    return r, p_value, permuted
+
+def isolation_by_distance(labels, genetic, coordinates_file, permutations=9999, seed=None, workers=1):
+    """
+    Mantel test of genetic against great-circle distance for the specimens present in both the
+    genetic distance matrix (rows labelled by labels) and the coordinates file.
+    Returns (specimens, latlon, r, p_value, permuted r values).
+    """
+    coordinate_labels, latlon = read_coordinates(coordinates_file)
+    position = {label: i for i, label in enumerate(coordinate_labels)}
+    rows = np.array([i for i, label in enumerate(labels) if label in position], dtype=np.int64)
+    if len(rows) < 3:
+        raise ValueError(f"Only {len(rows)} specimens have both sequences and coordinates")
+    specimens = np.asarray(labels, dtype=object)[rows]
+    latlon = latlon[[position[label] for label in specimens]]
+    genetic = np.asarray(genetic)[np.ix_(rows, rows)]
+    r, p_value, permuted = mantel_test(genetic, haversine_matrix(latlon), permutations, seed, workers)
+    return specimens, latlon, r, p_value, permuted
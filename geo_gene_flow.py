@@ -1,119 +1,185 @@
-import networkx as nx
+import os
 import numpy as np
-import plotly.graph_objects as go
-import matplotlib.pyplot as plt
-import matplotlib.colors as mcolors
+import pandas as pd
+from network_core import read_network
+from haplotype_network import build_network_file, read_haplotype_members
+from k2p_distance import distance_matrix_from_fasta
+from geo_distance import read_coordinates, neighbour_table, isolation_by_distance, node_sites
+from network_layout import compute_layout
+from network_traces import edge_segments, normalize, level_of_detail
 
 # Load network data
 network_file = "cox1_combined.nexus_network.txt"
 
-# Read network file
-edges = []
-mutation_steps = {}  # Store mutation steps per species
-
-with open(network_file, "r") as f:
-    for line in f:
-        parts = line.strip().split("\t")
-        if len(parts) == 3:
-            species1, mutations, species2 = parts
-            mutations = int(mutations)
-            edges.append((species1, species2, mutations))
-            mutation_steps[species1] = mutation_steps.get(species1, 0) + mutations
-            mutation_steps[species2] = mutation_steps.get(species2, 0) + mutations
-
-# Create a network graph
-G = nx.Graph()
-for edge in edges:
-    G.add_edge(edge[0], edge[1], weight=edge[2])
-
-# Identify high mutation rate species (Top 15%)
-sorted_mutations = sorted(mutation_steps.values(), reverse=True)
-high_mutation_threshold = sorted_mutations[int(len(sorted_mutations) * 0.15)]
-
-degree_centrality = nx.degree_centrality(G)
-high_degree_threshold = np.percentile(list(degree_centrality.values()), 85)
-
-# Assign 3D positions
-pos = nx.spring_layout(G, dim=3, seed=42)
-
-# Extract node positions & properties
-node_x, node_y, node_z = [], [], []
-node_colors, node_sizes = [], []
-node_labels = {}
-
-cmap = plt.get_cmap("coolwarm")
-plotly_colorscale = [[i / 100, mcolors.rgb2hex(cmap(i / 100))] for i in range(101)]
-
-# Define species to highlight
-highlight_species = {"Ablennes hians", "Harpadon nehereus", "Hydrophis schistosus"}
-
-for node in G.nodes():
-    x, y, z = pos[node]
-    node_x.append(x)
-    node_y.append(y)
-    node_z.append(z)
-
-    norm_mutation = (mutation_steps[node] - min(mutation_steps.values())) / (max(mutation_steps.values()) - min(mutation_steps.values()))
-    node_colors.append(norm_mutation)
-
-    if node in highlight_species:
-        node_sizes.append(15)  # Highlight species with larger nodes
-        node_labels[node] = f'<b>{node}</b>'  # Bold & Red Labels
-    elif mutation_steps[node] >= high_mutation_threshold or degree_centrality[node] >= high_degree_threshold:
-        node_sizes.append(12)
-        node_labels[node] = f'<b>{node}</b>'
+# Build the network from an aligned FASTA instead of an external export: identical sequences are
+# collapsed into haplotypes and joined by a minimum spanning network, written to network_file
+alignment_file = None  # e.g. "cox1_aligned.fas"
+network_workers = 1
+
+# Haplotype/Count/Members table written with the network; the geographic layout places each
+# haplotype at the sites of its member specimens
+haplotype_file = "cox1_haplotypes.tsv"
+
+# Isolation by distance: sampling sites per specimen (CSV with Specimen, Latitude, Longitude).
+# Pairs within neighbour_radius_km are listed; with alignment_file, genetic (genetic_model) and
+# great-circle distances are compared by a Mantel test on geo_workers processes
+coordinates_file = None  # e.g. "cox1_coordinates.csv"
+genetic_model = "k2p"
+mantel_permutations = 9999
+neighbour_radius_km = 50
+geo_workers = 1
+ibd_output_prefix = "isolation_by_distance"
+
+# Place nodes at their sampling coordinates (x = longitude, y = latitude; z keeps the layout depth)
+geographic_layout = False
+
+# "barnes-hut" (multilevel octree layout) or "spring" (networkx); positions are cached on disk
+layout_method = "barnes-hut"
+
+# Level-of-detail export for huge networks: compact HTML/JSON instead of an interactive window
+lod_export = False
+lod_output_prefix = "geo_gene_flow_lod"
+
+# Headless runs stop after the computed outputs and the layout cache, without building a figure
+headless = False
+
+def main():
+    if alignment_file:
+        build_network_file(alignment_file, network_file, haplotype_file, workers=network_workers)
+
+    if coordinates_file:
+        coordinate_labels, coordinates = read_coordinates(coordinates_file)
+        neighbours = neighbour_table(coordinate_labels, coordinates, neighbour_radius_km)
+        neighbours.to_csv(f"{ibd_output_prefix}_neighbours.csv", index=False)
+        print(f"{len(neighbours)} specimen pairs within {neighbour_radius_km} km saved as {ibd_output_prefix}_neighbours.csv")
+        if alignment_file:
+            labels, genetic = distance_matrix_from_fasta(alignment_file, model=genetic_model, workers=geo_workers)
+            specimens, _, r, p_value, _ = isolation_by_distance(labels, genetic, coordinates_file, mantel_permutations,
+                                                                seed=42, workers=geo_workers)
+            pd.DataFrame({"Specimens": [len(specimens)], "Mantel_r": [r], "P_value": [p_value],
+                          "Permutations": [mantel_permutations]}).to_csv(f"{ibd_output_prefix}_mantel.csv", index=False)
+            print(f"Isolation by distance: Mantel r = {r:.4f}, p = {p_value:.4g} ({len(specimens)} specimens)")
+
+    # Read network file into integer node ids, CSR adjacency and per-node mutation step sums
+    network = read_network(network_file)
+    nodes = network.names
+    mutation_steps = network.mutation_steps
+
+    # Identify high mutation rate species (Top 15%)
+    sorted_mutations = np.sort(mutation_steps)[::-1]
+    high_mutation_threshold = sorted_mutations[int(len(sorted_mutations) * 0.15)]
+
+    degree_centrality = network.degree_centrality()
+    high_degree_threshold = np.percentile(degree_centrality, 85)
+
+    # Assign 3D positions (shared cache with 3d_network_map.py)
+    pos = compute_layout(network, method=layout_method, seed=42)
+
+    if geographic_layout and coordinates_file:
+        members = read_haplotype_members(haplotype_file) if haplotype_file and os.path.exists(haplotype_file) else None
+        latlon = node_sites(nodes, coordinate_labels, coordinates, members)
+        located = ~np.isnan(latlon[:, 0])
+
+        # Nodes without a sampling site (e.g. inferred haplotypes) sit at the mean of their located
+        # neighbours, or at the centroid of all sites
+        unplaced = np.flatnonzero(~located)
+        if len(unplaced):
+            print(f"{len(unplaced)} of {len(nodes)} nodes have no sampling site and are placed by their neighbours: "
+                  + ", ".join(str(node) for node in nodes[unplaced[:10]]) + (", ..." if len(unplaced) > 10 else ""))
+        for i in unplaced:
+            neighbours_i = network.indices[network.indptr[i]:network.indptr[i + 1]]
+            neighbours_i = neighbours_i[located[neighbours_i]]
+            latlon[i] = latlon[neighbours_i].mean(axis=0) if len(neighbours_i) else coordinates.mean(axis=0)
+        pos = np.column_stack([latlon[:, 1], latlon[:, 0], pos[:, 2]])
+
+    if headless:
+        print(f"Network with {len(network.names)} nodes and {len(network.src)} edges; layout cached")
+        return
+    plot_network(network, pos, high_mutation_threshold, degree_centrality, high_degree_threshold,
+                 geographic_layout and bool(coordinates_file))
+
+def plot_network(network, pos, high_mutation_threshold, degree_centrality, high_degree_threshold, geographic):
+    """3D gene flow network with highlighted species, shown interactively or saved as a level-of-detail export."""
+    import plotly.graph_objects as go
+    import matplotlib.pyplot as plt
+    import matplotlib.colors as mcolors
+
+    nodes = network.names
+    mutation_steps = network.mutation_steps
+
+    cmap = plt.get_cmap("coolwarm")
+    plotly_colorscale = [[i / 100, mcolors.rgb2hex(cmap(i / 100))] for i in range(101)]
+
+    # Define species to highlight
+    highlight_species = {"Ablennes hians", "Harpadon nehereus", "Hydrophis schistosus"}
+
+    # Node properties as arrays; min/max of the mutation steps are taken once, not per node
+    node_colors = normalize(mutation_steps)
+    highlighted = np.isin(nodes, list(highlight_species))
+    major_node = (mutation_steps >= high_mutation_threshold) | (degree_centrality >= high_degree_threshold)
+    node_sizes = np.select([highlighted, major_node], [15, 12], default=5)  # Highlight species with larger nodes
+    labelled = highlighted | major_node
+    node_text = np.where(labelled, [f'<b>{node}</b>' for node in nodes], "")  # Bold labels
+
+    # Create edge traces for stepwise gene flow, NaN separators between segments
+    if lod_export:
+        # Fold leaf haplotypes into their neighbours and bundle low-weight edges
+        kept, collapsed, edge_x, edge_y, edge_z = level_of_detail(network, pos, protected=labelled)
+        node_sizes = node_sizes[kept] + 2 * np.log1p(collapsed)
+        node_colors, node_text = node_colors[kept], node_text[kept]
     else:
-        node_sizes.append(5)
-
-# Create edge traces for stepwise gene flow
-edge_x, edge_y, edge_z, edge_colors, edge_widths = [], [], [], [], []
-for edge in G.edges():
-    x0, y0, z0 = pos[edge[0]]
-    x1, y1, z1 = pos[edge[1]]
-    edge_x.extend([x0, x1, None])
-    edge_y.extend([y0, y1, None])
-    edge_z.extend([z0, z1, None])
-
-    mutation_distance = G[edge[0]][edge[1]]['weight']
-    edge_widths.append(max(1, 5 - (mutation_distance / 10)))  # Adjust width dynamically
-    edge_colors.append(mutation_distance)
-
-edge_trace = go.Scatter3d(
-    x=edge_x, y=edge_y, z=edge_z,
-    line=dict(width=2, color='gray'),
-    hoverinfo='none',
-    mode='lines'
-)
-
-# Create node trace with improved labels
-node_trace = go.Scatter3d(
-    x=node_x, y=node_y, z=node_z,
-    mode='markers+text',
-    marker=dict(
-        size=node_sizes,
-        color=node_colors,
-        colorscale=plotly_colorscale,
-        opacity=0.9,
-        line=dict(width=1, color="black"),
-        showscale=True,
-        colorbar=dict(title="Mutation Steps (Low → High)")
-    ),
-    text=[node_labels.get(node, "") for node in G.nodes()],
-    hoverinfo="text"
-)
-
-# Create figure
-fig = go.Figure(data=[edge_trace, node_trace])
-
-fig.update_layout(
-    title="3D Gene Flow Network with Highlighted Species",
-    margin=dict(l=0, r=0, b=0, t=40),
-    showlegend=False,
-    scene=dict(
-        xaxis=dict(title="X-axis"),
-        yaxis=dict(title="Y-axis"),
-        zaxis=dict(title="Z-axis"),
+        kept = np.arange(len(nodes))
+        edge_x, edge_y, edge_z = edge_segments(pos, network.src, network.dst)
+    node_x, node_y, node_z = pos[kept].astype(np.float32).T
+
+    edge_widths = np.maximum(1, 5 - network.weight / 10)  # Adjust width dynamically
+    edge_colors = network.weight
+
+    edge_trace = go.Scatter3d(
+        x=edge_x, y=edge_y, z=edge_z,
+        line=dict(width=2, color='gray'),
+        hoverinfo='none',
+        mode='lines'
     )
-)
 
-fig.show()
+    # Create node trace with improved labels
+    node_trace = go.Scatter3d(
+        x=node_x, y=node_y, z=node_z,
+        mode='markers+text',
+        marker=dict(
+            size=node_sizes,
+            color=node_colors,
+            colorscale=plotly_colorscale,
+            opacity=0.9,
+            line=dict(width=1, color="black"),
+            showscale=True,
+            colorbar=dict(title="Mutation Steps (Low → High)")
+        ),
+        text=node_text,
+        hoverinfo="text"
+    )
+
+    # Create figure
+    fig = go.Figure(data=[edge_trace, node_trace])
+
+    fig.update_layout(
+        title="3D Gene Flow Network with Highlighted Species",
+        margin=dict(l=0, r=0, b=0, t=40),
+        showlegend=False,
+        scene=dict(
+            xaxis=dict(title="Longitude" if geographic else "X-axis"),
+            yaxis=dict(title="Latitude" if geographic else "Y-axis"),
+            zaxis=dict(title="Z-axis"),
+        )
+    )
+
+    if lod_export:
+        # Compact export for very large networks
+        fig.write_html(lod_output_prefix + ".html", include_plotlyjs="cdn")
+        fig.write_json(lod_output_prefix + ".json")
+        print(f"Level-of-detail network saved as {lod_output_prefix}.html/.json")
+    else:
+        fig.show()
+
+if __name__ == "__main__":
+    main()
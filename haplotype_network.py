@@ -0,0 +1,157 @@
+import hashlib
+import math
+import os
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import pandas as pd
+from k2p_distance import NIBBLE_CODES, TILE_WORDS, read_aligned_fasta, encode_bitplanes, tile_difference_counts
+from network_core import network_from_edges, write_network
+
+# ===== Haplotypes =====
+def collapse_haplotypes(titles, matrix):
+    """
+    Collapse identical sequences by hashing their 4-bit nucleotide codes (so case and U/T do
+    not matter). Returns (rows, members): the matrix row of each haplotype's first sequence
+    and the titles of all its sequences, in order of first appearance.
+    """
+    codes = NIBBLE_CODES[matrix]
+    index, rows, members = {}, [], []
+    for i, row in enumerate(codes):
+        key = hashlib.blake2b(row.tobytes(), digest_size=16).digest()
+        if key not in index:
+            index[key] = len(rows)
+            rows.append(i)
+            members.append([])
+        members[index[key]].append(titles[i])
+    return np.asarray(rows, dtype=np.int64), members
+
+def haplotype_labels(members):
+    """Label each haplotype by its first sequence title, suffixing _2, _3, ... to repeated titles."""
+    labels, used = [], set()
+    for titles in members:
+        label, k = titles[0], 1
+        while label in used:
+            k += 1
+            label = f"{titles[0]}_{k}"
+        used.add(label)
+        labels.append(label)
+    return labels
+
+# ===== Spanning networks =====
+def _roots(parent):
+    """Root of every node of a union-find parent array, by pointer jumping."""
+    while True:
+        grand = parent[parent]
+        if np.array_equal(grand, parent):
+            return parent
+        parent = grand
+
+def spanning_edges(n_nodes, src, dst, weight, all_minimum=True):
+    """
+    Minimum spanning network by sorted-edge union-find (Kruskal). Edges are taken in order of
+    weight; with all_minimum every edge of a weight class that joins two components as they were
+    before that class is kept (the union of all minimum spanning trees), otherwise only the
+    edges of one minimum spanning tree. Returns the kept (src, dst, weight).
+    """
+    # Order by (weight, src, dst) through one integer key; far faster than lexsort on tile-sized inputs
+    order = np.argsort((weight.astype(np.int64) * n_nodes + src) * n_nodes + dst)
+    src, dst, weight = src[order], dst[order], weight[order]
+    bounds = np.concatenate([[0], np.flatnonzero(np.diff(weight)) + 1, [len(weight)]])
+
+    parent = np.arange(n_nodes)
+    keep = np.zeros(len(weight), dtype=bool)
+    components = n_nodes
+    for start, stop in zip(bounds[:-1], bounds[1:]):
+        if components == 1:
+            break
+        parent = _roots(parent)
+        a, b = parent[src[start:stop]], parent[dst[start:stop]]
+        cross = np.flatnonzero(a != b)
+        if all_minimum:
+            keep[start + cross] = True
+
+        links = parent.tolist()
+        for k, u, v in zip(cross.tolist(), a[cross].tolist(), b[cross].tolist()):
+            while links[u] != u:
+                links[u] = u = links[links[u]]
+            while links[v] != v:
+                links[v] = v = links[links[v]]
+            if u != v:
+                links[u] = v
+                components -= 1
+                keep[start + k] = True
+        parent = np.asarray(links)
+    return src[keep], dst[keep], weight[keep]
+
+_worker_planes = None
+
+def _init_worker(planes):
+    global _worker_planes
+    _worker_planes = planes
+
+def _tile_edges(rows, cols, all_minimum):
+    """
+    Worker: mutation steps for a rows x cols tile, reduced to the tile's own spanning network.
+    An edge dropped here is heavier than a path inside the tile, so it is in no global minimum
+    spanning tree either; only O(tile) edges per tile reach the final pass.
+    """
+    steps = tile_difference_counts(_worker_planes, rows, cols)
+    pairs = np.ones_like(steps, dtype=bool)
+    i, j = np.nonzero(np.triu(pairs, 1) if rows[0] == cols[0] else pairs)  # Diagonal tiles: upper triangle only
+    nodes = np.union1d(rows, cols)
+    src, dst, weight = spanning_edges(len(nodes), np.searchsorted(nodes, rows[i]), np.searchsorted(nodes, cols[j]),
+                                      steps[i, j], all_minimum)
+    return nodes[src], nodes[dst], weight
+
+def minimum_spanning_network(planes, all_minimum=True, workers=1, tile=None):
+    """
+    Minimum spanning network over bit-plane encoded haplotypes, with mutation steps as the
+    Hamming distance at sites where both sequences are unambiguous. The upper triangle is
+    split into tiles (on a process pool when workers > 1), each reduced to its local spanning
+    network before the global union-find pass. Returns (src, dst, steps) arrays.
+    """
+    n, words = planes.shape[1], planes.shape[2]
+    tile = tile or max(16, int(math.sqrt(TILE_WORDS / max(words, 1))))
+    blocks = [np.arange(start, min(start + tile, n)) for start in range(0, n, tile)]
+    tasks = [(blocks[i], blocks[j]) for i in range(len(blocks)) for j in range(i, len(blocks))]
+
+    if workers == 1:
+        _init_worker(planes)
+        results = [_tile_edges(rows, cols, all_minimum) for rows, cols in tasks]
+    else:
+        with ProcessPoolExecutor(max_workers=workers or os.cpu_count(), initializer=_init_worker,
+                                 initargs=(planes,)) as pool:
+            results = list(pool.map(_tile_edges, *zip(*tasks), [all_minimum] * len(tasks)))
+    if not results:
+        return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+    src, dst, steps = (np.concatenate(parts) for parts in zip(*results))
+    return spanning_edges(n, src, dst, steps, all_minimum)
+
+# ===== Building networks =====
+def haplotype_network_from_fasta(fasta_file, all_minimum=True, workers=1, tile=None):
+    """
+    Collapse an aligned FASTA file into haplotypes and build their minimum spanning network.
+    Returns (labels, members, src, dst, steps); labels and members are per haplotype.
+    """
+    titles, matrix = read_aligned_fasta(fasta_file)
+    rows, members = collapse_haplotypes(titles, matrix)
+    src, dst, steps = minimum_spanning_network(encode_bitplanes(matrix[rows]), all_minimum, workers, tile)
+    return haplotype_labels(members), members, src, dst, steps
+
+def build_network_file(fasta_file, network_file, haplotype_file=None, all_minimum=True, workers=1, tile=None):
+    """
+    Write the minimum spanning haplotype network of an aligned FASTA file as the
+    species/mutations/species edge list read_network parses, plus an optional
+    Haplotype/Count/Members table. Returns the HaplotypeNetwork.
+    """
+    labels, members, src, dst, steps = haplotype_network_from_fasta(fasta_file, all_minimum, workers, tile)
+    write_network(network_file, labels, src, dst, steps)
+    if haplotype_file:
+        pd.DataFrame({"Haplotype": labels, "Count": [len(titles) for titles in members],
+                      "Members": [";".join(titles) for titles in members]}).to_csv(haplotype_file, sep="\t", index=False)
+    return network_from_edges(np.asarray(labels, dtype=object)[src], np.asarray(labels, dtype=object)[dst], steps)
+
+def read_haplotype_members(haplotype_file):
+    """{haplotype label: member sequence titles} from a table written by build_network_file."""
+    table = pd.read_csv(haplotype_file, sep="\t", dtype=str, keep_default_na=False)
+    return dict(zip(table["Haplotype"], table["Members"].str.split(";")))
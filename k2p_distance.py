@@ -0,0 +1,162 @@
+import math
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+
+# 4-bit nucleotide codes: one bit per base, ambiguity codes are the OR of their bases,
+# gaps and unknown characters are 0
+BASE_BITS = {"A": 1, "C": 2, "G": 4, "T": 8, "U": 8,
+             "R": 5, "Y": 10, "S": 6, "W": 9, "K": 12, "M": 3,
+             "B": 14, "D": 13, "H": 11, "V": 7, "N": 15}
+
+NIBBLE_CODES = np.zeros(256, dtype=np.uint8)
+for base, bits in BASE_BITS.items():
+    NIBBLE_CODES[ord(base)] = bits
+    NIBBLE_CODES[ord(base.lower())] = bits
+
+# Codes with exactly one base set; everything else is skipped pairwise
+DEFINITE_CODES = np.array([bin(code).count("1") == 1 for code in range(16)])
+
+# Upper bound on 64-bit words broadcast per pairwise tile
+TILE_WORDS = 1 << 22
+
+# ===== Encoding =====
+def read_aligned_fasta(fasta_file):
+    """Return (titles, uint8 matrix) for an aligned FASTA file."""
+    from Bio.SeqIO.FastaIO import SimpleFastaParser
+
+    titles, rows = [], []
+    with open(fasta_file, "r") as handle:
+        for title, sequence in SimpleFastaParser(handle):
+            titles.append(title.strip())
+            rows.append(sequence.encode("ascii"))
+    if not rows:
+        raise ValueError(f"{fasta_file} contains no sequences")
+    lengths = {len(row) for row in rows}
+    if len(lengths) != 1:
+        raise ValueError(f"{fasta_file} is not aligned (sequence lengths {sorted(lengths)})")
+    return titles, np.frombuffer(b"".join(rows), dtype=np.uint8).reshape(len(rows), lengths.pop())
+
+def encode_bitplanes(matrix):
+    """
+    Encode an ASCII alignment matrix as 4-bit nucleotide codes packed into bit planes.
+    Returns a (5, n_sequences, words) uint64 array: planes for A, C, G, T and a plane
+    marking definite (unambiguous, non-gap) sites.
+    """
+    codes = NIBBLE_CODES[matrix]
+    planes = [codes & bit for bit in (1, 2, 4, 8)] + [DEFINITE_CODES[codes & 15]]
+    packed = np.stack([np.packbits(plane != 0, axis=1) for plane in planes])
+    pad = (-packed.shape[2]) % 8
+    if pad:
+        packed = np.pad(packed, ((0, 0), (0, 0), (0, pad)))
+    return np.ascontiguousarray(packed).view(np.uint64)
+
+if hasattr(np, "bitwise_count"):
+    def _popcount(words):
+        return np.bitwise_count(words).sum(axis=-1, dtype=np.int64)
+else:
+    _BYTE_POPCOUNT = np.array([bin(i).count("1") for i in range(256)], dtype=np.uint8)
+
+    def _popcount(words):
+        return _BYTE_POPCOUNT[words.view(np.uint8)].sum(axis=-1, dtype=np.int64)
+
+# ===== Pairwise counting =====
+def tile_substitution_counts(planes, rows, cols):
+    """
+    Count compared sites, transitions and transversions for every pair in rows x cols.
+    Sites where either sequence has a gap or an ambiguity code are skipped (pairwise deletion).
+    """
+    a, c, g, t, definite = (plane[rows][:, None, :] for plane in planes)
+    a2, c2, g2, t2, definite2 = (plane[cols][None, :, :] for plane in planes)
+
+    valid = definite & definite2
+    same = ((a & a2) | (c & c2) | (g & g2) | (t & t2)) & valid
+    transversions = ((a | g) ^ (a2 | g2)) & valid
+
+    sites = _popcount(valid)
+    differences = sites - _popcount(same)
+    transversion_count = _popcount(transversions)
+    return sites, differences - transversion_count, transversion_count
+
+def tile_difference_counts(planes, rows, cols):
+    """Differing definite sites (Hamming distance under pairwise deletion) for every pair in rows x cols."""
+    a, c, g, t, definite = (plane[rows][:, None, :] for plane in planes)
+    a2, c2, g2, t2, definite2 = (plane[cols][None, :, :] for plane in planes)
+    valid = definite & definite2
+    return _popcount(valid) - _popcount(((a & a2) | (c & c2) | (g & g2) | (t & t2)) & valid)
+
+def pairwise_distance(sites, transitions, transversions, model="k2p"):
+    """p-distance or Kimura 2-parameter distance; NaN where undefined (no sites or saturation)."""
+    with np.errstate(divide="ignore", invalid="ignore"):
+        P = transitions / sites
+        Q = transversions / sites
+        if model == "p":
+            return P + Q
+        if model != "k2p":
+            raise ValueError(f"Unknown distance model: {model}")
+        w1, w2 = 1 - 2 * P - Q, 1 - 2 * Q
+        distance = -0.5 * np.log(w1) - 0.25 * np.log(w2)
+    return np.where((w1 > 0) & (w2 > 0), distance, np.nan)
+
+_worker_planes = None
+
+def _init_worker(planes):
+    global _worker_planes
+    _worker_planes = planes
+
+def _tile_distance(rows, cols, model):
+    return rows, cols, pairwise_distance(*tile_substitution_counts(_worker_planes, rows, cols), model=model)
+
+def distance_matrix(planes, model="k2p", workers=1, tile=None, dtype=np.float32):
+    """
+    Symmetric pairwise distance matrix from encoded bit planes.
+    The upper triangle is split into tiles that are computed on a process pool when workers > 1.
+    """
+    n, words = planes.shape[1], planes.shape[2]
+    tile = tile or max(16, int(math.sqrt(TILE_WORDS / max(words, 1))))
+    blocks = [np.arange(start, min(start + tile, n)) for start in range(0, n, tile)]
+    tasks = [(blocks[i], blocks[j]) for i in range(len(blocks)) for j in range(i, len(blocks))]
+
+    out = np.empty((n, n), dtype=dtype)
+
+    def store(rows, cols, values):
+        out[np.ix_(rows, cols)] = values
+        out[np.ix_(cols, rows)] = values.T
+
+    if workers == 1:
+        _init_worker(planes)
+        for rows, cols in tasks:
+            store(*_tile_distance(rows, cols, model))
+    else:
+        workers = workers or os.cpu_count()
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(planes,)) as pool:
+            for result in pool.map(_tile_distance, *zip(*tasks), [model] * len(tasks)):
+                store(*result)
+    return out
+
+def distance_matrix_from_fasta(fasta_file, model="k2p", workers=1, tile=None, dtype=np.float32):
+    """
+    K2P (model="k2p") or p-distance (model="p") matrix for an aligned FASTA file.
+    Returns (labels, matrix) ready for barcode_gap_engine.barcode_gap_statistics.
+    """
+    titles, matrix = read_aligned_fasta(fasta_file)
+    return titles, distance_matrix(encode_bitplanes(matrix), model, workers, tile, dtype)
+
+def header_species(titles, species=None):
+    """
+    Species label for each FASTA title. species may be a regular expression (its first group,
+    or the whole match, is the species; titles it does not match are kept), a callable
+    title -> species, or None for the first two '_'/space-separated tokens joined by a space
+    ('Genus_species_voucher123' -> 'Genus species').
+    """
+    if species is None:
+        return [" ".join(re.split(r"[_\s]+", title.strip())[:2]) for title in titles]
+    if callable(species):
+        return [species(title) for title in titles]
+    pattern = re.compile(species)
+    labels = []
+    for title in titles:
+        match = pattern.search(title)
+        labels.append(title if match is None else match.group(1 if pattern.groups else 0))
+    return labels
@@ -0,0 +1,70 @@
+import numpy as np
+from matplotlib.colors import to_rgba
+
+# Upper bound on position labels drawn along the x-axis in decimated mode
+MAX_POSITION_LABELS = 100
+
+# ===== Decimation =====
+def axes_pixel_width(ax):
+    """Width of an axes in device pixels at the figure's dpi."""
+    fig = ax.figure
+    return max(1, int(ax.get_position().width * fig.get_figwidth() * fig.dpi))
+
+def minmax_envelope(x, y, n_bins):
+    """
+    Decimate a series to a min/max envelope: positions are split into n_bins contiguous bins
+    (one per pixel column) and each bin keeps its minimum and maximum in their original order,
+    so the drawn line covers exactly the same pixels. All-NaN bins stay NaN (gaps).
+    Series shorter than 2 * n_bins are returned unchanged.
+    """
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    if len(y) <= 2 * n_bins:
+        return x, y
+
+    bin_size = -(-len(y) // n_bins)
+    n_bins = -(-len(y) // bin_size)
+    padded = np.full(n_bins * bin_size, np.nan)
+    padded[:len(y)] = y
+    padded = padded.reshape(n_bins, bin_size)
+    missing = np.isnan(padded)
+
+    low = np.where(missing, np.inf, padded).argmin(axis=1)
+    high = np.where(missing, -np.inf, padded).argmax(axis=1)
+    first, second = np.minimum(low, high), np.maximum(low, high)
+    index = (np.arange(n_bins)[:, None] * bin_size + np.column_stack([first, second])).ravel()
+    index = np.minimum(index, len(y) - 1)
+
+    values = y[index]
+    values[np.repeat(missing.all(axis=1), 2)] = np.nan
+    return x[index], values
+
+def decimate_series(x, y, ax):
+    """Min/max envelope of a series at the pixel width of the axes it is drawn on."""
+    return minmax_envelope(x, y, axes_pixel_width(ax))
+
+# ===== Markers =====
+def position_markers(ax, positions, per_pixel=False, **kwargs):
+    """
+    Full-height vertical markers at the given positions, drawn as a single LineCollection.
+    With per_pixel, markers falling in the same pixel column of the data range are drawn once,
+    with the opacity that stacking them would have produced (1 - (1 - alpha)**count).
+    """
+    positions = np.asarray(positions, dtype=np.float64)
+    if per_pixel and len(positions):
+        low, span = positions.min(), max(np.ptp(positions), 1e-12)
+        columns = np.floor((positions - low) / span * (axes_pixel_width(ax) - 1)).astype(np.int64)
+        _, first, counts = np.unique(columns, return_index=True, return_counts=True)
+        positions = positions[first]
+        alpha = kwargs.pop("alpha", None)
+        if alpha is not None:
+            colors = np.tile(to_rgba(kwargs.pop("color", "C0")), (len(positions), 1))
+            colors[:, 3] = 1 - (1 - alpha) ** counts
+            kwargs["colors"] = colors
+    return ax.vlines(positions, 0, 1, transform=ax.get_xaxis_transform(), **kwargs)
+
+def position_labels(ax, positions, y, max_labels=MAX_POSITION_LABELS, **kwargs):
+    """Label at most max_labels evenly spaced positions at height y."""
+    positions = np.asarray(positions)
+    step = max(1, -(-len(positions) // max(1, max_labels)))
+    return [ax.text(pos, y, f"{int(pos)}", **kwargs) for pos in positions[::step]]
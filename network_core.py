@@ -0,0 +1,103 @@
+import csv
+import numpy as np
+import pandas as pd
+
+class HaplotypeNetwork:
+    """
+    Integer-indexed haplotype network.
+
+    names[i] is the label of node i (in order of first appearance in the edge list),
+    edges are stored once as (src, dst, weight) arrays and as a symmetric CSR adjacency
+    (indptr, indices, adjacency_weight). mutation_steps[i] is the sum of mutation counts
+    over every edge line touching node i.
+    """
+
+    def __init__(self, names, src, dst, weight, mutation_steps):
+        self.names = names
+        self.src = src
+        self.dst = dst
+        self.weight = weight
+        self.mutation_steps = mutation_steps
+        self.indptr, self.indices, self.adjacency_weight = build_csr(len(names), src, dst, weight)
+
+    @property
+    def n_nodes(self):
+        return len(self.names)
+
+    @property
+    def n_edges(self):
+        return len(self.src)
+
+    def degree(self):
+        """Node degrees, with self-loops counted twice as in networkx."""
+        loops = np.bincount(self.src[self.src == self.dst], minlength=self.n_nodes)
+        return np.diff(self.indptr) + loops
+
+    def degree_centrality(self):
+        """Degree divided by n - 1, matching networkx.degree_centrality."""
+        if self.n_nodes <= 1:
+            return np.ones(self.n_nodes)
+        return self.degree() / (self.n_nodes - 1)
+
+    def to_networkx(self):
+        """Build a networkx.Graph with 'weight' edge attributes (only when explicitly needed)."""
+        import networkx as nx
+
+        G = nx.Graph()
+        G.add_nodes_from(self.names)
+        G.add_weighted_edges_from(zip(self.names[self.src], self.names[self.dst], self.weight.tolist()))
+        return G
+
+def build_csr(n_nodes, src, dst, weight):
+    """Symmetric CSR adjacency (indptr, indices, weights) from undirected edge arrays."""
+    loops = src == dst
+    rows = np.concatenate([src, dst[~loops]])
+    cols = np.concatenate([dst, src[~loops]])
+    weights = np.concatenate([weight, weight[~loops]])
+    order = np.lexsort((cols, rows))
+    indptr = np.zeros(n_nodes + 1, dtype=np.int64)
+    np.cumsum(np.bincount(rows, minlength=n_nodes), out=indptr[1:])
+    return indptr, cols[order], weights[order]
+
+def network_from_edges(species1, species2, mutations):
+    """
+    Build a HaplotypeNetwork from parallel arrays of endpoint labels and mutation counts.
+    Repeated edges keep the last weight (as networkx does) but all count toward mutation_steps.
+    """
+    species1 = np.asarray(species1, dtype=object)
+    species2 = np.asarray(species2, dtype=object)
+    mutations = np.asarray(mutations, dtype=np.int64)
+
+    # Interleave endpoints so node ids follow first appearance, like Graph.add_edge
+    codes, names = pd.factorize(np.column_stack([species1, species2]).ravel())
+    src, dst = codes[0::2], codes[1::2]
+    names = np.asarray(names, dtype=object)
+
+    mutation_steps = (np.bincount(src, weights=mutations, minlength=len(names))
+                      + np.bincount(dst, weights=mutations, minlength=len(names))).astype(np.int64)
+
+    # One entry per undirected edge, keeping the last occurrence
+    low, high = np.minimum(src, dst), np.maximum(src, dst)
+    key = low * len(names) + high
+    _, last = np.unique(key[::-1], return_index=True)
+    keep = np.sort(len(key) - 1 - last)
+    return HaplotypeNetwork(names, src[keep], dst[keep], mutations[keep], mutation_steps)
+
+def read_network(network_file):
+    """
+    Read a tab-separated 'species1<TAB>mutations<TAB>species2' edge list in bulk.
+    Lines that do not have exactly three fields are skipped.
+    """
+    df = pd.read_csv(network_file, sep="\t", header=None, names=["species1", "mutations", "species2"],
+                     dtype=str, keep_default_na=False, na_filter=False, quoting=csv.QUOTE_NONE,
+                     on_bad_lines="skip", skip_blank_lines=True, engine="c")
+    df = df.dropna().apply(lambda column: column.str.strip())
+    df = df[(df != "").all(axis=1)]
+    return network_from_edges(df["species1"].to_numpy(), df["species2"].to_numpy(),
+                              df["mutations"].astype(np.int64).to_numpy())
+
+def write_network(network_file, names, src, dst, weight):
+    """Write edges as the tab-separated 'species1<TAB>mutations<TAB>species2' list read_network parses."""
+    names = np.asarray(names, dtype=object)
+    pd.DataFrame({"species1": names[src], "mutations": np.asarray(weight, dtype=np.int64), "species2": names[dst]}).to_csv(
+        network_file, sep="\t", header=False, index=False, quoting=csv.QUOTE_NONE)
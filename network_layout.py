@@ -0,0 +1,266 @@
+import hashlib
+import json
+import math
+import os
+import numpy as np
+from network_core import build_csr
+
+# Layout cache shared by the network scripts
+LAYOUT_CACHE_DIR = os.environ.get("LAYOUT_CACHE_DIR", ".layout_cache")
+
+# Bump when the layout algorithm changes so stale positions are never reused
+LAYOUT_VERSION = 1
+
+# Coarsening stops below this many nodes or when a level shrinks by less than 25%
+COARSEST_NODES = 64
+
+# Octree levels up to this depth use a dense cell lookup grid (8**depth entries)
+DENSE_GRID_DEPTH = 7
+
+# Node x interaction-cell pairs evaluated per batch
+NODE_CHUNK_PAIRS = 1 << 20
+
+# Neighbour offsets, and child-of-parent-neighbour offsets (27 parent neighbours x 8 children)
+_NEIGHBOUR_OFFSETS = np.array([(x, y, z) for x in (-1, 0, 1) for y in (-1, 0, 1) for z in (-1, 0, 1)])
+_INTERACTION_OFFSETS = np.array([2 * p + c for p in _NEIGHBOUR_OFFSETS
+                                 for c in [(x, y, z) for x in (0, 1) for y in (0, 1) for z in (0, 1)]])
+
+# ===== Octree (Barnes-Hut style) repulsion =====
+class _CellLevel:
+    """Occupied cells of one octree level with their charge and centre of charge."""
+
+    def __init__(self, cells, pos, charge, depth):
+        self.size = 1 << depth
+        self.depth = depth
+        keys = self.key(cells)
+        self.keys, self.inverse = np.unique(keys, return_inverse=True)
+        self.charge = np.bincount(self.inverse, weights=charge)
+        self.centre = np.column_stack([np.bincount(self.inverse, weights=charge * pos[:, d])
+                                       for d in range(3)]) / self.charge[:, None]
+        if depth <= DENSE_GRID_DEPTH:
+            self.grid = np.full(self.size ** 3, -1, dtype=np.int64)
+            self.grid[self.keys] = np.arange(len(self.keys))
+
+    def key(self, cells):
+        return (cells[:, 0] * self.size + cells[:, 1]) * self.size + cells[:, 2]
+
+    def lookup(self, cells):
+        """Index of each cell in the occupied-cell arrays, -1 when empty or out of range."""
+        inside = ((cells >= 0) & (cells < self.size)).all(axis=1)
+        keys = np.where(inside, self.key(np.clip(cells, 0, self.size - 1)), 0)
+        if self.depth <= DENSE_GRID_DEPTH:
+            found = self.grid[keys]
+        else:
+            found = np.searchsorted(self.keys, keys)
+            found = np.where(found < len(self.keys), found, 0)
+            found = np.where(self.keys[found] == keys, found, -1)
+        return np.where(inside, found, -1)
+
+def octree_depth(n_nodes):
+    """Finest octree level, chosen so leaf cells hold a handful of nodes on average."""
+    return int(np.clip(math.ceil(math.log(max(n_nodes, 2), 8)), 2, 12))
+
+def repulsive_forces(pos, charge, k, depth=None):
+    """
+    Fruchterman-Reingold repulsion (k^2 q_i q_j / d) on every node, approximated with an octree.
+
+    At each level a node interacts with the centre of charge of every cell that is a child of
+    its parent cell's neighbours but not adjacent to its own cell; nodes in adjacent leaf cells
+    interact exactly. Each pair is counted once, giving O(n log n) work per iteration.
+    """
+    n = len(pos)
+    depth = depth or octree_depth(n)
+    lo = pos.min(axis=0)
+    span = max(float((pos.max(axis=0) - lo).max()), 1e-12)
+    unit = (pos - lo) / span * (1 - 1e-9)
+    force = np.zeros_like(pos)
+    chunk = max(1, NODE_CHUNK_PAIRS // len(_INTERACTION_OFFSETS))
+
+    for level in range(2, depth + 1):
+        cells = np.floor(unit * (1 << level)).astype(np.int64)
+        octree = _CellLevel(cells, pos, charge, level)
+
+        # Interaction list per occupied cell (shared by every node in the cell), kept sparse
+        cell_coords = cells[np.unique(octree.inverse, return_index=True)[1]]
+        candidates = 2 * (cell_coords >> 1)[:, None, :] + _INTERACTION_OFFSETS[None, :, :]
+        far = np.abs(candidates - cell_coords[:, None, :]).max(axis=2) > 1
+        found = octree.lookup(candidates.reshape(-1, 3)).reshape(len(cell_coords), -1)
+        list_cell, list_slot = np.nonzero(far & (found >= 0))
+        list_source = found[list_cell, list_slot]
+        list_length = np.bincount(list_cell, minlength=len(cell_coords))
+        list_start = np.cumsum(list_length) - list_length
+
+        for start in range(0, n, chunk):
+            nodes = np.arange(start, min(start + chunk, n))
+            node_cell = octree.inverse[nodes]
+            per_node = list_length[node_cell]
+            i = np.repeat(nodes, per_node)
+            within = np.arange(len(i)) - np.repeat(np.cumsum(per_node) - per_node, per_node)
+            source = list_source[np.repeat(list_start[node_cell], per_node) + within]
+            delta = pos[i] - octree.centre[source]
+            dist2 = np.maximum((delta ** 2).sum(axis=1), 1e-12)
+            contribution = delta * (k * k * charge[i] * octree.charge[source] / dist2)[:, None]
+            for d in range(3):
+                force[:, d] += np.bincount(i, weights=contribution[:, d], minlength=n)
+
+    # Exact interactions with nodes in the 27 adjacent leaf cells
+    cells = np.floor(unit * (1 << depth)).astype(np.int64)
+    leaves = _CellLevel(cells, pos, charge, depth)
+    order = np.argsort(leaves.inverse, kind="stable")
+    starts = np.searchsorted(leaves.inverse[order], np.arange(len(leaves.keys)))
+    counts = np.bincount(leaves.inverse, minlength=len(leaves.keys))
+    for offset in _NEIGHBOUR_OFFSETS:
+        found = leaves.lookup(cells + offset)
+        source = np.flatnonzero(found >= 0)
+        if not len(source):
+            continue
+        per_source = counts[found[source]]
+        i = np.repeat(source, per_source)
+        first = np.repeat(starts[found[source]], per_source)
+        within = np.arange(len(i)) - np.repeat(np.cumsum(per_source) - per_source, per_source)
+        j = order[first + within]
+        keep = i != j
+        i, j = i[keep], j[keep]
+        delta = pos[i] - pos[j]
+        dist2 = np.maximum((delta ** 2).sum(axis=1), 1e-12)
+        contribution = delta * (k * k * charge[i] * charge[j] / dist2)[:, None]
+        for d in range(3):
+            force[:, d] += np.bincount(i, weights=contribution[:, d], minlength=n)
+    return force
+
+def attractive_forces(pos, src, dst, weight, k):
+    """Fruchterman-Reingold spring attraction (w d^2 / k) along every edge."""
+    delta = pos[src] - pos[dst]
+    dist = np.sqrt((delta ** 2).sum(axis=1))
+    pull = delta * (weight * dist / k)[:, None]
+    force = np.zeros_like(pos)
+    for d in range(pos.shape[1]):
+        force[:, d] -= np.bincount(src, weights=pull[:, d], minlength=len(pos))
+        force[:, d] += np.bincount(dst, weights=pull[:, d], minlength=len(pos))
+    return force
+
+def force_directed(pos, src, dst, weight, charge, iterations, k=None, temperature=None):
+    """Cooling force-directed refinement in the style of networkx's Fruchterman-Reingold."""
+    k = k or 1 / math.sqrt(charge.sum())
+    if temperature is None:
+        temperature = float((pos.max(axis=0) - pos.min(axis=0)).max()) * 0.1
+    dt = temperature / (iterations + 1)
+    for _ in range(iterations):
+        displacement = repulsive_forces(pos, charge, k) + attractive_forces(pos, src, dst, weight, k)
+        length = np.maximum(np.sqrt((displacement ** 2).sum(axis=1)), 0.01)
+        pos = pos + displacement * (temperature / length)[:, None]
+        temperature -= dt
+    return pos
+
+# ===== Multilevel coarsening =====
+def coarsen(n_nodes, src, dst, weight):
+    """
+    One coarsening step: mutual heaviest-neighbour pairs merge, then degree-1 nodes join
+    their neighbour's group. Returns (group of each node, coarse src, dst, weight).
+    """
+    indptr, indices, adjacency_weight = build_csr(n_nodes, src, dst, weight)
+    degree = np.diff(indptr)
+    rows = np.repeat(np.arange(n_nodes), degree)
+
+    # Heaviest neighbour per node (ties broken by lowest id)
+    order = np.lexsort((indices, -adjacency_weight, rows))
+    has_neighbour = degree > 0
+    heaviest = np.arange(n_nodes)
+    heaviest[has_neighbour] = indices[order][indptr[:-1][has_neighbour]]
+
+    group = np.arange(n_nodes)
+    mutual = heaviest[heaviest] == np.arange(n_nodes)
+    group[mutual] = np.minimum(np.arange(n_nodes), heaviest)[mutual]
+
+    leaf = (degree == 1) & ~mutual
+    group[leaf] = group[indices[indptr[:-1][leaf]]]
+
+    _, group = np.unique(group, return_inverse=True)
+    coarse_src, coarse_dst = group[src], group[dst]
+    keep = coarse_src != coarse_dst
+    low = np.minimum(coarse_src, coarse_dst)[keep]
+    high = np.maximum(coarse_src, coarse_dst)[keep]
+    keys, inverse = np.unique(low * (group.max() + 1) + high, return_inverse=True)
+    coarse_weight = np.bincount(inverse, weights=weight[keep], minlength=len(keys))
+    size = group.max() + 1
+    return group, keys // size, keys % size, coarse_weight
+
+def multilevel_layout(n_nodes, src, dst, weight, seed=42, iterations=50, refine_iterations=30):
+    """
+    Multilevel force-directed 3D layout with octree repulsion (about O(n log n) per iteration).
+    Returns an (n_nodes, 3) position array scaled into [-1, 1] like networkx layouts.
+    """
+    rng = np.random.default_rng(seed)
+    src, dst = np.asarray(src, dtype=np.int64), np.asarray(dst, dtype=np.int64)
+    weight = np.asarray(weight, dtype=np.float64)
+
+    # Build the hierarchy from fine to coarse
+    hierarchy = [(n_nodes, src, dst, weight, np.ones(n_nodes))]
+    groups = []
+    while hierarchy[-1][0] > COARSEST_NODES:
+        n, s, d, w, charge = hierarchy[-1]
+        group, cs, cd, cw = coarsen(n, s, d, w)
+        n_coarse = group.max() + 1 if n else 0
+        if n_coarse > 0.75 * n:
+            break
+        groups.append(group)
+        hierarchy.append((n_coarse, cs, cd, cw, np.bincount(group, weights=charge, minlength=n_coarse)))
+
+    # Lay out the coarsest graph, then prolong and refine level by level. Every level uses the
+    # finest graph's natural length k, with coarse nodes carrying their member count as charge.
+    k = 1 / math.sqrt(max(n_nodes, 1))
+    n, s, d, w, charge = hierarchy[-1]
+    pos = force_directed(rng.random((n, 3)), s, d, w, charge, iterations, k=k)
+    for level in range(len(groups) - 1, -1, -1):
+        n, s, d, w, charge = hierarchy[level]
+        pos = pos[groups[level]] + rng.normal(scale=0.1 * k, size=(n, 3))
+        extent = float((pos.max(axis=0) - pos.min(axis=0)).max())
+        pos = force_directed(pos, s, d, w, charge, refine_iterations, k=k, temperature=0.05 * extent)
+    return rescale_layout(pos)
+
+def rescale_layout(pos, scale=1):
+    """Centre positions and scale the largest coordinate to `scale` (networkx convention)."""
+    pos = pos - pos.mean(axis=0)
+    extent = np.abs(pos).max()
+    return pos * (scale / extent) if extent > 0 else pos
+
+# ===== Cached layouts =====
+def layout_cache_key(network, params):
+    """Hash of the graph (labels, edges, weights) and the layout parameters."""
+    sha = hashlib.sha256()
+    sha.update("\n".join(map(str, network.names)).encode())
+    for array in (network.src, network.dst, network.weight):
+        sha.update(np.ascontiguousarray(array, dtype=np.int64).tobytes())
+    sha.update(json.dumps({**params, "version": LAYOUT_VERSION}, sort_keys=True).encode())
+    return sha.hexdigest()
+
+def compute_layout(network, method="barnes-hut", seed=42, iterations=50, cache_dir=LAYOUT_CACHE_DIR):
+    """
+    3D node positions for a HaplotypeNetwork as an (n_nodes, 3) array in node-id order.
+    method="barnes-hut" runs the multilevel octree layout, method="spring" networkx's
+    spring_layout. Results are cached on disk by graph hash and parameters, so every
+    script that draws the same network shares one layout.
+    """
+    params = {"method": method, "seed": seed, "iterations": iterations, "dim": 3}
+    key = layout_cache_key(network, params)
+    cache_file = os.path.join(cache_dir, f"{key}.npy") if cache_dir else None
+    if cache_file and os.path.exists(cache_file):
+        return np.load(cache_file)
+
+    if method == "barnes-hut":
+        pos = multilevel_layout(network.n_nodes, network.src, network.dst, network.weight,
+                                seed=seed, iterations=iterations)
+    elif method == "spring":
+        import networkx as nx
+
+        layout = nx.spring_layout(network.to_networkx(), dim=3, seed=seed, iterations=iterations)
+        pos = np.array([layout[name] for name in network.names])
+    else:
+        raise ValueError(f"Unknown layout method: {method}")
+
+    if cache_file:
+        os.makedirs(cache_dir, exist_ok=True)
+        tmp_file = f"{cache_file}.tmp.npy"
+        np.save(tmp_file, pos)
+        os.replace(tmp_file, cache_file)
+    return pos
@@ -0,0 +1,82 @@
+import numpy as np
+
+# ===== Vectorized trace arrays =====
+def edge_segments(pos, src, dst):
+    """
+    Edge coordinates for a single Scatter3d line trace: (x, y, z) arrays laid out as
+    start, end, NaN for every edge, built in one pass.
+    """
+    segments = np.full((len(src), 3, 3), np.nan, dtype=np.float32)
+    segments[:, 0] = pos[src]
+    segments[:, 1] = pos[dst]
+    flat = segments.reshape(-1, 3)
+    return flat[:, 0], flat[:, 1], flat[:, 2]
+
+def normalize(values):
+    """Scale values to [0, 1] (all zeros when they are constant)."""
+    values = np.asarray(values, dtype=np.float64)
+    low, span = values.min(), values.max() - values.min()
+    return (values - low) / span if span > 0 else np.zeros_like(values)
+
+# ===== Level of detail =====
+def collapse_leaves(network, protected=None):
+    """
+    Fold degree-1 haplotypes into their single neighbour.
+    Returns (kept node ids, number of leaves folded into each node); protected nodes are never folded.
+    """
+    degree = network.degree()
+    leaf = degree == 1
+    if protected is not None:
+        leaf &= ~protected
+    neighbour = network.indices[network.indptr[:-1][leaf]]
+
+    # A pair of leaves joined to each other keeps its first node
+    pair = leaf[neighbour]
+    drop = np.flatnonzero(leaf)[~pair | (np.flatnonzero(leaf) > neighbour)]
+    keep = np.ones(network.n_nodes, dtype=bool)
+    keep[drop] = False
+    collapsed = np.bincount(network.indices[network.indptr[:-1][drop]], minlength=network.n_nodes)
+    return np.flatnonzero(keep), collapsed
+
+def bundle_edges(pos, src, dst, grid=32):
+    """
+    Aggregate edges by snapping their endpoints to a grid**3 lattice over the layout and drawing
+    one segment per distinct pair of occupied cells, between the cells' centroids.
+    Returns (x, y, z) line arrays as edge_segments does, plus the number of edges per segment.
+    """
+    if not len(src):
+        return edge_segments(pos, src, dst) + (np.zeros(0, dtype=np.int64),)
+    lo = pos.min(axis=0)
+    span = max(float((pos.max(axis=0) - lo).max()), 1e-12)
+    cells = np.floor((pos - lo) / span * (grid - 1e-9)).astype(np.int64)
+    cell_key = (cells[:, 0] * grid + cells[:, 1]) * grid + cells[:, 2]
+    cell_ids, node_cell = np.unique(cell_key, return_inverse=True)
+    centroids = np.column_stack([np.bincount(node_cell, weights=pos[:, d]) for d in range(3)])
+    centroids /= np.bincount(node_cell)[:, None]
+
+    a, b = node_cell[src], node_cell[dst]
+    crossing = a != b
+    low, high = np.minimum(a, b)[crossing], np.maximum(a, b)[crossing]
+    pairs, counts = np.unique(low * len(cell_ids) + high, return_counts=True)
+    return edge_segments(centroids, pairs // len(cell_ids), pairs % len(cell_ids)) + (counts,)
+
+def level_of_detail(network, pos, protected=None, edge_quantile=0.5, grid=32):
+    """
+    Reduce a large network for export: leaf haplotypes are folded into their neighbours and
+    edges whose weight is at or below the edge_quantile of all weights are bundled on a grid.
+    Returns (kept node ids, leaves folded per kept node, edge x, edge y, edge z).
+    """
+    kept, collapsed = collapse_leaves(network, protected)
+    kept_mask = np.zeros(network.n_nodes, dtype=bool)
+    kept_mask[kept] = True
+    internal = kept_mask[network.src] & kept_mask[network.dst]
+    src, dst, weight = network.src[internal], network.dst[internal], network.weight[internal]
+
+    threshold = np.quantile(network.weight, edge_quantile) if len(network.weight) else 0
+    low = weight <= threshold
+    strong_x, strong_y, strong_z = edge_segments(pos, src[~low], dst[~low])
+    bundled_x, bundled_y, bundled_z, _ = bundle_edges(pos, src[low], dst[low], grid)
+    return (kept, collapsed[kept],
+            np.concatenate([strong_x, bundled_x]),
+            np.concatenate([strong_y, bundled_y]),
+            np.concatenate([strong_z, bundled_z]))
@@ -0,0 +1,274 @@
+import hashlib
+import re
+import numpy as np
+
+# Bytes read per block when streaming multi-tree files
+READ_BLOCK = 1 << 20
+
+_NEEDS_QUOTES = re.compile(r"[\s(),:;\[\]']")
+_SPECIAL = re.compile(r"[;'\[\]]")
+_TOKEN = re.compile(r"\[[^\]]*\]|'(?:[^']|'')*'|[(),:;]|[^(),:;\[\]']+")
+
+# ===== Array-backed tree =====
+class ArrayTree:
+    """
+    Compact tree: nodes are numbered in preorder (root = 0), parent[i] is the parent index
+    (-1 for the root), length[i] the branch length (NaN when absent) and names[i] the
+    label ("" when unlabelled; internal labels hold IQ-TREE/UFBoot support values).
+    collapsed[i] is the number of tips summarised by leaf i when it stands for a collapsed clade.
+    """
+
+    def __init__(self, parent, length, names, collapsed=None):
+        self.parent = np.asarray(parent, dtype=np.int32)
+        self.length = np.asarray(length, dtype=np.float64)
+        self.names = names
+        self.collapsed = np.zeros(len(self.parent), dtype=np.int64) if collapsed is None else collapsed
+        counts = np.bincount(self.parent[1:], minlength=len(self.parent))
+        self.child_ptr = np.concatenate([[0], np.cumsum(counts)])
+        self.child_index = (np.argsort(self.parent[1:], kind="stable") + 1).astype(np.int32)
+
+    @property
+    def n_nodes(self):
+        return len(self.parent)
+
+    @property
+    def is_leaf(self):
+        return np.diff(self.child_ptr) == 0
+
+    def children(self, node):
+        return self.child_index[self.child_ptr[node]:self.child_ptr[node + 1]]
+
+    def levels(self):
+        """Node ids grouped by depth, root level first."""
+        levels, frontier = [], np.array([0], dtype=np.int64)
+        while len(frontier):
+            levels.append(frontier)
+            starts = self.child_ptr[frontier]
+            counts = self.child_ptr[frontier + 1] - starts
+            offsets = np.repeat(starts - np.cumsum(counts) + counts, counts) + np.arange(counts.sum())
+            frontier = self.child_index[offsets].astype(np.int64)
+        return levels
+
+    def subtree_sizes(self):
+        """Number of nodes in each subtree; subtree i spans nodes i .. i + size - 1 in preorder."""
+        sizes = np.ones(self.n_nodes, dtype=np.int64)
+        for level in self.levels()[:0:-1]:
+            np.add.at(sizes, self.parent[level], sizes[level])
+        return sizes
+
+    def tip_counts(self):
+        """Number of tips below every node (collapsed leaves count the tips they summarise)."""
+        leaf_count = np.concatenate([[0], np.cumsum(np.where(self.is_leaf, np.maximum(self.collapsed, 1), 0))])
+        start = np.arange(self.n_nodes)
+        return leaf_count[start + self.subtree_sizes()] - leaf_count[start]
+
+    def support(self):
+        """Numeric support of every node from its label (last value of 'SH-aLRT/UFBoot'); NaN for leaves or none."""
+        values = np.full(self.n_nodes, np.nan)
+        for i in np.flatnonzero(~self.is_leaf):
+            try:
+                values[i] = float(self.names[i].split("/")[-1])
+            except ValueError:
+                pass
+        return values
+
+    def leaf_names(self):
+        return [self.names[i] for i in np.flatnonzero(self.is_leaf)]
+
+    def topology_hash(self):
+        """sha256 of the topology, branch lengths and labels (stable across processes)."""
+        sha = hashlib.sha256()
+        sha.update(self.parent.tobytes())
+        sha.update(self.length.tobytes())
+        sha.update("\n".join(self.names).encode())
+        sha.update(self.collapsed.tobytes())
+        return sha.hexdigest()
+
+    def to_newick(self):
+        """Newick string with labels (quoted when needed) and branch lengths."""
+        text = [None] * self.n_nodes
+        for i in range(self.n_nodes - 1, -1, -1):
+            name = self.names[i]
+            if _NEEDS_QUOTES.search(name):
+                name = "'" + name.replace("'", "''") + "'"
+            children = self.children(i)
+            if len(children):
+                name = "(" + ",".join(text[c] for c in children) + ")" + name
+                for c in children:
+                    text[c] = None
+            if i and not np.isnan(self.length[i]):
+                name += f":{self.length[i]:.10g}"
+            text[i] = name
+        return text[0] + ";"
+
+    def to_ete(self):
+        """Build an ete3 Tree (only needed for rendering); numeric internal labels become support."""
+        from ete3 import Tree
+
+        nodes = [Tree(dist=0.0)]
+        for i in range(1, self.n_nodes):
+            nodes.append(nodes[self.parent[i]].add_child())
+        leaf = self.is_leaf
+        for i, node in enumerate(nodes):
+            name = self.names[i]
+            if not np.isnan(self.length[i]):
+                node.dist = float(self.length[i])
+            if leaf[i]:
+                node.name = name
+                if self.collapsed[i]:
+                    node.add_feature("collapsed_tips", int(self.collapsed[i]))
+            elif name:
+                try:
+                    node.support = float(name)
+                except ValueError:
+                    node.name = name
+        return nodes[0]
+
+# ===== Level of detail =====
+def collapse_clades(tree, max_depth=None, max_tips=None, min_support=None):
+    """
+    Level-of-detail copy of an ArrayTree: every maximal clade matching one of the criteria is
+    replaced by a single leaf named '<n> tips' whose collapsed count is n (drawn as a triangle).
+      max_depth    clades rooted max_depth edges or more below the root
+      max_tips     clades with at most max_tips tips
+      min_support  clades whose inner splits all have support below min_support (unsupported detail)
+    """
+    n = tree.n_nodes
+    internal = ~tree.is_leaf
+    levels = tree.levels()
+    tips = tree.tip_counts()
+    collapse = np.zeros(n, dtype=bool)
+    if max_depth is not None:
+        depth = np.zeros(n, dtype=np.int64)
+        for d, level in enumerate(levels):
+            depth[level] = d
+        collapse |= depth >= max_depth
+    if max_tips is not None:
+        collapse |= tips <= max_tips
+    if min_support is not None:
+        # Best support among the internal nodes strictly inside each clade (-inf when there are none)
+        support = np.nan_to_num(tree.support(), nan=-np.inf)
+        inner = np.full(n, -np.inf)
+        for level in levels[:0:-1]:
+            level = level[internal[level]]
+            np.maximum.at(inner, tree.parent[level], np.maximum(support[level], inner[level]))
+        has_inner = np.zeros(n, dtype=bool)
+        has_inner[tree.parent[np.flatnonzero(internal)[1:]]] = True
+        collapse |= has_inner & (inner < min_support)
+    collapse &= internal
+    collapse[0] = False
+
+    # Keep nodes with no collapsed ancestor; the preorder subset is still a preorder
+    hidden = np.zeros(n, dtype=bool)
+    for level in levels[1:]:
+        hidden[level] = hidden[tree.parent[level]] | collapse[tree.parent[level]]
+    kept = np.flatnonzero(~hidden)
+    new_id = np.full(n, -1, dtype=np.int64)
+    new_id[kept] = np.arange(len(kept))
+    parent = np.where(tree.parent[kept] >= 0, new_id[np.maximum(tree.parent[kept], 0)], -1)
+    names = [f"{tips[i]} tips" if collapse[i] else tree.names[i] for i in kept]
+    collapsed = np.where(collapse[kept], tips[kept], tree.collapsed[kept])
+    return ArrayTree(parent, tree.length[kept], names, collapsed)
+
+# ===== Parsing =====
+def parse_newick(text):
+    """Parse one Newick string into an ArrayTree (whitespace-only tokens are skipped, inner blanks kept)."""
+    parent, length, names = [], [], []
+    stack, last, previous = [], -1, None
+
+    for token in _TOKEN.findall(text):
+        first = token[0]
+        if first == "[":
+            continue  # Comment
+        if first == "(":
+            parent.append(stack[-1] if stack else -1)
+            stack.append(len(parent) - 1)
+        elif first == "," or first == ")":
+            if previous == "(" or previous == ",":
+                parent.append(stack[-1])  # Empty leaf
+            if first == ")":
+                if not stack:
+                    raise ValueError("Unbalanced parentheses in Newick string")
+                last = stack.pop()
+        elif first == ":":
+            if previous == "(" or previous == ",":
+                parent.append(stack[-1])  # Unnamed leaf with a branch length
+                last = len(parent) - 1
+        elif first == ";":
+            break
+        else:
+            if first == "'":
+                token = token[1:-1].replace("''", "'")
+            else:
+                # Unquoted labels may hold blanks ("Homo sapiens", as ete3 reads them); runs of
+                # whitespace collapse to one space and blank-only tokens separate nothing
+                token = " ".join(token.split())
+                if not token:
+                    continue
+            if previous == ":":
+                length.append((last, float(token)))
+                previous = "length"
+                continue
+            if previous is None or previous == "(" or previous == ",":
+                parent.append(stack[-1] if stack else -1)
+                last = len(parent) - 1
+            names.append((last, token))
+            previous = "label"
+            continue
+        previous = first
+
+    if stack:
+        raise ValueError("Unbalanced parentheses in Newick string")
+    if not parent:
+        raise ValueError("Empty Newick string")
+    lengths = np.full(len(parent), np.nan)
+    labels = [""] * len(parent)
+    for node, value in length:
+        lengths[node] = value
+    for node, value in names:
+        labels[node] = value
+    return ArrayTree(parent, lengths, labels)
+
+# ===== Multi-tree streaming =====
+def iter_newick_strings(file):
+    """Yield each ';'-terminated tree string of a (multi-)Newick file without reading it all."""
+    buffer, in_quote, in_comment = [], False, False
+    with open(file, "r") as handle:
+        for block in iter(lambda: handle.read(READ_BLOCK), ""):
+            start = 0
+            for match in _SPECIAL.finditer(block):
+                char = match.group()
+                if char == "'" and not in_comment:
+                    in_quote = not in_quote
+                elif char == "[" and not in_quote:
+                    in_comment = True
+                elif char == "]" and not in_quote:
+                    in_comment = False
+                elif char == ";" and not in_quote and not in_comment:
+                    buffer.append(block[start:match.end()])
+                    tree = "".join(buffer).strip()
+                    buffer, start = [], match.end()
+                    if tree != ";":
+                        yield tree
+            buffer.append(block[start:])
+    if "".join(buffer).strip():
+        yield "".join(buffer).strip()
+
+def iter_trees(file):
+    """Stream ArrayTrees one at a time from a Newick tree file (e.g. UFBoot/bootstrap sets)."""
+    for text in iter_newick_strings(file):
+        yield parse_newick(text)
+
+def count_trees(file):
+    """Number of trees in a Newick file."""
+    return sum(1 for _ in iter_newick_strings(file))
+
+def load_trees(tree_files):
+    """Load the first tree of each file as an ArrayTree, reporting files that hold more trees."""
+    trees = []
+    for file in tree_files:
+        trees.append(next(iter_trees(file)))
+        n_trees = count_trees(file)
+        if n_trees > 1:
+            print(f"{file}: {n_trees} trees, using the first (stream the rest with iter_trees)")
+    return trees
@@ -0,0 +1,186 @@
+import numpy as np
+import pandas as pd
+from barcode_gap_engine import BLOCK_CELLS
+
+# Extra random directions and power iterations of the randomized eigensolver
+OVERSAMPLES = 10
+POWER_ITERATIONS = 3
+
+# ===== Squared-distance operator =====
+class SquaredDistanceOperator:
+    """
+    Products with the squared distance matrix A = D * D, read in row blocks from any
+    row-sliceable matrix (ndarray, np.memmap, CondensedDistanceMatrix) so only one block is held
+    as float64 at a time. NaN cells are taken from the transposed cell (triangular exports) unless
+    symmetric=True (matrices from distance_matrix_io.load_distance_matrix or k2p_distance), which
+    keeps every pass to contiguous row blocks; pairs still missing get the largest observed
+    distance. The diagonal is taken as 0.
+    """
+
+    def __init__(self, distance_matrix, block_rows=None, symmetric=False):
+        self.matrix = distance_matrix
+        self.symmetric = symmetric
+        self.n = distance_matrix.shape[0]
+        self.block_rows = block_rows or max(1, BLOCK_CELLS // max(self.n, 1))
+        self.fill = np.nan
+
+        # One pass for the largest distance, then the row means of A with gaps filled by it
+        row_sums, row_missing, largest = np.zeros(self.n), np.zeros(self.n, dtype=np.int64), 0.0
+        for start, block in self.blocks():
+            valid = ~np.isnan(block)
+            row_sums[start:start + len(block)] = np.where(valid, block * block, 0.0).sum(axis=1)
+            row_missing[start:start + len(block)] = (~valid).sum(axis=1)
+            if valid.any():
+                largest = max(largest, float(block[valid].max()))
+        self.fill = largest
+        self.row_means = (row_sums + row_missing * largest ** 2) / self.n
+
+    def blocks(self):
+        """Yield (start, float64 row block) with transposed fills, remaining gaps at self.fill and a zero diagonal."""
+        for start in range(0, self.n, self.block_rows):
+            stop = min(start + self.block_rows, self.n)
+            block = np.asarray(self.matrix[start:stop], dtype=np.float64)
+            missing = np.isnan(block)
+            if missing.any():
+                if not self.symmetric:
+                    block = np.where(missing, np.asarray(self.matrix[:, start:stop], dtype=np.float64).T, block)
+                if not np.isnan(self.fill):
+                    block = np.where(np.isnan(block), self.fill, block)
+            block[np.arange(stop - start), np.arange(start, stop)] = 0.0
+            yield start, block
+
+    def dot(self, X):
+        """A @ X for an (n, k) matrix X."""
+        out = np.empty((self.n, X.shape[1]))
+        for start, block in self.blocks():
+            out[start:start + len(block)] = (block * block) @ X
+        return out
+
+    def centered_dot(self, X):
+        """
+        B @ X for the Gower-centred matrix B = -1/2 J A J, without forming B:
+        B X = -1/2 (A X - 1 (a'X) - a (1'X) + g 1 (1'X)), with a the row means of A and g their mean.
+        """
+        a, g = self.row_means, self.row_means.mean()
+        column_sums = X.sum(axis=0)
+        return -0.5 * (self.dot(X) - a @ X - np.outer(a, column_sums) + g * column_sums)
+
+    def centered_trace(self):
+        """Trace of B (the total inertia): n * g / 2 with a zero diagonal."""
+        return self.n * self.row_means.mean() / 2
+
+# ===== Principal coordinates =====
+def pcoa(distance_matrix, n_components=10, oversamples=OVERSAMPLES, power_iterations=POWER_ITERATIONS,
+         seed=None, block_rows=None, symmetric=False):
+    """
+    Principal coordinates analysis by randomized eigendecomposition of the Gower-centred matrix.
+    Each power iteration is one blocked pass over the distance matrix, so a 40k x 40k
+    memory-mapped matrix needs only a few sequential reads and O(n * n_components) memory.
+    Returns (scores (n, k), eigenvalues, proportion of the total inertia per axis); only
+    positive eigenvalues are kept, so k may be smaller than n_components. symmetric=True skips
+    the transposed-cell fill (see SquaredDistanceOperator).
+    """
+    operator = SquaredDistanceOperator(distance_matrix, block_rows, symmetric)
+    rng = np.random.default_rng(seed)
+    k = min(n_components + oversamples, operator.n)
+
+    Q, _ = np.linalg.qr(operator.centered_dot(rng.standard_normal((operator.n, k))))
+    for _ in range(power_iterations):
+        Q, _ = np.linalg.qr(operator.centered_dot(Q))
+
+    BQ = operator.centered_dot(Q)
+    values, vectors = np.linalg.eigh(Q.T @ BQ)
+    order = np.argsort(values)[::-1][:n_components]
+    values, vectors = values[order], Q @ vectors[:, order]
+    positive = values > 1e-12 * max(abs(values[0]), 1e-300)
+    values, vectors = values[positive], vectors[:, positive]
+
+    # Deterministic signs: the largest-magnitude loading of each axis is positive
+    signs = np.sign(vectors[np.abs(vectors).argmax(axis=0), np.arange(vectors.shape[1])])
+    scores = vectors * signs * np.sqrt(values)
+    return scores, values, values / operator.centered_trace()
+
+# ===== Clustering =====
+def _kmeans_plus_plus(X, k, rng):
+    centers = [X[rng.integers(len(X))]]
+    closest = ((X - centers[0]) ** 2).sum(axis=1)
+    for _ in range(1, k):
+        total = closest.sum()
+        index = rng.choice(len(X), p=closest / total) if total > 0 else rng.integers(len(X))
+        centers.append(X[index])
+        closest = np.minimum(closest, ((X - X[index]) ** 2).sum(axis=1))
+    return np.array(centers)
+
+def _squared_distances(X, centers):
+    return (X * X).sum(axis=1)[:, None] - 2 * X @ centers.T + (centers * centers).sum(axis=1)[None, :]
+
+def kmeans(X, k, n_init=10, max_iter=300, tol=1e-8, seed=None):
+    """
+    Lloyd's k-means with k-means++ seeding, best of n_init runs by inertia.
+    Returns (labels, centers, inertia).
+    """
+    X = np.asarray(X, dtype=np.float64)
+    rng = np.random.default_rng(seed)
+    best = None
+    for _ in range(n_init):
+        centers = _kmeans_plus_plus(X, k, rng)
+        for _ in range(max_iter):
+            labels = _squared_distances(X, centers).argmin(axis=1)
+            counts = np.bincount(labels, minlength=k)
+            sums = np.zeros_like(centers)
+            np.add.at(sums, labels, X)
+            # Empty clusters keep their previous centre
+            updated = np.where(counts[:, None] > 0, sums / np.maximum(counts, 1)[:, None], centers)
+            shift = ((updated - centers) ** 2).sum()
+            centers = updated
+            if shift <= tol:
+                break
+        distances = _squared_distances(X, centers)
+        labels = distances.argmin(axis=1)
+        inertia = float(np.maximum(distances[np.arange(len(X)), labels], 0).sum())
+        if best is None or inertia < best[2]:
+            best = (labels, centers, inertia)
+    return best
+
+def cluster_ordination(labels, scores, n_clusters=3, seed=None):
+    """
+    k-means on ordination scores. Clusters are numbered by size (Cluster 1 is the largest).
+    Returns (specimen table with Species, PCo1.., Cluster, Cluster_Name;
+    species table with Species, Cluster, Cluster_Name by majority of its specimens;
+    {Cluster_Name: representative species}, the specimen closest to each centroid).
+    """
+    assignment, _, _ = kmeans(scores, n_clusters, seed=seed)
+    order = np.argsort(-np.bincount(assignment, minlength=n_clusters), kind="stable")
+    rank = np.empty(n_clusters, dtype=np.int64)
+    rank[order] = np.arange(1, n_clusters + 1)
+    cluster = rank[assignment]
+    names = np.array([f"Cluster {c}" for c in cluster], dtype=object)
+
+    specimens = pd.DataFrame(scores, columns=[f"PCo{i + 1}" for i in range(scores.shape[1])])
+    specimens.insert(0, "Species", np.asarray(labels, dtype=object))
+    specimens["Cluster"] = cluster
+    specimens["Cluster_Name"] = names
+
+    species = (specimens.groupby(["Species", "Cluster", "Cluster_Name"], sort=False).size()
+               .reset_index(name="Specimens")
+               .sort_values("Specimens", ascending=False, kind="stable")
+               .drop_duplicates("Species")
+               .drop(columns="Specimens")
+               .reset_index(drop=True))
+
+    # Representatives in cluster number order ("Cluster 2" before "Cluster 10")
+    representatives = nearest_to_centroids(specimens["Species"], scores, names)
+    number = dict(zip(names, cluster))
+    return specimens, species, {name: representatives[name] for name in sorted(representatives, key=number.get)}
+
+def nearest_to_centroids(labels, scores, clusters):
+    """{cluster: label of the specimen closest to its cluster's centroid} in order of first appearance."""
+    labels = np.asarray(labels, dtype=object)
+    scores = np.asarray(scores, dtype=np.float64)
+    codes, names = pd.factorize(np.asarray(clusters, dtype=object))
+    representatives = {}
+    for code, name in enumerate(names):
+        members = np.flatnonzero(codes == code)
+        centroid = scores[members].mean(axis=0)
+        representatives[name] = labels[members[((scores[members] - centroid) ** 2).sum(axis=1).argmin()]]
+    return representatives
@@ -0,0 +1,90 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import pandas as pd
+from entropy_engine import entropy_from_counts
+
+# Resamples drawn per batch (one (batch, taxa) count matrix each)
+RESAMPLE_BATCH = 1000
+
+# Default number of depths on a rarefaction curve
+RAREFACTION_STEPS = 20
+
+# ===== Frequencies =====
+def organism_counts(table):
+    """(organisms, counts) of every non-null cell of a DataFrame, counted with np.unique."""
+    values = table.to_numpy().ravel()
+    return np.unique(values[pd.notnull(values)].astype(str), return_counts=True)
+
+def shannon_entropy(counts):
+    """Shannon entropy (bits) of a count vector, or of each row of a (replicates, taxa) matrix."""
+    counts = np.asarray(counts)
+    if counts.ndim == 1:
+        return float(entropy_from_counts(counts[:, None])[0] + 0.0)
+    return entropy_from_counts(counts.T) + 0.0  # + 0.0 turns -0.0 into 0.0
+
+# ===== Resampling =====
+def _bootstrap_batch(counts, size, seed):
+    """Worker: entropy of size multinomial resamples of the observed frequencies."""
+    rng = np.random.default_rng(seed)
+    return shannon_entropy(rng.multinomial(counts.sum(), counts / counts.sum(), size=size))
+
+def _rarefaction_batch(counts, depth, size, seed):
+    """Worker: entropy and richness of size subsamples of depth individuals, drawn without replacement."""
+    rng = np.random.default_rng(seed)
+    draws = rng.multivariate_hypergeometric(counts, depth, size=size)
+    return shannon_entropy(draws), (draws > 0).sum(axis=1)
+
+def _batch_sizes(n, batch_size):
+    return [min(batch_size, n - start) for start in range(0, n, batch_size)]
+
+def _run_batches(function, tasks, workers):
+    """Run (args...) tasks in this process (workers=1) or on a process pool, in order."""
+    if workers == 1:
+        return [function(*task) for task in tasks]
+    with ProcessPoolExecutor(max_workers=workers or os.cpu_count()) as pool:
+        return list(pool.map(function, *zip(*tasks)))
+
+def bootstrap_entropy(counts, replicates=2000, seed=None, batch_size=RESAMPLE_BATCH, workers=1):
+    """
+    Shannon entropy of replicates multinomial bootstrap resamples of a count vector.
+    Each batch gets its own child seed, so results depend on seed but not on workers.
+    """
+    counts = np.asarray(counts, dtype=np.int64)
+    sizes = _batch_sizes(replicates, batch_size)
+    seeds = np.random.SeedSequence(seed).spawn(len(sizes))
+    return np.concatenate(_run_batches(_bootstrap_batch, [(counts, size, s) for size, s in zip(sizes, seeds)],
+                                       workers))
+
+def entropy_ci(replicates, level=0.95):
+    """Percentile confidence interval (low, high) of bootstrap replicates."""
+    tail = (1 - level) / 2 * 100
+    low, high = np.percentile(replicates, [tail, 100 - tail])
+    return float(low), float(high)
+
+def rarefaction_depths(total, steps=RAREFACTION_STEPS):
+    """Evenly spaced sample sizes from 1 up to total."""
+    return np.unique(np.linspace(1, total, steps).astype(np.int64))
+
+def rarefaction_curve(counts, depths=None, replicates=200, level=0.95, seed=None,
+                      batch_size=RESAMPLE_BATCH, workers=1):
+    """
+    Rarefied Shannon entropy: at each depth, replicates subsamples without replacement.
+    Returns a DataFrame with Depth, Entropy (mean), CI_Low, CI_High and Richness (mean taxa seen).
+    """
+    counts = np.asarray(counts, dtype=np.int64)
+    depths = rarefaction_depths(counts.sum()) if depths is None else np.asarray(depths, dtype=np.int64)
+    sizes = _batch_sizes(replicates, batch_size)
+    seeds = np.random.SeedSequence(seed).spawn(len(depths) * len(sizes))
+    tasks = [(counts, depth, size, seeds[i * len(sizes) + j])
+             for i, depth in enumerate(depths) for j, size in enumerate(sizes)]
+    results = _run_batches(_rarefaction_batch, tasks, workers)
+
+    rows = []
+    for i, depth in enumerate(depths):
+        batches = results[i * len(sizes):(i + 1) * len(sizes)]
+        entropy = np.concatenate([e for e, _ in batches])
+        richness = np.concatenate([r for _, r in batches])
+        low, high = entropy_ci(entropy, level)
+        rows.append((depth, entropy.mean(), low, high, richness.mean()))
+    return pd.DataFrame(rows, columns=["Depth", "Entropy", "CI_Low", "CI_High", "Richness"])
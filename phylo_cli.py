@@ -0,0 +1,113 @@
+import argparse
+import importlib
+import sys
+
+# Subcommand -> analysis script it runs; each script is configured through its module-level
+# settings, which the options below override (an option's dest is the setting it replaces)
+COMMANDS = {
+    "entropy": "phylogenetic_shannon_entropy",
+    "landscape": "entropy_landscape",
+    "barcode-gap": "barcode_gap_cluster_plot",
+    "network": "3d_network_map",
+    "trees": "ete_script",
+}
+
+# ===== Argument parsing =====
+def build_parser():
+    """Parser with one subcommand per analysis; unset options keep the script's own defaults."""
+    common = argparse.ArgumentParser(add_help=False, argument_default=argparse.SUPPRESS)
+    common.add_argument("--headless", action="store_true",
+                        help="compute and write every output file but skip plotting (and the plotting imports)")
+
+    parser = argparse.ArgumentParser(prog="phylo_cli.py", description="Phylogenetic analysis scripts.")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    def add_command(name, help):
+        return commands.add_parser(name, help=help, parents=[common], argument_default=argparse.SUPPRESS)
+
+    entropy = add_command("entropy", "per-chain positional entropy and organism-frequency entropy")
+    entropy.add_argument("fasta_files", nargs="*", metavar="FASTA", help="aligned chain FASTA files")
+    entropy.add_argument("--organisms", dest="organism_file", help="organism CSV")
+    entropy.add_argument("--workers", dest="workers", type=int, help="processes for column counting")
+    entropy.add_argument("--landscape-prefix", dest="landscape_prefix", help="combined landscape output prefix")
+    entropy.add_argument("--bootstrap", dest="bootstrap_replicates", type=int, help="bootstrap replicates")
+    entropy.add_argument("--no-cache", dest="use_cache", action="store_false", help="recount every alignment")
+
+    landscape = add_command("landscape", "entropy landscape of one alignment, or of every chain with --chains")
+    landscape.add_argument("alignment_file", nargs="?", metavar="FASTA", help="aligned FASTA file")
+    landscape.add_argument("--chains", dest="fasta_files", nargs="+", metavar="FASTA",
+                           help="one panel per chain alignment (chain_entropy_landscape.py)")
+    landscape.add_argument("--landscape-prefix", dest="landscape_prefix",
+                           help="saved landscape read when the alignments are missing")
+    landscape.add_argument("--windows", dest="window_sizes", type=int, nargs="+", help="sliding window sizes")
+    landscape.add_argument("--plot-mode", dest="plot_mode", choices=["decimated", "full"])
+
+    barcode = add_command("barcode-gap", "barcode gap statistics and clustered barcode gap plot")
+    barcode.add_argument("distance_file", nargs="?", metavar="MATRIX", help="tab-separated distance matrix")
+    barcode.add_argument("--alignment", dest="alignment_file", metavar="FASTA",
+                         help="compute distances from an aligned FASTA instead")
+    barcode.add_argument("--model", dest="distance_model", choices=["k2p", "p"])
+    barcode.add_argument("--species-pattern", dest="species_from_header", metavar="REGEX",
+                         help="species from each FASTA header (first group); default: first two tokens")
+    barcode.add_argument("--workers", dest="distance_workers", type=int)
+    barcode.add_argument("--clusters", dest="n_clusters", type=int, help="k-means clusters on the PCoA scores")
+    barcode.add_argument("--cluster-file", dest="pca_file", help="read clusters from a PCA scores CSV instead")
+
+    network = add_command("network", "3D haplotype network, with isolation by distance when --coordinates is given")
+    network.add_argument("network_file", nargs="?", metavar="NETWORK", help="species/mutations/species edge list")
+    network.add_argument("--alignment", dest="alignment_file", metavar="FASTA",
+                         help="build the network from an aligned FASTA first")
+    network.add_argument("--coordinates", dest="coordinates_file", metavar="CSV",
+                         help="specimen sampling sites (geo_gene_flow.py)")
+    network.add_argument("--haplotypes", dest="haplotype_file", metavar="TSV",
+                         help="haplotype member table (written with --alignment) used to place nodes at their "
+                              "sites; requires --coordinates")
+    network.add_argument("--workers", dest="network_workers", type=int)
+    network.add_argument("--layout", dest="layout_method", choices=["barnes-hut", "spring"])
+    network.add_argument("--lod", dest="lod_export", action="store_true", help="level-of-detail HTML/JSON export")
+
+    trees = add_command("trees", "consensus trees, Robinson-Foulds matrices and tree images")
+    trees.add_argument("tree_files", nargs="*", metavar="TREEFILE", help="one tree file per chain")
+    trees.add_argument("--labels", dest="labels", nargs="+", help="one label per tree file")
+    trees.add_argument("--bootstrap", dest="bootstrap_files", nargs="+", metavar="UFBOOT",
+                       help="draw the consensus of each bootstrap tree set")
+    trees.add_argument("--rf-prefix", dest="rf_output_prefix", help="write Robinson-Foulds matrices with this output prefix")
+    trees.add_argument("--separate", action="store_true",
+                       help="one image per tree instead of a merged tree (ete3_no_artificial_root.py)")
+    return parser
+
+# ===== Running scripts =====
+def script_module(command, settings):
+    """Name of the script a parsed subcommand runs; some options switch to a sibling script."""
+    if command == "landscape" and "fasta_files" in settings:
+        return "chain_entropy_landscape"
+    if command == "network" and "coordinates_file" in settings:
+        return "geo_gene_flow"
+    if command == "trees" and settings.pop("separate", False):
+        return "ete3_no_artificial_root"
+    return COMMANDS[command]
+
+def run(argv=None):
+    """Parse argv, override the chosen script's settings and run its main()."""
+    parser = build_parser()
+    settings = vars(parser.parse_args(argv))
+    command = settings.pop("command")
+    if command == "network" and "haplotype_file" in settings and "coordinates_file" not in settings:
+        parser.error("--haplotypes requires --coordinates")
+    name = script_module(command, settings)
+    if command == "barcode-gap" and "pca_file" in settings:
+        settings["cluster_method"] = "file"
+    for key in ("fasta_files", "tree_files"):
+        if settings.get(key) == []:
+            del settings[key]  # An empty positional list keeps the script's default files
+
+    # Scripts (and their plotting libraries) are imported only once a subcommand is chosen
+    module = importlib.import_module(name)
+    for key, value in settings.items():
+        if not hasattr(module, key):
+            raise SystemExit(f"{name}.py has no setting {key!r}")
+        setattr(module, key, value)
+    module.main()
+
+if __name__ == "__main__":
+    run(sys.argv[1:])
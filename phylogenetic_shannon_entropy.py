@@ -1,88 +1,150 @@
 import pandas as pd
 import numpy as np
-import seaborn as sns
-import matplotlib.pyplot as plt
-from Bio import AlignIO
-import math
 import os
-from collections import Counter
-
-# ===== Load phylogenetic organism data =====
-phylo_data = pd.read_csv("./phyllogenetic_analysis.csv")
-
-# Flatten the organism names and remove any NaNs
-organisms = phylo_data.values.flatten()
-organisms = [org for org in organisms if pd.notnull(org)]
-
-# Count organism frequencies
-counts = Counter(organisms)
-total = sum(counts.values())
-probabilities = [count / total for count in counts.values()]
-
-# Shannon entropy from organism frequencies
-phylo_entropy = -np.sum([p * np.log2(p) for p in probabilities])
-print(f"Shannon entropy from organism frequencies: {phylo_entropy:.4f}")
-
-# ===== Function to calculate positional entropy =====
-def calculate_positional_entropy(alignment):
-    alignment_length = alignment.get_alignment_length()
-    entropy_scores = np.zeros(alignment_length)
-
-    for column in range(alignment_length):
-        column_bases = alignment[:, column]
-        base_frequencies = {base: column_bases.count(base) / len(column_bases) for base in set(column_bases)}
-        entropy = -sum([freq * math.log(freq, 2) for freq in base_frequencies.values()])
-        entropy_scores[column] = entropy
-
-    return entropy_scores
-
-# ===== Process aligned FASTA files =====
+from entropy_engine import (calculate_positional_entropy, chain_column_counts, parallel_column_counts,
+                            select_symbols, entropy_from_counts)
+from entropy_cache import cached_entropies, file_digest
+from entropy_state import incremental_entropies
+from entropy_landscape_io import write_entropy_landscape, write_landscape_params, padded_landscape
+from organism_entropy import organism_counts, shannon_entropy, bootstrap_entropy, entropy_ci, rarefaction_curve
+
+# Define input files
+organism_file = "./phyllogenetic_analysis.csv"
 fasta_files = ["ChainA_aligned.fas", "ChainB_aligned.fas", "ChainC_aligned.fas", "ChainD_aligned.fas", "ChainE_aligned.fas"]
 
-entropy_dict = {}
-max_length = 0
-
-for fasta_file in fasta_files:
-    chain_name = os.path.splitext(fasta_file)[0]
-    alignment = AlignIO.read(fasta_file, "fasta")
-    entropy_scores = calculate_positional_entropy(alignment)
-
-    entropy_dict[chain_name] = entropy_scores
-    if len(entropy_scores) > max_length:
-        max_length = len(entropy_scores)
-
-# ===== Create DataFrame for entropy across chains =====
-entropy_df = pd.DataFrame()
-
-for chain, entropy_scores in entropy_dict.items():
-    padded_entropy = np.pad(entropy_scores, (0, max_length - len(entropy_scores)), constant_values=np.nan)
-    entropy_df[chain] = padded_entropy
-
-entropy_df.index = range(1, max_length + 1)
-
-# Save combined entropy (optional)
-entropy_df.to_csv("combined_entropy_landscape.csv", index_label="Position")
-
-# ===== Plot the heatmap with phylogenetic entropy bar =====
-fig = plt.figure(figsize=(18, 8))
-grid = plt.GridSpec(1, 10, wspace=0.3, hspace=0.1)
-
-# Heatmap for chain entropy (no black lines)
-ax_main = fig.add_subplot(grid[0, :-1])
-sns.heatmap(entropy_df.T, cmap="coolwarm", cbar_kws={'label': 'Entropy'}, ax=ax_main,
-            xticklabels=50, yticklabels=True)
-
-ax_main.set_xlabel('Position in Alignment')
-ax_main.set_ylabel('Protein Chain')
-ax_main.set_title('Entropy Landscape Heatmap Across Chains (A–E)')
-
-# Vertical bar for phylogenetic entropy
-ax_entropy = fig.add_subplot(grid[0, -1])
-entropy_bar = np.full((len(entropy_df.columns), 1), phylo_entropy)
-sns.heatmap(entropy_bar, cmap="viridis", cbar_kws={'label': 'Phylogenetic Entropy'},
-            ax=ax_entropy, xticklabels=False, yticklabels=False)
-
-ax_entropy.set_xlabel('')
-ax_entropy.set_ylabel('')
-
-plt.show()
+# "vectorized" (NumPy engine) or "reference" (original column-by-column loop)
+entropy_method = "vectorized"
+
+# "in-memory" loads each alignment with AlignIO, "streaming" accumulates column counts
+# chunk by chunk (FASTA, or a memory-mapped .npy copy from encode_fasta_to_memmap)
+read_mode = "in-memory"
+stream_chunk_size = 1024
+
+# Worker processes; above 1, chains and column blocks are spread over a process pool
+workers = 1
+
+# Entropy parameters: alphabet=None keeps every observed symbol, gap_handling is "symbol" or "ignore"
+alphabet = None
+gap_handling = "symbol"
+
+# Reuse per-column counts and entropy from the on-disk cache when the .fas files are unchanged
+use_cache = True
+
+# Incremental mode keeps per-chain symbol counts on disk (ENTROPY_STATE_DIR) and folds FASTA files
+# of added or removed sequences into them instead of recounting the whole alignment
+incremental = False
+added_sequences = {}  # e.g. {"ChainA_aligned.fas": ["ChainA_new_specimens.fas"]}
+removed_sequences = {}
+
+# Combined landscape output: "binary" writes <prefix>.npy/.json (ragged, per-chain lazy loading,
+# read by both landscape scripts), "csv" the NaN-padded <prefix>.csv table; alphabet and
+# gap_handling are saved as <prefix>.params.json so the landscape scripts recount with them (along
+# with each alignment's digest, so a chain whose .fas changed since is recomputed, not reused)
+landscape_prefix = "combined_entropy_landscape"
+landscape_formats = ["binary", "csv"]
+
+# Organism-frequency entropy: multinomial bootstrap CI (shown on the entropy bar) and a
+# rarefaction curve; resamples are drawn in batches, on entropy_workers processes when > 1
+bootstrap_replicates = 2000
+rarefaction_replicates = 200
+ci_level = 0.95
+resample_seed = 0
+entropy_workers = 1
+rarefaction_output_file = "organism_rarefaction.csv"
+
+# Headless runs compute and save every output but skip the heatmap (and the plotting imports)
+headless = False
+
+def compute_chain_entropies():
+    """Per-column entropy for every chain in fasta_files using the configured engine."""
+    if entropy_method == "reference":
+        from Bio import AlignIO
+
+        # Original loop, kept for verification (ignores alphabet and gap settings)
+        return [calculate_positional_entropy(AlignIO.read(fasta_file, "fasta"), method="reference")
+                for fasta_file in fasta_files]
+
+    if incremental:
+        return incremental_entropies(fasta_files, added_sequences, removed_sequences, alphabet=alphabet,
+                                     gap_handling=gap_handling, chunk_size=stream_chunk_size)
+
+    if workers > 1:
+        compute_counts = lambda paths: parallel_column_counts(paths, workers=workers, chunk_size=stream_chunk_size)
+    else:
+        compute_counts = lambda paths: [chain_column_counts(path, read_mode, stream_chunk_size) for path in paths]
+
+    if use_cache:
+        return cached_entropies(fasta_files, compute_counts, alphabet=alphabet, gap_handling=gap_handling)
+    return [entropy_from_counts(select_symbols(counts, symbols, alphabet, gap_handling)[0])
+            for counts, symbols in compute_counts(fasta_files)]
+
+def main():
+    # ===== Load phylogenetic organism data =====
+    phylo_data = pd.read_csv(organism_file)
+
+    # Count organism frequencies over all non-null cells
+    _, counts = organism_counts(phylo_data)
+
+    # Shannon entropy from organism frequencies, with a bootstrap confidence interval
+    phylo_entropy = shannon_entropy(counts)
+    replicates = bootstrap_entropy(counts, bootstrap_replicates, seed=resample_seed, workers=entropy_workers)
+    ci_low, ci_high = entropy_ci(replicates, ci_level)
+    print(f"Shannon entropy from organism frequencies: {phylo_entropy:.4f} "
+          f"({ci_level:.0%} CI {ci_low:.4f}-{ci_high:.4f})")
+
+    # Rarefaction curve of the organism entropy
+    rarefaction = rarefaction_curve(counts, replicates=rarefaction_replicates, level=ci_level, seed=resample_seed,
+                                    workers=entropy_workers)
+    rarefaction.to_csv(rarefaction_output_file, index=False)
+    print(f"Rarefaction curve saved as {rarefaction_output_file}")
+
+    # ===== Process aligned FASTA files =====
+    entropy_dict = {os.path.splitext(fasta_file)[0]: entropy_scores
+                    for fasta_file, entropy_scores in zip(fasta_files, compute_chain_entropies())}
+
+    # ===== Save combined entropy =====
+    digests = {os.path.splitext(fasta_file)[0]: file_digest(fasta_file) for fasta_file in fasta_files}
+    write_landscape_params(landscape_prefix, alphabet, gap_handling, digests)
+    if "binary" in landscape_formats:
+        write_entropy_landscape(landscape_prefix, entropy_dict)
+
+    # Padded chain-by-position table for the heatmap
+    entropy_df = padded_landscape(entropy_dict)
+    if "csv" in landscape_formats:
+        entropy_df.to_csv(f"{landscape_prefix}.csv", index_label="Position")
+
+    if not headless:
+        plot_entropy_heatmap(entropy_df, phylo_entropy, ci_low, ci_high)
+
+def plot_entropy_heatmap(entropy_df, phylo_entropy, ci_low, ci_high):
+    """Heatmap of per-chain entropy with the phylogenetic entropy bar and its confidence interval."""
+    import matplotlib.pyplot as plt
+    import seaborn as sns
+
+    fig = plt.figure(figsize=(18, 8))
+    grid = plt.GridSpec(1, 10, wspace=0.3, hspace=0.1)
+
+    # Heatmap for chain entropy (no black lines)
+    ax_main = fig.add_subplot(grid[0, :-1])
+    sns.heatmap(entropy_df.T, cmap="coolwarm", cbar_kws={'label': 'Entropy'}, ax=ax_main,
+                xticklabels=50, yticklabels=True)
+
+    ax_main.set_xlabel('Position in Alignment')
+    ax_main.set_ylabel('Protein Chain')
+    ax_main.set_title('Entropy Landscape Heatmap Across Chains (A–E)')
+
+    # Vertical bar for phylogenetic entropy: CI bounds either side of the point estimate
+    ax_entropy = fig.add_subplot(grid[0, -1])
+    entropy_bar = np.tile([ci_low, phylo_entropy, ci_high], (len(entropy_df.columns), 1))
+    sns.heatmap(entropy_bar, cmap="viridis", cbar_kws={'label': 'Phylogenetic Entropy'},
+                ax=ax_entropy, xticklabels=["Low", "H", "High"], yticklabels=False)
+    ax_entropy.set_title(f"H = {phylo_entropy:.2f}\n{ci_level:.0%} CI [{ci_low:.2f}, {ci_high:.2f}]", fontsize=9)
+
+    ax_entropy.set_xlabel(f"{ci_level:.0%} CI")
+    ax_entropy.set_ylabel('')
+
+    plt.show()
+
+# Guard keeps process-pool workers from re-running the analysis on import
+if __name__ == "__main__":
+    main()
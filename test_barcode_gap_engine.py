@@ -0,0 +1,77 @@
+import numpy as np
+import pandas as pd
+import pytest
+from barcode_gap_engine import barcode_gap_statistics
+from distance_matrix_io import load_distance_matrix, read_distance_tsv
+
+def specimen_matrix(seed):
+    rng = np.random.default_rng(seed)
+    labels = rng.choice(["sp A", "sp B", "sp C", "sp D", "sp E"], 23).tolist() + ["sp F"]  # sp F is a singleton
+    n = len(labels)
+    values = rng.random((n, n)).round(4)
+    matrix = values + values.T
+    np.fill_diagonal(matrix, 0)
+    return labels, matrix
+
+def reference_statistics(matrix, labels):
+    """The double loop over specimen pairs, with self comparisons only for single-specimen species."""
+    counts = {species: labels.count(species) for species in labels}
+    rows = []
+    for species in dict.fromkeys(labels):
+        intra, inter = [], []
+        for i, species1 in enumerate(labels):
+            if species1 != species:
+                continue
+            for j, species2 in enumerate(labels):
+                if species2 == species and (i != j or counts[species] == 1):
+                    intra.append(matrix[i][j])
+                elif species2 != species:
+                    inter.append((matrix[i][j], species2))
+        distance, neighbour = min(inter)
+        max_intra = max(intra) if intra else np.nan
+        rows.append({"Species": species, "Specimens": counts[species],
+                     "Mean_Intraspecific": sum(intra) / len(intra) if intra else np.nan,
+                     "Max_Intraspecific": max_intra,
+                     "Mean_Interspecific": sum(d for d, _ in inter) / len(inter),
+                     "Nearest_Neighbour_Distance": distance, "Nearest_Neighbour": neighbour,
+                     "Barcode_Gap": distance - max_intra})
+    return pd.DataFrame(rows)
+
+def assert_same(stats, expected):
+    pd.testing.assert_frame_equal(stats.reset_index(drop=True), expected, check_dtype=False, atol=1e-5, rtol=0)
+
+@pytest.mark.parametrize("block_rows", [None, 1, 5])
+def test_matches_double_loop(block_rows):
+    labels, matrix = specimen_matrix(0)
+    assert_same(barcode_gap_statistics(matrix, labels, block_rows=block_rows), reference_statistics(matrix, labels))
+
+def test_species_level_matrix_keeps_diagonal():
+    labels, matrix = specimen_matrix(1)
+    labels = [f"sp {i}" for i in range(len(labels))]
+    np.fill_diagonal(matrix, np.arange(len(labels)) / 100)
+    stats = barcode_gap_statistics(matrix, labels, block_rows=4)
+    assert_same(stats, reference_statistics(matrix, labels))
+    assert np.allclose(stats["Mean_Intraspecific"], np.arange(len(labels)) / 100)
+
+def write_lower_triangle(path, labels, matrix):
+    rows = ["\t" + "\t".join(labels)]
+    for i, label in enumerate(labels):
+        rows.append(label + "\t" + "\t".join(f"{matrix[i, j]:g}" if j <= i else "" for j in range(len(labels))))
+    path.write_text("\n".join(rows) + "\n")
+
+@pytest.mark.parametrize("layout", ["square", "condensed"])
+def test_triangular_tsv_through_binary_copy(tmp_path, layout):
+    labels, matrix = specimen_matrix(2)
+    write_lower_triangle(tmp_path / "matrix.tsv", labels, matrix)
+    file_labels, loaded = load_distance_matrix(str(tmp_path / "matrix.tsv"), layout=layout)
+    assert file_labels == labels
+    stats = barcode_gap_statistics(loaded, file_labels, block_rows=5, symmetric=True)
+    assert_same(stats, reference_statistics(matrix, labels))
+
+def test_triangular_tsv_filled_from_column_strips(tmp_path):
+    labels, matrix = specimen_matrix(3)
+    write_lower_triangle(tmp_path / "matrix.tsv", labels, matrix)
+    file_labels, loaded = read_distance_tsv(str(tmp_path / "matrix.tsv"))
+    assert np.isnan(loaded[0, 1])
+    stats = barcode_gap_statistics(loaded, file_labels, block_rows=5)
+    assert_same(stats, reference_statistics(matrix, labels))
@@ -0,0 +1,43 @@
+import os
+import numpy as np
+from distance_matrix_io import load_distance_matrix
+
+def write_tsv(path, labels, matrix, mtime=None):
+    rows = ["\t" + "\t".join(labels)]
+    rows += [label + "\t" + "\t".join(f"{value:g}" for value in row) for label, row in zip(labels, matrix)]
+    path.write_text("\n".join(rows) + "\n")
+    if mtime is not None:
+        os.utime(path, (mtime, mtime))
+
+def random_matrix(n, seed):
+    values = np.random.default_rng(seed).random((n, n)).round(3)
+    matrix = values + values.T
+    np.fill_diagonal(matrix, 0)
+    return [f"sp{i}" for i in range(n)], matrix
+
+def test_binary_copy_of_another_file_is_reconverted(tmp_path):
+    prefix = str(tmp_path / "shared")
+    first_labels, first = random_matrix(20, 0)
+    write_tsv(tmp_path / "first.tsv", first_labels, first)
+    load_distance_matrix(str(tmp_path / "first.tsv"), prefix)
+
+    # An older file converted under the same prefix must not reuse the newer binary copy
+    old_labels, old = random_matrix(12, 1)
+    write_tsv(tmp_path / "old.tsv", old_labels, old, mtime=1_000_000)
+    labels, matrix = load_distance_matrix(str(tmp_path / "old.tsv"), prefix)
+    assert labels == old_labels
+    assert np.allclose(matrix, old)
+
+def test_rewritten_file_is_reconverted(tmp_path):
+    file = tmp_path / "matrix.tsv"
+    labels, matrix = random_matrix(8, 2)
+    write_tsv(file, labels, matrix, mtime=2_000_000)
+    load_distance_matrix(str(file))
+    write_tsv(file, labels, matrix * 2, mtime=1_000_000)
+    assert np.allclose(load_distance_matrix(str(file))[1], matrix * 2)
+
+def test_default_prefix_is_next_to_the_text_file(tmp_path):
+    labels, matrix = random_matrix(5, 3)
+    write_tsv(tmp_path / "matrix.tsv", labels, matrix)
+    load_distance_matrix(str(tmp_path / "matrix.tsv"))
+    assert (tmp_path / "matrix.npy").exists() and (tmp_path / "matrix.json").exists()
@@ -0,0 +1,15 @@
+import numpy as np
+from entropy_engine import parallel_column_counts, path_column_counts
+
+def test_parallel_counts_match_serial_including_empty_alignment(tmp_path):
+    (tmp_path / "empty.fas").write_text(">a\n\n>b\n\n")
+    rng = np.random.default_rng(0)
+    rows = ["".join(rng.choice(list("ACGT-"), 37)) for _ in range(9)]
+    (tmp_path / "chain.fas").write_text("".join(f">s{i}\n{row}\n" for i, row in enumerate(rows)))
+    paths = [str(tmp_path / "empty.fas"), str(tmp_path / "chain.fas")]
+
+    for (counts, symbols), path in zip(parallel_column_counts(paths, workers=2, block_columns=8), paths):
+        serial_counts, serial_symbols = path_column_counts(path)
+        assert np.array_equal(symbols, serial_symbols)
+        assert counts.shape == serial_counts.shape
+        assert np.array_equal(counts, serial_counts)
@@ -0,0 +1,60 @@
+import numpy as np
+from entropy_cache import cached_counts, file_digest
+from entropy_landscape_io import write_entropy_landscape, write_landscape_params
+from entropy_state import saved_chain_counts, update_chain
+
+def write_fasta(path, sequences):
+    path.write_text("".join(f">s{i}\n{sequence}\n" for i, sequence in enumerate(sequences)))
+
+def saved_run(tmp_path, sequences):
+    """Alignment plus the landscape and params the entropy stage would save for it."""
+    fasta_file = str(tmp_path / "ChainA_aligned.fas")
+    write_fasta(tmp_path / "ChainA_aligned.fas", sequences)
+    cache_dir, state_dir = str(tmp_path / "cache"), str(tmp_path / "state")
+    prefix = str(tmp_path / "landscape")
+    (_, _, entropy), = cached_counts([fasta_file], cache_dir=cache_dir)
+    write_landscape_params(prefix, digests={"ChainA": file_digest(fasta_file, cache_dir)})
+    write_entropy_landscape(prefix, {"ChainA": entropy})
+    return fasta_file, prefix, state_dir, cache_dir, entropy
+
+def test_saved_landscape_used_while_alignment_unchanged(tmp_path):
+    fasta_file, prefix, state_dir, cache_dir, entropy = saved_run(tmp_path, ["ACGTA", "CGTAC", "GTACG", "TACGT"])
+    (counts, saved), = saved_chain_counts([fasta_file], prefix, ["ChainA"], state_dir, cache_dir)
+    assert np.array_equal(saved, entropy)
+    assert counts is not None
+
+def test_changed_alignment_is_not_read_from_saved_landscape(tmp_path):
+    fasta_file, prefix, state_dir, cache_dir, entropy = saved_run(tmp_path, ["ACGTA", "CGTAC", "GTACG", "TACGT"])
+    assert entropy.mean() > 1
+    write_fasta(tmp_path / "ChainA_aligned.fas", ["AAAAA"] * 4)
+    (counts, saved), = saved_chain_counts([fasta_file], prefix, ["ChainA"], state_dir, cache_dir)
+    assert np.array_equal(saved, np.zeros(5))
+    assert counts.sum(axis=0).tolist() == [4] * 5
+
+def test_landscape_without_digests_is_not_trusted(tmp_path):
+    fasta_file, prefix, state_dir, cache_dir, _ = saved_run(tmp_path, ["ACGTA", "CGTAC", "GTACG", "TACGT"])
+    write_landscape_params(prefix)
+    write_fasta(tmp_path / "ChainA_aligned.fas", ["AAAAA"] * 4)
+    (_, saved), = saved_chain_counts([fasta_file], prefix, ["ChainA"], state_dir, cache_dir)
+    assert np.array_equal(saved, np.zeros(5))
+
+def test_missing_alignment_reads_saved_landscape(tmp_path):
+    fasta_file, prefix, state_dir, cache_dir, entropy = saved_run(tmp_path, ["ACGTA", "CGTAC", "GTACG", "TACGT"])
+    (counts, saved), = saved_chain_counts([str(tmp_path / "gone.fas")], prefix, ["ChainA"], state_dir, cache_dir)
+    assert counts is None
+    assert np.array_equal(saved, entropy)
+
+def test_same_named_alignments_keep_separate_states(tmp_path):
+    state_dir = str(tmp_path / "state")
+    for run, sequences in (("runA", ["ACGT", "ACGT"]), ("runB", ["AAAA", "CCCC"])):
+        (tmp_path / run).mkdir()
+        write_fasta(tmp_path / run / "ChainA_aligned.fas", sequences)
+    run_a, run_b = (str(tmp_path / run / "ChainA_aligned.fas") for run in ("runA", "runB"))
+    added = tmp_path / "added.fas"
+    write_fasta(added, ["ACGA"])
+
+    assert np.array_equal(update_chain(run_a, added=[str(added)], state_dir=state_dir),
+                          update_chain(run_a, added=[str(added)], state_dir=state_dir))
+    assert np.allclose(update_chain(run_b, state_dir=state_dir), [1, 1, 1, 1])
+    entropy_a = update_chain(run_a, state_dir=state_dir)
+    assert np.allclose(entropy_a[:3], 0) and entropy_a[3] > 0
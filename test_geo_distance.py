@@ -0,0 +1,62 @@
+import numpy as np
+import pytest
+from geo_distance import haversine_matrix, mantel_test, neighbour_pairs, node_sites
+
+def distance_matrices(n, seed):
+    rng = np.random.default_rng(seed)
+    latlon = np.column_stack([rng.uniform(-60, 60, n), rng.uniform(-180, 180, n)])
+    geographic = haversine_matrix(latlon)
+    noise = rng.random((n, n))
+    genetic = geographic / 1000 + noise + noise.T
+    np.fill_diagonal(genetic, 0)
+    return latlon, geographic, genetic
+
+def condensed(matrix):
+    return matrix[np.triu_indices(len(matrix), 1)]
+
+def test_mantel_r_matches_corrcoef():
+    _, x, y = distance_matrices(40, seed=0)
+    r, p_value, permuted = mantel_test(x, y, permutations=99, seed=1)
+    assert r == pytest.approx(np.corrcoef(condensed(x), condensed(y))[0, 1], abs=1e-6)
+    assert p_value == (np.count_nonzero(permuted >= r - 1e-12) + 1) / 100
+
+def test_permuted_r_matches_corrcoef_of_permuted_vectors():
+    _, x, y = distance_matrices(30, seed=2)
+    _, _, permuted = mantel_test(x, y, permutations=20, seed=3, batch_size=8)
+
+    # Same permutations as mantel_test: one child seed per batch of batch_size
+    expected = []
+    for seed, size in zip(np.random.SeedSequence(3).spawn(3), (8, 8, 4)):
+        for order in np.random.default_rng(seed).permuted(np.tile(np.arange(30), (size, 1)), axis=1):
+            expected.append(np.corrcoef(condensed(x), condensed(y[order][:, order]))[0, 1])
+    assert np.allclose(permuted, expected, rtol=0, atol=1e-6)
+
+def test_mantel_reproducible_across_worker_counts():
+    _, x, y = distance_matrices(50, seed=4)
+    results = [mantel_test(x, y, permutations=300, seed=5, workers=workers, batch_size=64) for workers in (1, 2, 3)]
+    for r, p_value, permuted in results[1:]:
+        assert r == results[0][0]
+        assert p_value == results[0][1]
+        assert np.array_equal(permuted, results[0][2])
+
+def test_identical_matrices_are_never_beaten():
+    _, x, _ = distance_matrices(25, seed=6)
+    r, p_value, permuted = mantel_test(x, x, permutations=49, seed=7)
+    assert r == pytest.approx(1)
+    assert (permuted <= r + 1e-12).all()
+
+def test_neighbour_pairs_match_haversine():
+    latlon, geographic, _ = distance_matrices(60, seed=8)
+    i, j, distance = neighbour_pairs(latlon, 3000)
+    expected = np.argwhere(np.triu(geographic <= 3000, 1))
+    assert sorted(map(list, zip(i.tolist(), j.tolist()))) == expected.tolist()
+    assert np.allclose(distance, geographic[i, j], rtol=1e-6)
+
+def test_node_sites_use_members_then_unsuffixed_labels():
+    labels = np.array(["a", "b", "c"], dtype=object)
+    latlon = np.array([[10.0, 20.0], [10.0, 22.0], [-5.0, 179.0]])
+    nodes = np.array(["b", "a_2", "h1", "x_3", "c_1a"], dtype=object)
+    sites = node_sites(nodes, labels, latlon, {"h1": ["a", "b", "missing"]})
+    assert np.allclose(sites[:2], [[10, 22], [10, 20]])
+    assert sites[2] == pytest.approx([10, 21], abs=0.01)
+    assert np.isnan(sites[3:]).all()
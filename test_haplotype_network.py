@@ -0,0 +1,57 @@
+import networkx as nx
+import numpy as np
+import pytest
+from haplotype_network import (collapse_haplotypes, haplotype_labels, minimum_spanning_network, build_network_file,
+                               read_haplotype_members)
+from k2p_distance import encode_bitplanes
+
+def random_haplotypes(n, length, seed):
+    rng = np.random.default_rng(seed)
+    rows = rng.choice(list(b"ACGT"), (n, length)).astype(np.uint8)
+    rows[rng.random((n, length)) < 0.05] = ord("-")
+    return rows
+
+def hamming_graph(rows):
+    """Complete graph weighted by differences at sites where both sequences have a base."""
+    graph = nx.Graph()
+    graph.add_nodes_from(range(len(rows)))
+    definite = rows != ord("-")
+    for i in range(len(rows)):
+        for j in range(i + 1, len(rows)):
+            graph.add_edge(i, j, weight=int(((rows[i] != rows[j]) & definite[i] & definite[j]).sum()))
+    return graph
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_spanning_tree_weight_matches_networkx(workers):
+    rows = random_haplotypes(23, 12, seed=7)
+    src, dst, steps = minimum_spanning_network(encode_bitplanes(rows), all_minimum=False, workers=workers, tile=4)
+    graph = hamming_graph(rows)
+    assert len(steps) == len(rows) - 1
+    assert nx.is_tree(nx.Graph(list(zip(src.tolist(), dst.tolist()))))
+    assert [graph[u][v]["weight"] for u, v in zip(src, dst)] == steps.tolist()
+    assert steps.sum() == nx.minimum_spanning_tree(graph).size(weight="weight")
+
+def test_all_minimum_network_is_union_of_minimum_spanning_trees():
+    rows = random_haplotypes(20, 6, seed=8)  # Short sequences give many tied weights
+    src, dst, steps = minimum_spanning_network(encode_bitplanes(rows), all_minimum=True, tile=3)
+    graph = hamming_graph(rows)
+
+    # An edge is in some minimum spanning tree iff its ends are not joined by strictly lighter edges
+    expected = set()
+    for u, v, weight in graph.edges(data="weight"):
+        lighter = nx.Graph([(a, b) for a, b, w in graph.edges(data="weight") if w < weight])
+        if not (u in lighter and v in lighter and nx.has_path(lighter, u, v)):
+            expected.add((min(u, v), max(u, v)))
+    assert {(min(u, v), max(u, v)) for u, v in zip(src.tolist(), dst.tolist())} == expected
+
+def test_haplotypes_and_labels(tmp_path):
+    titles = ["a", "b", "a", "c"]
+    sequences = ["ACGT", "acgu", "ACGA", "ACGA"]
+    rows, members = collapse_haplotypes(titles, np.frombuffer("".join(sequences).encode(), dtype=np.uint8).reshape(4, 4))
+    assert rows.tolist() == [0, 2]
+    assert members == [["a", "b"], ["a", "c"]]
+    assert haplotype_labels(members) == ["a", "a_2"]
+
+    (tmp_path / "aln.fas").write_text("".join(f">{t}\n{s}\n" for t, s in zip(titles, sequences)))
+    build_network_file(str(tmp_path / "aln.fas"), str(tmp_path / "net.txt"), str(tmp_path / "haps.tsv"))
+    assert read_haplotype_members(str(tmp_path / "haps.tsv")) == {"a": ["a", "b"], "a_2": ["a", "c"]}
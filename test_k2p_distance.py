@@ -0,0 +1,45 @@
+import math
+import numpy as np
+import pytest
+from k2p_distance import distance_matrix, distance_matrix_from_fasta, encode_bitplanes, header_species
+
+PURINES = set("AG")
+
+def reference_distance(x, y, model):
+    """Per-pair formula with pairwise deletion of gaps and ambiguity codes."""
+    pairs = [(a, b) for a, b in zip(x, y) if a in "ACGT" and b in "ACGT"]
+    transitions = sum(a != b and (a in PURINES) == (b in PURINES) for a, b in pairs)
+    transversions = sum((a in PURINES) != (b in PURINES) for a, b in pairs)
+    P, Q = transitions / len(pairs), transversions / len(pairs)
+    if model == "p":
+        return P + Q
+    return -0.5 * math.log(1 - 2 * P - Q) - 0.25 * math.log(1 - 2 * Q)
+
+def random_alignment(n, length, seed):
+    rng = np.random.default_rng(seed)
+    base = rng.choice(list("ACGT"), length)
+    rows = []
+    for _ in range(n):
+        row = base.copy()
+        mutate = rng.random(length) < 0.15
+        row[mutate] = rng.choice(list("ACGT-NRy"), mutate.sum(), p=[0.22, 0.22, 0.22, 0.22, 0.05, 0.03, 0.02, 0.02])
+        rows.append("".join(row))
+    return rows
+
+@pytest.mark.parametrize("model", ["k2p", "p"])
+@pytest.mark.parametrize("workers", [1, 2])
+def test_bitplane_distances_match_per_pair_formula(model, workers):
+    rows = random_alignment(13, 150, seed=4)
+    planes = encode_bitplanes(np.frombuffer("".join(rows).encode(), dtype=np.uint8).reshape(13, 150))
+    matrix = distance_matrix(planes, model, workers=workers, tile=4, dtype=np.float64)
+    expected = [[reference_distance(x, y, model) for y in rows] for x in rows]
+    assert np.allclose(matrix, expected, rtol=0, atol=1e-12)
+
+def test_distance_matrix_from_fasta(tmp_path):
+    rows = random_alignment(5, 70, seed=5)
+    (tmp_path / "aln.fas").write_text("".join(f">Genus_species_{i}\n{row}\n" for i, row in enumerate(rows)))
+    titles, matrix = distance_matrix_from_fasta(str(tmp_path / "aln.fas"), model="p")
+    assert titles == [f"Genus_species_{i}" for i in range(5)]
+    assert header_species(titles) == ["Genus species"] * 5
+    assert matrix.dtype == np.float32
+    assert np.allclose(matrix, [[reference_distance(x, y, "p") for y in rows] for x in rows], atol=1e-6)
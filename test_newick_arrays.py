@@ -0,0 +1,33 @@
+import numpy as np
+from newick_arrays import parse_newick
+
+def test_unnamed_tips_with_lengths():
+    tree = parse_newick("(:1,:2,A:3);")
+    assert list(tree.parent) == [-1, 0, 0, 0]
+    assert tree.names == ["", "", "", "A"]
+    assert np.array_equal(tree.length, [np.nan, 1, 2, 3], equal_nan=True)
+    assert tree.to_newick() == "(:1,:2,A:3);"
+
+def test_unnamed_tips_without_lengths():
+    tree = parse_newick("(,,A);")
+    assert list(tree.parent) == [-1, 0, 0, 0]
+    assert tree.names == ["", "", "", "A"]
+    assert np.isnan(tree.length).all()
+
+def test_nested_unnamed_tip_with_length():
+    tree = parse_newick("((:1,B:2):0.5,:4);")
+    assert list(tree.parent) == [-1, 0, 1, 1, 0]
+    assert tree.names == ["", "", "", "B", ""]
+    assert np.array_equal(tree.length, [np.nan, 0.5, 1, 2, 4], equal_nan=True)
+
+def test_unquoted_labels_keep_inner_whitespace():
+    tree = parse_newick("(Homo sapiens:1,B:2);")
+    assert tree.names == ["", "Homo sapiens", "B"]
+    assert tree.to_newick() == "('Homo sapiens':1,B:2);"
+    assert parse_newick(tree.to_newick()).names == tree.names
+
+def test_whitespace_between_tokens():
+    tree = parse_newick(" ( A : 1 ,\n  (B b ,C)\t0.9 : 2 ) ;")
+    assert list(tree.parent) == [-1, 0, 0, 2, 2]
+    assert tree.names == ["", "A", "0.9", "B b", "C"]
+    assert np.array_equal(tree.length, [np.nan, 1, 2, np.nan, np.nan], equal_nan=True)
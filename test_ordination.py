@@ -0,0 +1,15 @@
+import numpy as np
+from ordination import cluster_ordination
+
+def test_clusters_numbered_by_size_and_representatives_in_numeric_order():
+    rng = np.random.default_rng(0)
+    sizes = np.arange(12, 0, -1) + 2
+    centers = np.column_stack([np.arange(12) * 100.0, np.zeros(12)])
+    scores = np.concatenate([center + rng.normal(0, 1, (size, 2)) for center, size in zip(centers, sizes)])
+    labels = [f"sp{k}_{i}" for k, size in enumerate(sizes) for i in range(size)]
+
+    specimens, species, representatives = cluster_ordination(labels, scores, n_clusters=12, seed=1)
+    assert list(representatives) == [f"Cluster {c}" for c in range(1, 13)]
+    assert np.bincount(specimens["Cluster"])[1:].tolist() == sizes.tolist()
+    for name, label in representatives.items():
+        assert specimens.loc[specimens["Species"] == label, "Cluster_Name"].item() == name
@@ -0,0 +1,59 @@
+import random
+from collections import Counter
+import pytest
+from ete3 import Tree
+from tree_consensus import consensus_tree, split_support
+
+TAXA = [f"t{i}" for i in range(9)]
+
+def reference_splits(newick, taxa):
+    """Non-trivial splits as frozensets of the side without the first sorted taxon."""
+    tree = Tree(newick, format=1)
+    anchor, everything = sorted(taxa)[0], frozenset(taxa)
+    splits = set()
+    for node in tree.traverse():
+        side = frozenset(node.get_leaf_names()) & everything
+        if anchor in side:
+            side = everything - side
+        if 2 <= len(side) <= len(everything) - 2:
+            splits.add(side)
+    return splits
+
+def test_majority_consensus_hand_computed(tmp_path):
+    (tmp_path / "set.nwk").write_text("((A:1,B:1):0.2,(C:1,(D:1,E:1):0.4):0.1);\n"
+                                      "((A:1,B:1):0.6,(D:1,(C:1,E:1):0.3):0.1);\n"
+                                      "((A:1,C:1):0.5,(B:1,(D:1,E:1):0.8):0.1);\n")
+    tree = consensus_tree(str(tmp_path / "set.nwk"))
+    support = split_support(tree, str(tmp_path / "set.nwk"))
+    clades = {frozenset(tree.names[i] for i in range(node, node + size) if tree.is_leaf[i]): (tree.names[node], tree.length[node])
+              for node, size in zip(range(tree.n_nodes), tree.subtree_sizes()) if node in support}
+    # Rooted next to A, split AB|CDE appears as clade CDE; its length adds both sides of the
+    # bifurcating root (0.2 + 0.1 and 0.6 + 0.1)
+    assert clades == {frozenset("CDE"): ("67", pytest.approx(0.5)), frozenset("DE"): ("67", pytest.approx(0.6))}
+    assert sorted(support.values()) == pytest.approx([2 / 3, 2 / 3])
+    assert tree.to_newick() == "(((D:1,E:1)67:0.6,C:1)67:0.5,A:1,B:1);"
+
+def test_majority_consensus_supports_match_split_counts(tmp_path):
+    # Trees sharing a backbone, so several splits are in the majority
+    rng = random.Random(3)
+    backbone = Tree()
+    backbone.populate(len(TAXA), names_library=TAXA)
+    texts = []
+    for _ in range(40):
+        tree = backbone.copy()
+        for _ in range(rng.randint(0, 2)):
+            a, b = rng.sample(tree.get_leaves(), 2)
+            a.name, b.name = b.name, a.name
+        texts.append(tree.write(format=9))
+    (tmp_path / "set.nwk").write_text("\n".join(texts) + "\n")
+
+    counts = Counter(split for text in texts for split in reference_splits(text, TAXA))
+    expected = {split: count for split, count in counts.items() if count / len(texts) > 0.5}
+    tree = consensus_tree(str(tmp_path / "set.nwk"))
+    assert sorted(tree.leaf_names()) == sorted(TAXA)
+    assert reference_splits(tree.to_newick(), TAXA) == set(expected)
+
+    support = split_support(tree, str(tmp_path / "set.nwk"))
+    labels = [tree.names[node] for node in support]
+    assert sorted(support.values()) == pytest.approx(sorted(count / len(texts) for count in expected.values()))
+    assert sorted(labels) == sorted(f"{round(100 * count / len(texts))}" for count in expected.values())
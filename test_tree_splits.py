@@ -0,0 +1,43 @@
+import random
+import pytest
+from ete3 import Tree
+from tree_splits import rf_matrix
+
+TAXA = [f"t{i}" for i in range(9)]
+
+def perturbed_newick(taxa, seed, swaps):
+    """Random branch lengths on a fixed backbone topology, with a few leaf labels swapped."""
+    rng = random.Random(seed)
+    tree = Tree()
+    random.seed(0)
+    tree.populate(len(taxa), names_library=taxa)
+    for _ in range(swaps):
+        a, b = rng.sample(tree.get_leaves(), 2)
+        a.name, b.name = b.name, a.name
+    for node in tree.traverse():
+        node.dist = round(rng.uniform(0.01, 1), 4)
+    return tree.write(format=5)
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_rf_matches_ete3(tmp_path, workers):
+    files = []
+    for i in range(5):
+        # The last tree has an extra taxon, so every comparison is over the shared taxa
+        taxa = TAXA + ["extra"] if i == 4 else TAXA
+        files.append(tmp_path / f"tree{i}.nwk")
+        files[-1].write_text(perturbed_newick(taxa, seed=i, swaps=i))
+    names, rf, normalized = rf_matrix([str(f) for f in files], workers=workers)
+    assert names == [str(f) for f in files]
+
+    trees = [Tree(f.read_text(), format=1) for f in files]
+    for i in range(len(trees)):
+        for j in range(len(trees)):
+            expected, max_rf = trees[i].robinson_foulds(trees[j], unrooted_trees=True)[:2]
+            assert rf[i, j] == expected
+            assert normalized[i, j] == pytest.approx(expected / max_rf if max_rf else 0)
+
+def test_rf_needs_four_shared_taxa(tmp_path):
+    (tmp_path / "a.nwk").write_text("(A,B,(C,D));")
+    (tmp_path / "b.nwk").write_text("(A,B,(C,E));")
+    with pytest.raises(ValueError):
+        rf_matrix([str(tmp_path / "a.nwk"), str(tmp_path / "b.nwk")])
@@ -0,0 +1,120 @@
+import numpy as np
+from newick_arrays import ArrayTree, iter_trees
+from tree_splits import bipartitions, taxon_index, taxon_keys
+
+# ===== Split counting =====
+def count_splits(trees):
+    """
+    Stream ArrayTrees (e.g. a UFBoot set) and count their non-trivial splits in a hash table keyed
+    by the 128-bit split hash; each entry holds [count, branch length sum, trees with a length,
+    packed taxon bitset]. Memory grows with the number of distinct splits, not trees.
+    Returns (taxa, table, number of trees, mean terminal branch length per taxon).
+    """
+    table = {}
+    taxa = index = keys = None
+    n_trees = 0
+    for tree in trees:
+        if index is None:
+            taxa = sorted(tree.leaf_names())
+            index, keys = taxon_index(taxa), taxon_keys(taxa)
+            terminal_sum = np.zeros(len(taxa))
+            terminal_count = np.zeros(len(taxa), dtype=np.int64)
+
+        hashes, nodes, ends, flipped, node_taxa = bipartitions(tree, index, keys)
+        leaves = np.flatnonzero(tree.is_leaf)
+        leaf_taxa = node_taxa[leaves]
+        if len(leaves) != len(taxa) or (leaf_taxa < 0).any() or len(np.unique(leaf_taxa)) != len(taxa):
+            raise ValueError(f"Tree {n_trees + 1} does not have the same taxa as the first tree")
+
+        lengths = tree.length[leaves]
+        has_length = ~np.isnan(lengths)
+        np.add.at(terminal_sum, leaf_taxa[has_length], lengths[has_length])
+        np.add.at(terminal_count, leaf_taxa[has_length], 1)
+
+        # A split can occur twice (both sides of a bifurcating root); their lengths add up
+        unique, first, inverse = np.unique(hashes, axis=0, return_index=True, return_inverse=True)
+        inverse = inverse.ravel()
+        lengths = tree.length[nodes]
+        has_length = ~np.isnan(lengths)
+        length_sum = np.bincount(inverse, weights=np.where(has_length, lengths, 0), minlength=len(unique))
+        length_seen = np.bincount(inverse, weights=has_length, minlength=len(unique)) > 0
+
+        for k, key in enumerate(unique):
+            key = key.tobytes()
+            entry = table.get(key)
+            if entry is None:
+                split = first[k]
+                members = node_taxa[nodes[split]:ends[split]]
+                bits = np.zeros(len(taxa), dtype=bool)
+                bits[members[members >= 0]] = True
+                if flipped[split]:
+                    bits = ~bits
+                entry = table[key] = [0, 0.0, 0, np.packbits(bits)]
+            entry[0] += 1
+            entry[1] += length_sum[k]
+            entry[2] += int(length_seen[k])
+        n_trees += 1
+
+    if not n_trees:
+        raise ValueError("No trees to build a consensus from")
+    with np.errstate(invalid="ignore"):
+        terminal_mean = terminal_sum / terminal_count
+    return taxa, table, n_trees, terminal_mean
+
+# ===== Consensus =====
+def consensus_from_splits(taxa, table, n_trees, threshold=0.5, terminal_lengths=None):
+    """
+    Consensus ArrayTree of the splits whose frequency is above threshold (0.5 = majority rule,
+    higher values give stricter consensus). Internal nodes are labelled with their support in
+    percent, so they render like IQ-TREE/UFBoot trees; branch lengths are means over the trees
+    containing the split. The tree is rooted next to the first taxon.
+    """
+    if not 0.5 <= threshold < 1:
+        raise ValueError("threshold must be in [0.5, 1) for the splits to be compatible")
+    m = len(taxa)
+    clusters = [(np.unpackbits(bits, count=m).astype(bool), count, length_sum, length_seen)
+                for count, length_sum, length_seen, bits in table.values() if count / n_trees > threshold]
+    clusters.sort(key=lambda cluster: -cluster[0].sum())
+
+    # Compatible clusters in decreasing size: each one's parent is the deepest node holding its taxa
+    parent, names, lengths = [-1], [""], [np.nan]
+    deepest = np.zeros(m, dtype=np.int64)
+    for members, count, length_sum, length_seen in clusters:
+        members = np.flatnonzero(members)
+        parent.append(deepest[members[0]])
+        names.append(f"{round(100 * count / n_trees)}")
+        lengths.append(length_sum / length_seen if length_seen else np.nan)
+        deepest[members] = len(parent) - 1
+    if terminal_lengths is None:
+        terminal_lengths = np.full(m, np.nan)
+    parent.extend(deepest)
+    names.extend(taxa)
+    lengths.extend(terminal_lengths)
+
+    # Renumber in preorder, as ArrayTree expects
+    parent = np.asarray(parent)
+    children = [[] for _ in parent]
+    for node in range(1, len(parent)):
+        children[parent[node]].append(node)
+    order, stack = [], [0]
+    while stack:
+        node = stack.pop()
+        order.append(node)
+        stack.extend(reversed(children[node]))
+    order = np.array(order)
+    new_id = np.empty(len(order), dtype=np.int64)
+    new_id[order] = np.arange(len(order))
+    new_parent = np.where(parent[order] >= 0, new_id[np.maximum(parent[order], 0)], -1)
+    return ArrayTree(new_parent, np.asarray(lengths)[order], [names[i] for i in order])
+
+def consensus_tree(tree_file, threshold=0.5):
+    """Majority-rule (or stricter threshold) consensus ArrayTree of every tree in tree_file."""
+    taxa, table, n_trees, terminal_lengths = count_splits(iter_trees(tree_file))
+    return consensus_from_splits(taxa, table, n_trees, threshold, terminal_lengths)
+
+def split_support(tree, tree_file):
+    """Fraction of the trees in tree_file containing each split of tree, keyed by split node id."""
+    taxa, table, n_trees, _ = count_splits(iter_trees(tree_file))
+    index = taxon_index(taxa)
+    hashes, nodes, _, _, _ = bipartitions(tree, index, taxon_keys(taxa))
+    return {int(node): table.get(key.tobytes(), [0])[0] / n_trees for node, key in zip(nodes, hashes)}
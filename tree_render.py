@@ -0,0 +1,135 @@
+import hashlib
+import json
+import math
+import os
+import shutil
+from concurrent.futures import ProcessPoolExecutor
+from newick_arrays import collapse_clades
+
+# Rendered images are cached here by tree hash, colors, tree style and image format
+RENDER_CACHE_DIR = os.environ.get("RENDER_CACHE_DIR", ".render_cache")
+
+# Bump when rendering changes so stale images are not reused
+RENDER_VERSION = 1
+
+# One NodeStyle per color, shared by every node drawn in that color
+_branch_styles = {}
+
+# ===== Styling =====
+def branch_style(color):
+    """Shared NodeStyle coloring branches with the given color and hiding node circles."""
+    if color not in _branch_styles:
+        from ete3 import NodeStyle
+
+        style = NodeStyle()
+        style["fgcolor"] = color  # Set branch color
+        style["hz_line_color"] = color
+        style["vt_line_color"] = color
+        style["size"] = 0  # Hide node circles
+        _branch_styles[color] = style
+    return _branch_styles[color]
+
+def color_branches(tree, color):
+    """Color all branches of an ete3 tree with the specified color."""
+    style = branch_style(color)
+    for node in tree.traverse():
+        node.set_style(style)
+
+def draw_collapsed_clades(tree, color):
+    """Draw leaves standing for collapsed clades as triangles sized by their tip count."""
+    from ete3 import SeqMotifFace
+
+    for node in tree.iter_leaves():
+        tips = getattr(node, "collapsed_tips", 0)
+        if tips:
+            size = int(8 + 4 * math.log2(tips))
+            triangle = SeqMotifFace(motifs=[[1, size, "<", size, size, color, color, None]])
+            node.add_face(triangle, column=0, position="branch-right")
+
+def merge_trees(trees):
+    """Merge multiple ete3 trees under a new artificial root."""
+    from ete3 import Tree
+
+    root = Tree()  # Create an artificial root
+    for tree in trees:
+        root.add_child(tree)  # Attach each tree as a child
+    return root
+
+# ===== Rendering =====
+def render_tree(trees, colors, output_file, tree_style=None, lod=None):
+    """
+    Render ArrayTrees with ete3: a single tree is drawn as is, several are merged under an
+    artificial root with each subtree in its own color. tree_style holds TreeStyle
+    attributes (e.g. {"mode": "c", "show_leaf_name": True}); lod holds collapse_clades
+    settings (e.g. {"max_tips": 50, "min_support": 70}) for level-of-detail rendering.
+    """
+    os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")  # Headless Qt
+    from ete3 import TreeStyle
+
+    if lod:
+        trees = [collapse_clades(tree, **lod) for tree in trees]
+    ete_trees = [tree.to_ete() for tree in trees]  # ete3 objects are only built for rendering
+    root = ete_trees[0] if len(ete_trees) == 1 else merge_trees(ete_trees)
+    for tree, color in zip(ete_trees, colors):
+        color_branches(tree, color)
+        draw_collapsed_clades(tree, color)
+
+    ts = TreeStyle()
+    for name, value in (tree_style or {}).items():
+        setattr(ts, name, value)
+    root.render(output_file, tree_style=ts)
+    return output_file
+
+def render_cache_key(trees, colors, tree_style, output_file, lod=None):
+    """Hash of the tree topologies, colors, TreeStyle attributes, level of detail and image format."""
+    sha = hashlib.sha256()
+    sha.update(json.dumps({"trees": [tree.topology_hash() for tree in trees],
+                           "colors": list(colors),
+                           "style": tree_style or {},
+                           "lod": lod or {},
+                           "format": os.path.splitext(output_file)[1].lower(),
+                           "version": RENDER_VERSION}, sort_keys=True).encode())
+    return sha.hexdigest()
+
+def _render_to_cache(trees, colors, cache_file, tree_style, lod):
+    base, extension = os.path.splitext(cache_file)
+    tmp_file = f"{base}.tmp{os.getpid()}{extension}"
+    render_tree(trees, colors, tmp_file, tree_style, lod)
+    os.replace(tmp_file, cache_file)
+    return cache_file
+
+def render_trees(jobs, workers=None, cache_dir=RENDER_CACHE_DIR, lod=None):
+    """
+    Render a list of (trees, colors, output_file, tree_style) jobs, one job per worker
+    process (workers=None uses every CPU, 1 renders in this process), optionally at a
+    level of detail (see render_tree).
+    Images whose trees and style are unchanged are copied from the cache instead of re-rendered.
+    """
+    if not cache_dir:
+        pending = [(trees, colors, output_file, tree_style, lod) for trees, colors, output_file, tree_style in jobs]
+        targets = [None] * len(jobs)
+    else:
+        os.makedirs(cache_dir, exist_ok=True)
+        targets, pending = [], []
+        for trees, colors, output_file, tree_style in jobs:
+            extension = os.path.splitext(output_file)[1]
+            key = render_cache_key(trees, colors, tree_style, output_file, lod)
+            cache_file = os.path.join(cache_dir, key + extension)
+            targets.append(cache_file)
+            if not os.path.exists(cache_file):
+                pending.append((trees, colors, cache_file, tree_style, lod))
+
+    render = render_tree if not cache_dir else _render_to_cache
+    workers = min(len(pending), workers or os.cpu_count() or 1)
+    if workers <= 1:
+        for job in pending:
+            render(*job)
+    elif pending:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            list(pool.map(render, *zip(*pending)))
+
+    for (_, _, output_file, _), cache_file in zip(jobs, targets):
+        if cache_file:
+            shutil.copyfile(cache_file, output_file)
+            os.utime(cache_file)  # Mark as recently used
+    return [output_file for _, _, output_file, _ in jobs]
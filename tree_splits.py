@@ -0,0 +1,159 @@
+import hashlib
+import os
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+import numpy as np
+import pandas as pd
+from scipy import sparse
+from newick_arrays import iter_newick_strings, parse_newick
+
+# Trees parsed per task when extracting splits on a process pool
+BATCH_TREES = 64
+
+# ===== Bipartition hashing =====
+def taxon_keys(labels):
+    """Two 64-bit keys per taxon derived from its label, identical in every process."""
+    digests = b"".join(hashlib.blake2b(label.encode(), digest_size=16).digest() for label in labels)
+    return np.frombuffer(digests, dtype=np.uint64).reshape(len(labels), 2)
+
+def taxon_index(labels):
+    """Shared taxon index: label -> id over the sorted labels."""
+    return {label: i for i, label in enumerate(sorted(labels))}
+
+def bipartitions(tree, index, keys=None):
+    """
+    Non-trivial bipartitions of an ArrayTree restricted to the taxa in index.
+    Each split is the bitset of taxa on the side without taxon 0, hashed as the XOR of their
+    keys; subtrees are contiguous in preorder, so every hash is a difference of prefix XORs.
+    Taxa missing from index are ignored, which projects the tree onto the shared taxon set.
+    Returns (hashes (k, 2) uint64, split nodes, subtree ends, flipped (node side holds taxon 0),
+    taxon id of every node (-1 for internal nodes and unshared taxa)); splits are not deduplicated.
+    """
+    if keys is None:
+        keys = taxon_keys(sorted(index, key=index.get))
+    n = tree.n_nodes
+    leaves = np.flatnonzero(tree.is_leaf)
+    ids = np.array([index.get(tree.names[i], -1) for i in leaves], dtype=np.int64)
+    present = ids >= 0
+    node_taxa = np.full(n, -1, dtype=np.int64)
+    node_taxa[leaves] = ids
+
+    node_keys = np.zeros((n, 2), dtype=np.uint64)
+    node_keys[leaves[present]] = keys[ids[present]]
+    prefix = np.zeros((n + 1, 2), dtype=np.uint64)
+    np.bitwise_xor.accumulate(node_keys, axis=0, out=prefix[1:])
+    leaf_count = np.zeros(n + 1, dtype=np.int64)
+    np.cumsum(np.bincount(leaves[present], minlength=n), out=leaf_count[1:])
+
+    start = np.arange(n)
+    end = start + tree.subtree_sizes()
+    hashes = prefix[end] ^ prefix[start]
+    sizes = leaf_count[end] - leaf_count[start]
+    m = leaf_count[-1]
+
+    # Orient every split to the side without taxon 0 (unrooted comparison)
+    flip = np.zeros(n, dtype=bool)
+    anchor = leaves[ids == 0]
+    if len(anchor):
+        flip = (start <= anchor[0]) & (anchor[0] < end)
+        hashes[flip] ^= prefix[-1]
+    nontrivial = np.flatnonzero((sizes >= 2) & (sizes <= m - 2))
+    return hashes[nontrivial], nontrivial, end[nontrivial], flip[nontrivial], node_taxa
+
+def split_hashes(tree, index, keys=None):
+    """Unique non-trivial split hashes of an ArrayTree as a (k, 2) uint64 array (see bipartitions)."""
+    return np.unique(bipartitions(tree, index, keys)[0], axis=0)
+
+# ===== Tree sources =====
+def tree_strings(tree_files, labels=None, all_trees=False):
+    """
+    Yield (name, newick) for the first tree of each file, or for every tree when all_trees
+    is set (e.g. UFBoot/bootstrap sets, named '<label>#<n>').
+    """
+    for file, label in zip(tree_files, labels or tree_files):
+        for i, text in enumerate(iter_newick_strings(file)):
+            if not all_trees:
+                yield label, text
+                break
+            yield f"{label}#{i + 1}", text
+
+def _batches(items, size=BATCH_TREES):
+    items = iter(items)
+    while True:
+        batch = list(islice(items, size))
+        if not batch:
+            return
+        yield batch
+
+_worker_index = None
+_worker_keys = None
+
+def _init_worker(index):
+    global _worker_index, _worker_keys
+    _worker_index = index
+    _worker_keys = None if index is None else taxon_keys(sorted(index, key=index.get))
+
+def _batch_taxa(texts):
+    return set.intersection(*(set(parse_newick(text).leaf_names()) for text in texts))
+
+def _batch_splits(texts):
+    return [split_hashes(parse_newick(text), _worker_index, _worker_keys) for text in texts]
+
+def _map_batches(function, batches, workers, index=None):
+    """Run function over batches in this process (workers=1) or on a process pool."""
+    if workers == 1:
+        _init_worker(index)
+        return [function(batch) for batch in batches]
+    with ProcessPoolExecutor(max_workers=workers or os.cpu_count(),
+                             initializer=_init_worker, initargs=(index,)) as pool:
+        return list(pool.map(function, batches))
+
+# ===== Robinson-Foulds =====
+def rf_from_splits(split_sets):
+    """
+    All-pairs Robinson-Foulds distances from per-tree split hash arrays.
+    Shared splits are counted for every pair at once with a sparse tree x split incidence product.
+    Returns (rf, normalized rf), normalized by the total number of splits of the pair.
+    """
+    sizes = np.array([len(splits) for splits in split_sets], dtype=np.int64)
+    n_trees = len(split_sets)
+    if sizes.sum():
+        _, split_ids = np.unique(np.concatenate(split_sets), axis=0, return_inverse=True)
+        incidence = sparse.csr_matrix((np.ones(len(split_ids), dtype=np.int32),
+                                       (np.repeat(np.arange(n_trees), sizes), split_ids.ravel())),
+                                      shape=(n_trees, split_ids.max() + 1))
+        shared = (incidence @ incidence.T).toarray()
+    else:
+        shared = np.zeros((n_trees, n_trees), dtype=np.int64)
+
+    total = sizes[:, None] + sizes[None, :]
+    rf = total - 2 * shared
+    normalized = np.divide(rf, total, out=np.zeros(rf.shape), where=total > 0)
+    return rf, normalized
+
+def rf_matrix(tree_files, labels=None, all_trees=False, workers=1):
+    """
+    Unrooted RF and normalized RF between trees read from tree_files, over the taxa shared
+    by all trees. Trees are streamed twice (shared taxa, then splits), with parsing and split
+    hashing done on a process pool unless workers=1.
+    Returns (tree names, rf, normalized rf).
+    """
+    names = [name for name, _ in tree_strings(tree_files, labels, all_trees)]
+    texts = (text for _, text in tree_strings(tree_files, labels, all_trees))
+    shared_taxa = set.intersection(*_map_batches(_batch_taxa, _batches(texts), workers))
+    if len(shared_taxa) < 4:
+        raise ValueError(f"Trees share only {len(shared_taxa)} taxa; RF needs at least 4")
+
+    texts = (text for _, text in tree_strings(tree_files, labels, all_trees))
+    split_batches = _map_batches(_batch_splits, _batches(texts), workers, taxon_index(shared_taxa))
+    rf, normalized = rf_from_splits([splits for batch in split_batches for splits in batch])
+    return names, rf, normalized
+
+def write_rf_matrices(tree_files, labels=None, output_prefix="tree", all_trees=False, workers=1):
+    """Write <output_prefix>_rf.tsv and <output_prefix>_nrf.tsv (tab-separated, tree names as header)."""
+    names, rf, normalized = rf_matrix(tree_files, labels, all_trees, workers)
+    for suffix, matrix in (("rf", rf), ("nrf", normalized)):
+        output_file = f"{output_prefix}_{suffix}.tsv"
+        pd.DataFrame(matrix, index=names, columns=names).to_csv(output_file, sep="\t")
+        print(f"RF matrix saved as {output_file}")
+    return names, rf, normalized